@@ -8,7 +8,8 @@
 .PARAMETER OutputDir
     Directory where HTML files will be saved
 .PARAMETER Theme
-    Theme name: antorus, dark, emerald-nightmare, github, manaforge, minimal, nighthold, tomb-of-sargeras, trial-of-valor, or auto (metadata-driven)
+    Theme name from md2html/themes/ or MD2HTML_THEME_PATH (e.g. manaforge, github, nighthold), or auto (metadata-driven).
+    Validated by md2html itself.
 .PARAMETER Recursive
     Process subdirectories recursively
 .PARAMETER TableOfContents
@@ -19,6 +20,8 @@
     Start preview server after conversion
 .PARAMETER Port
     Server port (default: 8000, used with -Serve)
+.PARAMETER NoDaemon
+    Always start md2html.py, even when an `md2html daemon` is running
 .EXAMPLE
     .\Convert-MdBatch.ps1 -InputDir docs -OutputDir site -Theme github
 .EXAMPLE
@@ -37,7 +40,7 @@ param(
     [string]$OutputDir,
     
     [Parameter(Mandatory=$true, Position=2)]
-    [ValidateSet('antorus', 'dark', 'emerald-nightmare', 'github', 'manaforge', 'minimal', 'nighthold', 'tomb-of-sargeras', 'trial-of-valor', 'auto')]
+    [ValidatePattern('^[a-z0-9][a-z0-9\-]*$')]
     [string]$Theme,
     
     [Parameter()]
@@ -54,13 +57,20 @@ param(
     [switch]$Serve,
     
     [Parameter()]
-    [int]$Port = 8000
+    [int]$Port = 8000,
+    
+    [Parameter()]
+    [switch]$NoDaemon
 )
 
 # Script configuration
 $ErrorActionPreference = 'Stop'
 $ScriptDir = $PSScriptRoot
 $Md2HtmlPath = Join-Path $ScriptDir "md2html.py"
+$ClientPath = Join-Path $ScriptDir "md2html-client.py"
+
+# md2html-client exit code when no daemon is running
+$NoDaemonExitCode = 3
 
 # Color functions
 function Write-ErrorMessage {
@@ -130,18 +140,17 @@ function Test-Md2Html {
     
     # Check dependencies
     Write-InfoMessage "Checking dependencies..."
+    # find_spec locates packages without importing them
     $checkDeps = @"
-try:
-    import click, markdown, bs4, watchdog, aiohttp
-    print('OK')
-except ImportError as e:
-    print(f'MISSING: {e.name}')
+from importlib.util import find_spec
+missing = [m for m in ('click', 'markdown', 'watchdog', 'aiohttp') if find_spec(m) is None]
+print(f'MISSING: {missing[0]}' if missing else 'OK')
 "@
     
     $result = & $PythonCmd -c $checkDeps 2>&1
     if ($result -ne 'OK') {
         Write-ErrorMessage "Missing required Python packages"
-        Write-InfoMessage "Install with: pip install click markdown beautifulsoup4 watchdog aiohttp"
+        Write-InfoMessage "Install with: pip install click markdown watchdog aiohttp"
         exit 1
     }
 }
@@ -160,7 +169,7 @@ function Test-Directories {
     }
     
     # Check for markdown files
-    $mdFiles = Get-ChildItem -Path $InputDirectory -Filter "*.md" -File
+    $mdFiles = @(Get-ChildItem -Path $InputDirectory -File | Where-Object { $_.Extension -in '.md', '.markdown' })
     if ($mdFiles.Count -eq 0) {
         Write-WarningMessage "No markdown files found in: $InputDirectory"
         if (-not $Recursive) {
@@ -213,9 +222,23 @@ function Main {
     
     # Execute md2html
     try {
-        $process = Start-Process -FilePath $pythonCmd -ArgumentList (@($Md2HtmlPath) + $arguments) -NoNewWindow -Wait -PassThru
+        $exitCode = $NoDaemonExitCode
+        
+        # A running daemon converts without a cold start; the client takes the same arguments
+        if (-not $Watch -and -not $NoDaemon -and (Test-Path $ClientPath)) {
+            & $pythonCmd $ClientPath --if-running @arguments
+            $exitCode = $LASTEXITCODE
+            if ($exitCode -ne $NoDaemonExitCode) {
+                Write-InfoMessage "Used the running md2html daemon"
+            }
+        }
+        
+        if ($exitCode -eq $NoDaemonExitCode) {
+            $process = Start-Process -FilePath $pythonCmd -ArgumentList (@($Md2HtmlPath) + $arguments) -NoNewWindow -Wait -PassThru
+            $exitCode = $process.ExitCode
+        }
         
-        if ($process.ExitCode -eq 0) {
+        if ($exitCode -eq 0) {
             Write-SuccessMessage "Conversion completed successfully!"
             
             # Start server if requested
@@ -227,7 +250,7 @@ function Main {
                 & $pythonCmd $Md2HtmlPath serve $OutputDir --port $Port
             }
         } else {
-            Write-ErrorMessage "Conversion failed with exit code: $($process.ExitCode)"
+            Write-ErrorMessage "Conversion failed with exit code: $exitCode"
             exit 1
         }
     } catch {
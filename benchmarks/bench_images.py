@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark image processing: rewriting while the body is serialized vs
+the former BeautifulSoup re-parse of the rendered HTML.
+
+Usage: python benchmarks/bench_images.py [--repeat N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import markdown
+
+from md2html.engine import EnginePool, markdown_extensions
+from md2html.images import ImageRewriter
+
+# 1x1 transparent PNG
+PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d4944415478da63f8ffffff7f0009fb03fd2a86e3'
+    '8a0000000049454e44ae426082'
+)
+
+
+def make_document(sections: int, images: bool) -> str:
+    parts = []
+    for i in range(sections):
+        parts.append(f'## Section {i}\n')
+        parts.append('Some *emphasis*, `code`, a [link](https://example.com) & more text.\n')
+        if images:
+            parts.append(f'![portrait {i}](img/p{i % 20}.png)\n')
+        parts.append('```python\ndef f(x):\n    return x * 2\n```\n')
+        parts.append('| a | b |\n|---|---|\n| 1 | 2 |\n')
+    return '\n'.join(parts)
+
+
+def legacy(content: str, base_dir: Path) -> str:
+    """The previous pipeline: render, re-parse with BeautifulSoup, serialize."""
+    from bs4 import BeautifulSoup
+
+    html = markdown.Markdown(extensions=markdown_extensions(False)).convert(content)
+    soup = BeautifulSoup(html, 'html.parser')
+    rewriter = ImageRewriter(base_dir, True)
+    for img in soup.find_all('img'):
+        new_src = rewriter.rewrite(img.get('src'))
+        if new_src is not None:
+            img['src'] = new_src
+    return str(soup)
+
+
+def serialized(content: str, base_dir: Path) -> str:
+    """The current pipeline: images rewritten as the body is serialized."""
+    return EnginePool().convert(content, False, ImageRewriter(base_dir, True))
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sections', type=int, default=400)
+    args = parser.parse_args()
+
+    try:
+        import bs4  # noqa: F401
+        have_bs4 = True
+    except ImportError:
+        have_bs4 = False
+        print('beautifulsoup4 not installed; skipping legacy timings')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        (base_dir / 'img').mkdir()
+        for i in range(20):
+            (base_dir / 'img' / f'p{i}.png').write_bytes(PNG)
+
+        for label, images in (('image-heavy', True), ('image-free', False)):
+            content = make_document(args.sections, images)
+            new = best_of(lambda: serialized(content, base_dir), args.repeat)
+            line = f'{label:12} serialized {new * 1000:8.1f} ms'
+            if have_bs4:
+                old = best_of(lambda: legacy(content, base_dir), args.repeat)
+                line += f'   bs4 re-parse {old * 1000:8.1f} ms   speedup {old / new:.2f}x'
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
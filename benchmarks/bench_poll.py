@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark one idle poll of a large tree: the scandir snapshot poller vs
+watchdog's PollingObserver, which re-stats and diffs every file per tick.
+
+Usage: python benchmarks/bench_poll.py [--files N] [--per-dir N] [--polls N]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from watchdog.utils.dirsnapshot import DirectorySnapshot, DirectorySnapshotDiff
+
+from md2html.poller import SnapshotPoller
+from md2html.watcher import MARKDOWN_SUFFIXES
+
+
+def make_tree(root: Path, files: int, per_dir: int) -> int:
+    """Nested directories of small files; one file in 50 is Markdown."""
+    directories = 0
+    for i in range(files):
+        if i % per_dir == 0:
+            directory = root / f'section{i // (per_dir * 10)}' / f'part{i // per_dir}'
+            directory.mkdir(parents=True)
+            directories += 1
+        suffix = '.md' if i % 50 == 0 else '.txt'
+        (directory / f'file{i}{suffix}').write_bytes(b'x')
+    return directories
+
+
+def cpu_ms(action, polls: int) -> list[float]:
+    timings = []
+    for _ in range(polls):
+        start = time.process_time()
+        action()
+        timings.append((time.process_time() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=50000)
+    parser.add_argument('--per-dir', type=int, default=100)
+    parser.add_argument('--polls', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        directories = make_tree(root, args.files, args.per_dir)
+        # Let directory mtimes age past the racy window
+        time.sleep(2.5)
+
+        poller = SnapshotPoller(1.0, lambda path: path.endswith(MARKDOWN_SUFFIXES))
+        poller.schedule(None, str(root), recursive=True)
+        poller.snapshot()
+        snapshot = cpu_ms(poller.poll, args.polls)
+
+        state = [DirectorySnapshot(str(root), recursive=True)]
+
+        def watchdog_tick() -> None:
+            current = DirectorySnapshot(str(root), recursive=True)
+            DirectorySnapshotDiff(state[0], current)
+            state[0] = current
+
+        polling = cpu_ms(watchdog_tick, args.polls)
+
+    print(f'{args.files} files in {directories} directories, CPU per idle poll (median of {args.polls})')
+    print(f'PollingObserver   {statistics.median(polling):8.1f} ms')
+    print(f'SnapshotPoller    {statistics.median(snapshot):8.1f} ms  '
+          f'({statistics.median(polling) / statistics.median(snapshot):.1f}x less)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark the preview server: the current handler vs the former one,
+which resolved and stat'ed every request and sent the file uncompressed.
+
+Usage: python benchmarks/bench_serve.py [--requests N] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from md2html.server import FileCache, handle_file
+
+
+async def legacy_handle_file(request):
+    """The former handler: a FileResponse after resolving and stat'ing every request."""
+    base_dir = request.app['base_dir']
+    path = request.match_info.get('path', 'index.html')
+    base_resolved = base_dir.resolve()
+    file_path = (base_dir / path).resolve()
+    if not file_path.is_relative_to(base_resolved):
+        raise web.HTTPForbidden()
+    if file_path.is_dir():
+        file_path = file_path / 'index.html'
+    if not file_path.exists():
+        raise web.HTTPNotFound()
+    allowed_suffixes = {'.html', '.htm', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg'}
+    if file_path.suffix.lower() not in allowed_suffixes:
+        raise web.HTTPForbidden()
+    return web.FileResponse(file_path)
+
+
+def make_pages(root: Path) -> None:
+    """A plain 12 KB page and a 2 MB page with a base64-embedded image."""
+    text = '<p>Some <em>text</em> with a <a href="#">link</a>.</p>\n' * 200
+    (root / 'small.html').write_text(f'<html><body>{text}</body></html>', encoding='utf-8')
+    image = base64.b64encode(os.urandom(1_500_000)).decode('ascii')
+    (root / 'large.html').write_text(
+        f'<html><body>{text}<img src="data:image/png;base64,{image}"></body></html>',
+        encoding='utf-8'
+    )
+
+
+async def measure(handler, root: Path, page: str, headers: dict, requests: int, concurrency: int):
+    app = web.Application()
+    app['base_dir'] = root
+    app['files'] = FileCache()
+    app.router.add_get('/{path:.*}', handler)
+
+    server = TestServer(app)
+    await server.start_server()
+    url = str(server.make_url(f'/{page}'))
+    received = 0
+    try:
+        async with ClientSession(auto_decompress=False) as session:
+            async def worker(count: int) -> None:
+                nonlocal received
+                for _ in range(count):
+                    async with session.get(url, headers=headers) as response:
+                        body = await response.read()
+                    received += len(body)
+
+            start = time.perf_counter()
+            await asyncio.gather(*[worker(requests // concurrency) for _ in range(concurrency)])
+            elapsed = time.perf_counter() - start
+    finally:
+        await server.close()
+    return requests / elapsed, received / requests
+
+
+async def main_async(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_pages(root)
+
+        # Each handler's own validators, for the revalidation case
+        app_headers = {'Accept-Encoding': 'gzip'}
+        etags = {}
+        for handler in (legacy_handle_file, handle_file):
+            app = web.Application()
+            app['base_dir'] = root
+            app['files'] = FileCache()
+            app.router.add_get('/{path:.*}', handler)
+            server = TestServer(app)
+            await server.start_server()
+            async with ClientSession() as session:
+                for page in ('small.html', 'large.html'):
+                    async with session.get(server.make_url(f'/{page}'), headers=app_headers) as r:
+                        etags[handler, page] = r.headers.get('ETag', '')
+            await server.close()
+
+        print(f'{"page":<12}{"case":<28}{"legacy req/s":>14}{"new req/s":>12}'
+              f'{"legacy KB":>12}{"new KB":>10}')
+        for page in ('small.html', 'large.html'):
+            cases = [
+                ('first load (gzip)', app_headers, app_headers),
+                ('revalidate (If-None-Match)',
+                 dict(app_headers, **{'If-None-Match': etags[legacy_handle_file, page]}),
+                 dict(app_headers, **{'If-None-Match': etags[handle_file, page]})),
+            ]
+            for name, legacy_headers, new_headers in cases:
+                legacy_rps, legacy_size = await measure(
+                    legacy_handle_file, root, page, legacy_headers, args.requests, args.concurrency)
+                new_rps, new_size = await measure(
+                    handle_file, root, page, new_headers, args.requests, args.concurrency)
+                print(f'{page:<12}{name:<28}{legacy_rps:>14.0f}{new_rps:>12.0f}'
+                      f'{legacy_size / 1024:>12.1f}{new_size / 1024:>10.1f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
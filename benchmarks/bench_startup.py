@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for `md2html convert` on a single small file.
+Every run is a fresh interpreter, as with Convert-MdBatch.ps1.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget-ms MS]
+Exits with status 1 when the median exceeds the budget.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENTRY_POINT = ROOT / 'md2html.py'
+
+# Regression threshold for the median cold start, in milliseconds
+DEFAULT_BUDGET_MS = 400
+
+SAMPLE = '''# Startup sample
+
+Some *text*, a [link](https://example.com) and `code`.
+
+```python
+print("hello")
+```
+'''
+
+
+def time_command(args: list[str], runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, check=True, stdout=subprocess.DEVNULL, cwd=ROOT)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'sample.md'
+        source.write_text(SAMPLE, encoding='utf-8')
+        output = Path(tmp) / 'sample.html'
+
+        baseline = time_command([sys.executable, '-c', 'pass'], args.runs)
+        convert = time_command(
+            [sys.executable, str(ENTRY_POINT), 'convert', str(source),
+             '--output', str(output), '--theme', 'github'],
+            args.runs,
+        )
+
+    interpreter = statistics.median(baseline)
+    median = statistics.median(convert)
+    print(f'interpreter     median {interpreter:7.1f} ms')
+    print(f'md2html convert median {median:7.1f} ms  '
+          f'(min {min(convert):.1f}, max {max(convert):.1f}, budget {args.budget_ms:.0f})')
+
+    if median > args.budget_ms:
+        print(f'FAIL: cold start {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
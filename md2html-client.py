@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+md2html-client - thin client for a running `md2html daemon`.
+Entry point for wrappers; imports nothing beyond the standard library.
+"""
+
+import sys
+
+from md2html.client import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,16 +12,13 @@ if sys.version_info < (3, 9):
     print("Error: Python 3.9 or higher is required", file=sys.stderr)
     sys.exit(1)
 
-# Check required dependencies
+# Check the CLI dependency only; each subcommand imports (and reports)
+# its own dependencies when it runs
 try:
     import click
-    import markdown
-    import bs4
-    import watchdog
-    import aiohttp
 except ImportError as e:
     print(f"Error: Missing required dependency: {e.name}", file=sys.stderr)
-    print("Install with: pip install click markdown beautifulsoup4 watchdog aiohttp", file=sys.stderr)
+    print("Install with: pip install click markdown watchdog aiohttp", file=sys.stderr)
     sys.exit(1)
 
 # Import and run CLI
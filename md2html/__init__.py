@@ -6,7 +6,22 @@ No magic, no fallbacks, explicit configuration only.
 __version__ = "2.0.0"
 __author__ = "Bean Raid"
 
-from .cli import cli
-from .converter import convert_markdown
+__all__ = ['cli', 'convert_markdown', 'render', 'EnginePool', '__version__']
 
-__all__ = ['cli', 'convert_markdown', '__version__']
\ No newline at end of file
+# Exports are imported on first use so `md2html convert` does not pay
+# for server and watcher dependencies
+_LAZY_EXPORTS = {
+    'cli': '.cli',
+    'convert_markdown': '.converter',
+    'render': '.converter',
+    'EnginePool': '.engine',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
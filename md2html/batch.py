@@ -0,0 +1,130 @@
+"""
+NDJSON batch rendering for pipelines.
+One JSON record per line in, one per line out, in input order.
+Nothing is read but the records and their images; nothing is written.
+"""
+
+import json
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from .converter import DEFAULT_TITLE, _init_worker, render
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Records submitted to each worker ahead of the one being answered.
+# Bounds memory however long the stream, while keeping workers busy.
+IN_FLIGHT_PER_WORKER = 4
+
+
+def _field(record: dict, name: str, kind: type, default):
+    value = record.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, kind):
+        raise ValueError(f"Field {name} must be {kind.__name__}, got {value!r}")
+    return value
+
+
+def _error_line(record_id, error: str) -> tuple[str, str]:
+    return json.dumps({'id': record_id, 'error': error}, ensure_ascii=False), error
+
+
+def render_record(
+    line: Union[str, bytes],
+    theme: str,
+    toc: bool = False,
+    embed_images: bool = True,
+    base_dir: Optional[Path] = None
+) -> tuple[str, Optional[str]]:
+    """
+    Render one input line: {"id", "markdown", "theme", "base_dir", "toc", "title"}.
+    Only markdown is required; the other fields default to the
+    arguments. Returns the output line, {"id", "html"} or
+    {"id", "error"}, and the error message or None.
+    """
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return _error_line(None, f"Invalid record: {e}")
+    if not isinstance(record, dict):
+        return _error_line(None, "Record must be a JSON object")
+
+    record_id = record.get('id')
+    try:
+        markdown = record.get('markdown')
+        if not isinstance(markdown, str):
+            raise ValueError("Record needs a 'markdown' string")
+        record_base = _field(record, 'base_dir', str, None)
+        html = render(
+            markdown,
+            _field(record, 'theme', str, theme),
+            _field(record, 'toc', bool, toc),
+            Path(record_base).resolve() if record_base else base_dir,
+            embed_images,
+            _field(record, 'title', str, DEFAULT_TITLE),
+        )
+    except Exception as e:
+        return _error_line(record_id, str(e))
+    return json.dumps({'id': record_id, 'html': html}, ensure_ascii=False), None
+
+
+def render_stream(
+    lines: Iterable[Union[str, bytes]],
+    theme: str,
+    toc: bool = False,
+    embed_images: bool = True,
+    base_dir: Optional[Path] = None,
+    jobs: int = 1,
+    cache_dir: Optional[Path] = None
+) -> Iterator[tuple[str, Optional[str]]]:
+    """
+    Render NDJSON records as they arrive, yielding render_record's
+    results in input order. Blank lines are skipped. With jobs > 1,
+    records render in worker processes, at most IN_FLIGHT_PER_WORKER
+    per worker at a time; a record's result is yielded as soon as it
+    and every record before it are done, without waiting for more input.
+    """
+    options = (theme, toc, embed_images, base_dir)
+    if jobs == 1:
+        for line in lines:
+            if line.strip():
+                yield render_record(line, *options)
+        return
+
+    # Imported here: multiprocessing is a noticeable share of CLI startup
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(theme, toc, cache_dir),
+    )
+    # Futures in input order; a full window stops the reader
+    window: queue.Queue = queue.Queue(maxsize=jobs * IN_FLIGHT_PER_WORKER)
+    failed: list[BaseException] = []
+
+    def feed() -> None:
+        try:
+            for line in lines:
+                if line.strip():
+                    window.put(executor.submit(render_record, line, *options))
+        except BaseException as e:
+            failed.append(e)
+        finally:
+            window.put(None)
+
+    # Input is read on its own thread so results flow back while the
+    # writer of the stream is still waiting on them
+    reader = threading.Thread(target=feed, name='md2html-batch-reader', daemon=True)
+    reader.start()
+    try:
+        while (future := window.get()) is not None:
+            yield future.result()
+        if failed:
+            raise failed[0]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,422 @@
+"""
+Benchmark suite on a generated corpus.
+Corpora are synthetic and seeded, so two runs measure the same input;
+results are compared against an explicit baseline file only.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from . import __version__
+from .converter import configure_cache, convert_directory, convert_markdown
+from .highlight import highlight_cache
+from .images import encode_image, image_cache, process_images
+from .registry import themes
+from .sources import SourceWalker
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+DEFAULT_RUNS = 5
+DEFAULT_TOLERANCE = 0.2
+
+# Per scale step; a scale of 1 is about 270 files and 7 MB
+NOTE_COUNT = 200
+CODE_PAGE_COUNT = 20
+IMAGE_PAGE_COUNT = 10
+HINT_PAGE_COUNT = 40
+HUGE_DOC_COUNT = 2
+HUGE_DOC_SECTIONS = 2000
+IMAGE_POOL_SIZE = 30
+
+SERVE_REQUESTS = 500
+SERVE_CONCURRENCY = 10
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Marks a directory generate_corpus wrote, and may therefore replace
+CORPUS_MARKER = '.md2html-bench-corpus'
+
+WORDS = (
+    'raid boss phase tank healer mana arcane fel void shield cooldown '
+    'interrupt dispel stack add spawn wipe pull timer enrage portal '
+    'crystal beam orb soak spread kite burst rotation pot rune'
+).split()
+
+CODE_SAMPLES = {
+    'python': 'def damage(stacks, base=100):\n    return base * (1 + 0.1 * stacks)\n',
+    'javascript': 'function timer(seconds) {\n  return seconds * 1000;\n}\n',
+    'lua': 'local function cast(spell)\n  return spell.cooldown > 0\nend\n',
+    'json': '{"boss": "Xavius", "phase": 2, "enrage": 480}\n',
+    'bash': 'for f in logs/*.txt; do\n  grep -c wipe "$f"\ndone\n',
+}
+
+
+@dataclass
+class Corpus:
+    """Paths of a generated corpus, by kind of document."""
+    root: Path
+    notes: list[Path]
+    huge: list[Path]
+    code: list[Path]
+    images: list[Path]
+    hints: list[Path]
+    image_files: list[Path]
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + '.'
+
+
+def _paragraph(rng: random.Random) -> str:
+    sentences = [_sentence(rng, rng.randint(6, 16)) for _ in range(rng.randint(2, 5))]
+    # Inline markup in a share of paragraphs, as in real notes
+    if rng.random() < 0.3:
+        sentences.append(f'See *{rng.choice(WORDS)}* and `{rng.choice(WORDS)}`.')
+    if rng.random() < 0.2:
+        sentences.append(f'[{rng.choice(WORDS)}](https://example.com/{rng.choice(WORDS)})')
+    return ' '.join(sentences)
+
+
+def _note(rng: random.Random, title: str, sections: int) -> str:
+    parts = [f'# {title}\n']
+    for i in range(sections):
+        parts.append(f'## {_sentence(rng, 3)[:-1]} {i}\n')
+        parts.append(_paragraph(rng) + '\n')
+        if rng.random() < 0.3:
+            parts.append('\n'.join(f'- {_sentence(rng, 5)}' for _ in range(4)) + '\n')
+        if rng.random() < 0.15:
+            parts.append('| phase | timer |\n|---|---|\n| 1 | 90 |\n| 2 | 120 |\n')
+    return '\n'.join(parts)
+
+
+def _code_page(rng: random.Random, title: str, blocks: int) -> str:
+    parts = [f'# {title}\n']
+    for i in range(blocks):
+        language = rng.choice(sorted(CODE_SAMPLES))
+        # Vary the code so blocks are not all highlight-cache hits
+        code = CODE_SAMPLES[language] * rng.randint(1, 4) + f'# block {i}\n'
+        parts.append(_paragraph(rng) + '\n')
+        parts.append(f'```{language}\n{code}```\n')
+    return '\n'.join(parts)
+
+
+def _image_page(rng: random.Random, title: str, pool: list[str], images: int) -> str:
+    parts = [f'# {title}\n']
+    for i in range(images):
+        parts.append(_paragraph(rng) + '\n')
+        parts.append(f'![{rng.choice(WORDS)} {i}](../img/{rng.choice(pool)})\n')
+    return '\n'.join(parts)
+
+
+def _hint_page(rng: random.Random, title: str, theme: str, variant: int) -> str:
+    body = _note(rng, title, 4)
+    if variant == 0:
+        return f'<!-- md2html-theme: {theme} -->\n{body}'
+    if variant == 1:
+        return f'---\ntitle: {title}\ntheme: {theme}\n---\n{body}'
+    if variant == 2:
+        return f'---\ntitle: {title}\nmd2html:\n  theme: {theme}\n---\n{body}'
+    # Front matter without a theme: --theme auto falls back to the default
+    return f'---\ntitle: {title}\ntags: [{rng.choice(WORDS)}]\n---\n{body}'
+
+
+def generate_corpus(root: Path, scale: int = 1, seed: int = 0) -> Corpus:
+    """
+    Write a synthetic corpus under root: many small notes, a few huge
+    documents, code-heavy and image-heavy pages, and theme-hint variants.
+    The same scale and seed always produce the same files.
+    """
+    if scale < 1:
+        raise ValueError(f"Scale must be at least 1, got {scale}")
+
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / CORPUS_MARKER).write_text(f'scale={scale} seed={seed}\n', encoding='utf-8')
+    theme_names = themes.names()
+
+    def write(rel: str, text: str) -> Path:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+        return path
+
+    image_files = []
+    (root / 'img').mkdir(parents=True, exist_ok=True)
+    for i in range(IMAGE_POOL_SIZE):
+        # Only size and suffix are validated, so the body need not decode
+        size = rng.choice((4, 16, 64, 256)) * 1024
+        path = root / 'img' / f'image-{i:02}.png'
+        path.write_bytes(PNG_SIGNATURE + rng.randbytes(size - len(PNG_SIGNATURE)))
+        image_files.append(path)
+    pool = [path.name for path in image_files]
+
+    corpus = Corpus(root, [], [], [], [], [], image_files)
+    for i in range(NOTE_COUNT * scale):
+        corpus.notes.append(write(f'notes/note-{i:04}.md', _note(rng, f'Note {i}', rng.randint(1, 4))))
+    for i in range(HUGE_DOC_COUNT):
+        corpus.huge.append(write(f'huge/huge-{i}.md', _note(rng, f'Huge {i}', HUGE_DOC_SECTIONS)))
+    for i in range(CODE_PAGE_COUNT * scale):
+        corpus.code.append(write(f'code/code-{i:03}.md', _code_page(rng, f'Code {i}', 30)))
+    for i in range(IMAGE_PAGE_COUNT * scale):
+        corpus.images.append(write(f'images/images-{i:03}.md', _image_page(rng, f'Images {i}', pool, 20)))
+    for i in range(HINT_PAGE_COUNT * scale):
+        theme = theme_names[i % len(theme_names)]
+        corpus.hints.append(write(f'hints/hint-{i:03}.md', _hint_page(rng, f'Hint {i}', theme, i % 4)))
+
+    logger.info(f"Generated corpus: {root} (scale {scale}, seed {seed})")
+    return corpus
+
+
+def clear_caches() -> None:
+    """Drop in-memory conversion caches so every run starts cold."""
+    configure_cache(None)
+    image_cache.memory.clear()
+    image_cache.hashes.clear()
+    highlight_cache.memory.clear()
+
+
+def time_runs(func: Callable[[], object], runs: int, number: int = 1) -> list[float]:
+    """Seconds per call of func, for each of runs runs of number calls."""
+    timings = []
+    for _ in range(runs):
+        clear_caches()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+def _convert_files(files: list[Path], out_dir: Path, theme: str) -> Callable[[], None]:
+    def run() -> None:
+        for md_file in files:
+            convert_markdown(md_file, out_dir / f'{md_file.stem}.html', theme, True, False)
+    return run
+
+
+def _serve_timings(root: Path, page: Path, runs: int) -> Optional[list[float]]:
+    """Seconds per request for SERVE_REQUESTS requests of page, or None without aiohttp."""
+    try:
+        from aiohttp import ClientSession, web
+        from aiohttp.test_utils import TestServer
+        from .server import FileCache, handle_file
+    except ImportError as e:
+        logger.warning(f"Skipping serve benchmark, missing dependency: {e.name}")
+        return None
+
+    async def measure() -> list[float]:
+        app = web.Application()
+        app['base_dir'] = root
+        app['files'] = FileCache()
+        app.router.add_get('/{path:.*}', handle_file)
+        server = TestServer(app)
+        await server.start_server()
+        url = server.make_url('/' + page.relative_to(root).as_posix())
+        headers = {'Accept-Encoding': 'gzip'}
+        timings = []
+        try:
+            async with ClientSession(auto_decompress=False) as session:
+                async def worker(count: int) -> None:
+                    for _ in range(count):
+                        async with session.get(url, headers=headers) as response:
+                            await response.read()
+
+                # Warm the server's caches, as a browser session would
+                await worker(1)
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    await asyncio.gather(*[
+                        worker(SERVE_REQUESTS // SERVE_CONCURRENCY)
+                        for _ in range(SERVE_CONCURRENCY)
+                    ])
+                    timings.append((time.perf_counter() - start) / SERVE_REQUESTS)
+        finally:
+            await server.close()
+        return timings
+
+    return asyncio.run(measure())
+
+
+def run_suite(
+    corpus: Corpus,
+    work_dir: Path,
+    runs: int = DEFAULT_RUNS,
+    jobs: int = 1,
+    only: Optional[set[str]] = None
+) -> dict:
+    """
+    Time each benchmark case on corpus, writing outputs under work_dir.
+    Caches are cleared before every run. Returns the results document.
+    """
+    if runs < 1:
+        raise ValueError(f"Runs must be at least 1, got {runs}")
+
+    out_dir = work_dir / 'out'
+    # process_images works on rendered HTML; one tag per image in the pool
+    html_images = '\n'.join(
+        f'<p><img alt="x" src="../img/{path.name}"></p>' for path in corpus.image_files
+    )
+
+    cases: dict[str, Callable[[], Optional[list[float]]]] = {
+        'convert_markdown/note': lambda: time_runs(
+            _convert_files(corpus.notes[:20], out_dir / 'notes', 'github'), runs),
+        'convert_markdown/huge': lambda: time_runs(
+            _convert_files(corpus.huge[:1], out_dir / 'huge', 'github'), runs),
+        'convert_markdown/code': lambda: time_runs(
+            _convert_files(corpus.code[:5], out_dir / 'code', 'github'), runs),
+        'convert_markdown/images': lambda: time_runs(
+            _convert_files(corpus.images[:5], out_dir / 'images', 'github'), runs),
+        'convert_markdown/hints': lambda: time_runs(
+            _convert_files(corpus.hints[:20], out_dir / 'hints', 'auto'), runs),
+        'convert_directory': lambda: time_runs(
+            lambda: convert_directory(
+                corpus.root, out_dir / 'site', 'auto', True, False, True,
+                jobs=jobs, force=True
+            ),
+            runs,
+        ),
+        'walk': lambda: time_runs(lambda: list(SourceWalker(corpus.root)), runs, 10),
+        'process_images': lambda: time_runs(
+            lambda: process_images(html_images, corpus.images[0].parent, True), runs),
+        'encode_image': lambda: time_runs(
+            lambda: [encode_image(path) for path in corpus.image_files], runs, 10),
+    }
+
+    results = {}
+    for name, case in cases.items():
+        if only and name not in only and name.split('/')[0] not in only:
+            continue
+        logger.info(f"Benchmark: {name}")
+        results[name] = summarize(case())
+
+    # Built pages - a note and one with embedded images - served from memory
+    for name, md_file in (('serve/note', corpus.notes[0]), ('serve/images', corpus.images[0])):
+        if only and name not in only and 'serve' not in only:
+            continue
+        page = out_dir / 'serve' / f'{md_file.stem}.html'
+        convert_markdown(md_file, page, 'github', True, False)
+        logger.info(f"Benchmark: {name}")
+        timings = _serve_timings(out_dir, page, runs)
+        if timings is not None:
+            results[name] = summarize(timings)
+
+    return {
+        'version': RESULTS_VERSION,
+        'md2html': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'runs': runs,
+        'jobs': jobs,
+        'corpus': {
+            'files': sum(1 for _ in corpus.root.rglob('*.md')),
+            'bytes': sum(path.stat().st_size for path in corpus.root.rglob('*') if path.is_file()),
+        },
+        'cases': results,
+    }
+
+
+def summarize(timings: list[float]) -> dict:
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+        'runs': len(timings),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Cases whose median is more than tolerance (0.2 = 20%) slower than in
+    the baseline. Cases missing from either side are not compared.
+    """
+    if tolerance < 0:
+        raise ValueError(f"Tolerance must not be negative, got {tolerance}")
+
+    regressions = []
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if previous is None:
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append({
+                'case': name,
+                'baseline_ms': previous['median_ms'],
+                'median_ms': current['median_ms'],
+                'ratio': ratio,
+            })
+    return regressions
+
+
+def format_results(results: dict, baseline: Optional[dict] = None) -> str:
+    """Table of the results, with the change against baseline when given."""
+    lines = [f'{"case":<26}{"median ms":>12}{"min ms":>10}{"max ms":>10}'
+             + (f'{"baseline":>12}{"change":>9}' if baseline else '')]
+    for name, entry in results['cases'].items():
+        line = (f'{name:<26}{entry["median_ms"]:>12.2f}'
+                f'{entry["min_ms"]:>10.2f}{entry["max_ms"]:>10.2f}')
+        previous = (baseline or {}).get('cases', {}).get(name)
+        if previous:
+            change = entry['median_ms'] / previous['median_ms'] - 1 if previous['median_ms'] else 0.0
+            line += f'{previous["median_ms"]:>12.2f}{change:>+9.1%}'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def load_results(path: Path) -> dict:
+    """Read a results or baseline file."""
+    if not path.exists():
+        raise FileNotFoundError(f"Baseline not found: {path}")
+    data = json.loads(path.read_text(encoding='utf-8'))
+    if data.get('version') != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results version in {path}: {data.get('version')}")
+    return data
+
+
+def write_results(results: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+
+
+def run_benchmarks(
+    scale: int = 1,
+    seed: int = 0,
+    runs: int = DEFAULT_RUNS,
+    jobs: int = 1,
+    corpus_dir: Optional[Path] = None,
+    only: Optional[set[str]] = None
+) -> dict:
+    """
+    Generate a corpus - in corpus_dir, kept, or in a temporary directory -
+    and run the suite on it.
+    """
+    tmp = Path(tempfile.mkdtemp(prefix='md2html-bench-'))
+    try:
+        root = corpus_dir or tmp / 'corpus'
+        if corpus_dir is not None and corpus_dir.exists() and any(corpus_dir.iterdir()):
+            if not (corpus_dir / CORPUS_MARKER).exists():
+                raise ValueError(f"Not a generated corpus, refusing to replace: {corpus_dir}")
+            # Regenerate: a stale corpus would not match the seed and scale
+            shutil.rmtree(corpus_dir)
+        corpus = generate_corpus(root, scale, seed)
+        results = run_suite(corpus, tmp, runs, jobs, only)
+        results['scale'] = scale
+        results['seed'] = seed
+        return results
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
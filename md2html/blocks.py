@@ -0,0 +1,146 @@
+"""
+Top-level block boundaries, for rendering a Markdown body in pieces.
+Splits only where Python-Markdown would start a fresh block anyway;
+anything doubtful stays in the same piece.
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from markdown.util import BLOCK_LEVEL_ELEMENTS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Characters of Markdown gathered before looking for the next boundary
+PIECE_CHARS = 1024 * 1024
+
+SCAN_BYTES = 1024 * 1024
+
+# Link references, footnotes and abbreviations are defined once and
+# apply to the whole document, from inside lists and quotes too. A
+# superset of what Python-Markdown accepts: a false match only means
+# the document is rendered whole.
+DEFINITION_RE = re.compile(rb'^[ \t>*+\-0-9.)]*\[[^\]\n]*\]:', re.MULTILINE)
+
+FENCE_RE = re.compile(r'`{3,}|~{3,}')
+DEFINITION_LINE_RE = re.compile(r' {0,3}:[ \t]')
+HTML_TAG_RE = re.compile(r'<([A-Za-z][A-Za-z0-9\-]*)')
+
+# Lines that carry on the block before them across a blank line: list
+# items and quotes join the previous list or quote, ':' continues a
+# definition list, indented lines belong to the block above
+CONTINUATION_RE = re.compile(r'[\s>:]|(?:[*+\-]|\d+[.)])(?:[ \t]|$)')
+
+# Raw HTML blocks run to their closing tag, blank lines and all
+_HTML_BLOCK_TAGS = frozenset(BLOCK_LEVEL_ELEMENTS) - {'hr'}
+
+
+def has_definitions(path: Path, offset: int = 0) -> bool:
+    """
+    Whether the file, from byte offset on, may define link references,
+    footnotes or abbreviations. Read in bounded blocks of whole lines.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        carry = b''
+        while block := f.read(SCAN_BYTES):
+            block = carry + block
+            end = block.rfind(b'\n') + 1
+            if DEFINITION_RE.search(block, 0, end):
+                return True
+            carry = block[end:]
+        return DEFINITION_RE.search(carry) is not None
+
+
+def _html_depth(tag: str, line: str, opening: bool = False) -> int:
+    """
+    Opening minus closing tags of one name on a line. Past the opening
+    line, closing tags only count on a line that starts with one:
+    '</div>' inside a script's string closes nothing, and a block left
+    open only means fewer cuts.
+    """
+    lowered = line.lower()
+    opened = len(re.findall(rf'<{tag}(?=[\s/>]|$)', lowered))
+    if not opening and not lowered.lstrip().startswith('</'):
+        return opened
+    return opened - len(re.findall(rf'</{tag}\s*>', lowered))
+
+
+def split_blocks(lines: Iterable[str], piece_chars: int = PIECE_CHARS) -> Iterator[str]:
+    """
+    Join lines into pieces of at least piece_chars characters, cut only
+    before a line that starts a new top-level block: after a blank line,
+    at column 0, outside fenced code, raw HTML blocks and comments, and
+    not a list item, quote or definition that would join the block
+    before it, nor right after a definition list, which the next term
+    would join. Lines keep their line endings; the pieces add up to the
+    input. A piece is as long as it has to be: one long fenced block is
+    one piece.
+    """
+    piece: list[str] = []
+    size = 0
+    fence = None
+    html_tag = None
+    html_depth = 0
+    comment = False
+    after_blank = False
+    # Whether the block being read, and the one before it, define terms
+    definitions = False
+    after_definitions = False
+
+    for line in lines:
+        # Whitespace-only lines are blank to Python-Markdown; other spaces are not
+        blank = not line.strip(' \t\r\n')
+        if after_blank and not blank:
+            after_definitions = definitions
+            # An indented block is still part of the list above it
+            if not line[0].isspace():
+                definitions = False
+        if (
+            size >= piece_chars
+            and after_blank
+            and not blank
+            and not after_definitions
+            and fence is None
+            and html_tag is None
+            and not comment
+            and not CONTINUATION_RE.match(line)
+        ):
+            yield ''.join(piece)
+            piece = []
+            size = 0
+
+        piece.append(line)
+        size += len(line)
+        after_blank = blank
+
+        if fence is not None:
+            # Closed only by the same fence, as in the fenced_code extension
+            if line.rstrip('\r\n').rstrip(' ') == fence:
+                fence = None
+        elif comment:
+            comment = '-->' not in line
+        elif html_tag is not None:
+            html_depth += _html_depth(html_tag, line)
+            if html_depth <= 0:
+                html_tag = None
+        elif line.startswith('<'):
+            if line.startswith('<!--'):
+                comment = '-->' not in line[4:]
+                continue
+            match = HTML_TAG_RE.match(line)
+            if match and match.group(1).lower() in _HTML_BLOCK_TAGS:
+                tag = match.group(1).lower()
+                depth = _html_depth(tag, line, opening=True)
+                if depth > 0:
+                    html_tag, html_depth = tag, depth
+        elif match := FENCE_RE.match(line):
+            fence = match.group(0)
+        elif DEFINITION_LINE_RE.match(line):
+            definitions = True
+
+    if piece:
+        yield ''.join(piece)
@@ -0,0 +1,140 @@
+"""
+Bounded caches shared by the converter.
+In-memory LRU plus an optional on-disk store, both limited by bytes.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its values.
+    Values larger than the whole budget are never stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskCache:
+    """
+    Directory of cached blobs, one file per key.
+    Reads refresh a file's mtime; prune() evicts the least recently
+    used files until the directory fits in max_bytes.
+    Safe to share between processes: writes are atomic renames.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except OSError as e:
+            logger.warning(f"Cannot write cache entry {path}: {e}")
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+    def prune(self) -> int:
+        """Evict least recently used entries. Returns the number removed."""
+        entries = []
+        total = 0
+        for path in self.directory.glob('*/*'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.debug(f"Pruned {removed} entries from {self.directory}")
+        return removed
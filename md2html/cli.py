@@ -5,13 +5,47 @@ Explicit configuration, no fallbacks, no magic.
 
 import sys
 from pathlib import Path
+from typing import Optional
 import click
 
-from .converter import AVAILABLE_THEMES, convert_markdown, convert_directory
-from .watcher import watch_directory
-from .server import serve_directory
+from .registry import themes
 
-THEME_CHOICES = sorted(AVAILABLE_THEMES) + ['auto']
+# Built-in themes plus any directories listed in MD2HTML_THEME_PATH
+THEME_CHOICES = themes.names() + ['auto']
+
+
+def _missing_dependency(error: ImportError) -> None:
+    """Report a subcommand dependency that is not installed."""
+    click.echo(f"Error: Missing required dependency: {error.name}", err=True)
+    click.echo("Install with: pip install click markdown watchdog aiohttp", err=True)
+    sys.exit(1)
+
+
+def _start_metrics(
+    profile: bool,
+    profile_memory: bool,
+    metrics_out: Optional[str],
+    keep_profiles: bool = True
+):
+    """Enable stage profiling when asked to. Returns the run report or None."""
+    if not (profile or profile_memory or metrics_out):
+        return None
+    from . import metrics
+    metrics.enable(memory=profile_memory)
+    report = metrics.RunReport(keep_profiles)
+    metrics.add_hook(report.add)
+    return report
+
+
+def _finish_metrics(report, profile: bool, metrics_out: Optional[str]) -> None:
+    """Write the metrics file and print the summary, as requested."""
+    if report is None:
+        return
+    if metrics_out:
+        report.write(Path(metrics_out).resolve())
+        click.echo(f"Metrics: {Path(metrics_out).resolve()}")
+    if profile or not metrics_out:
+        click.echo(report.format())
 
 
 @click.group()
@@ -27,28 +61,123 @@ def cli():
 
 
 @cli.command()
-@click.argument('source', type=click.Path(exists=True, readable=True))
-@click.option('--output', '-o', required=True, type=click.Path(),
-              help='Output path (required)')
+@click.argument('source', type=click.Path(exists=True, readable=True, allow_dash=True))
+@click.option('--output', '-o', type=click.Path(allow_dash=True), default=None,
+              help='Output path (required, except with SOURCE - where the default is stdout)')
 @click.option('--theme', '-t',
               type=click.Choice(THEME_CHOICES),
-              required=True,
-              help='Theme to use (required)')
+              default=None,
+              help='Theme to use (required, unless --themes is given)')
+@click.option('--themes', 'theme_list', metavar='A,B,...', default=None,
+              help='Render once and write one output per theme, under OUTPUT/<theme> for a '
+                   'directory or next to OUTPUT in <theme>/ for a file')
 @click.option('--embed-images/--link-images', default=True,
               help='Embed images as base64 (default: embed)')
+@click.option('--assets', type=click.Choice(['inline', 'hashed']), default='inline',
+              help='hashed: copy images to _assets/<hash>.<ext> and link them '
+                   '(default: inline, per --embed-images/--link-images)')
+@click.option('--css', type=click.Choice(['inline', 'external']), default='inline',
+              help='external: link one shared, minified stylesheet per theme (default: inline)')
+@click.option('--gzip', 'precompress', is_flag=True, default=False,
+              help='Also write page.html.gz for md2html serve (default: no)')
 @click.option('--toc/--no-toc', default=False,
               help='Generate table of contents (default: no)')
 @click.option('--recursive/--no-recursive', default=False,
               help='Process subdirectories (default: no)')
-def convert(source, output, theme, embed_images, toc, recursive):
+@click.option('--exclude', 'excludes', multiple=True, metavar='PATTERN',
+              help='Skip sources matching PATTERN (.gitignore syntax, relative to SOURCE); repeatable')
+@click.option('--gitignore/--no-gitignore', default=True,
+              help='Skip sources ignored by .gitignore files (default: yes)')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None,
+              help='Worker processes for directories (default: CPU count) '
+                   'and --batch-ndjson (default: 1)')
+@click.option('--batch-ndjson', is_flag=True, default=False,
+              help='With SOURCE -: read {id, markdown, theme, base_dir} records, one JSON '
+                   'object per line, and write {id, html} or {id, error} records to stdout')
+@click.option('--base-dir', type=click.Path(exists=True, file_okay=False), default=None,
+              help='With SOURCE -: resolve local images against DIR (default: leave them as written)')
+@click.option('--keep-going/--fail-fast', default=False,
+              help='Report all failures instead of stopping at the first (default: fail fast)')
+@click.option('--force', is_flag=True, default=False,
+              help='Rebuild every file, ignoring the build manifest')
+@click.option('--prune', is_flag=True, default=False,
+              help='Delete outputs whose source file was removed (default: report only)')
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=None,
+              help='Persist image and code-highlight caches in this directory (default: memory only)')
+@click.option('--stream-threshold', type=click.IntRange(min=0), default=64, metavar='MB',
+              help='Render files larger than MB megabytes in pieces, writing as they render, '
+                   'so memory stays bounded (default: 64; 0: every file)')
+@click.option('--profile', is_flag=True, default=False,
+              help='Time each conversion stage and print a summary')
+@click.option('--profile-memory', is_flag=True, default=False,
+              help='Also record tracemalloc peak memory per stage (slower)')
+@click.option('--metrics-out', type=click.Path(dir_okay=False), default=None,
+              help='Write per-file and per-stage timings to FILE (.ndjson: one line per file, else JSON)')
+def convert(source, output, theme, theme_list, embed_images, assets, css, precompress, toc,
+            recursive, excludes, gitignore, jobs, batch_ndjson, base_dir, keep_going, force, prune,
+            cache_dir, stream_threshold, profile, profile_memory, metrics_out):
     """
     Convert markdown files to HTML.
     
-    All paths must be explicit. No auto-detection.
+    All paths must be explicit. No auto-detection. SOURCE - reads
+    Markdown from stdin and writes the page to stdout, or to --output.
     """
+    if (theme is None) == (theme_list is None):
+        click.echo("Error: Give either --theme or --themes", err=True)
+        sys.exit(1)
+    
+    if source == '-':
+        if theme_list is not None:
+            click.echo("Error: --themes needs files; with stdin use --theme", err=True)
+            sys.exit(1)
+        _convert_stdin(output, theme, embed_images, assets, css, precompress, toc, jobs,
+                       batch_ndjson, base_dir, cache_dir)
+        return
+    
+    if batch_ndjson or base_dir:
+        click.echo("Error: --batch-ndjson and --base-dir need SOURCE - (stdin)", err=True)
+        sys.exit(1)
+    
+    if output is None or output == '-':
+        click.echo("Error: --output is required unless SOURCE is - (stdin)", err=True)
+        sys.exit(1)
+    
+    # Subcommand dependencies load here, not at CLI startup
+    try:
+        from . import metrics
+        from .converter import (
+            ThemeOutput,
+            configure_cache,
+            configure_streaming,
+            convert_directory,
+            convert_directory_themes,
+            convert_markdown_themes,
+            prune_caches,
+            validate_themes,
+        )
+        from .images import AssetStore
+        from .styles import StylesheetStore
+    except ImportError as e:
+        _missing_dependency(e)
+    
     source_path = Path(source).resolve()
     output_path = Path(output).resolve()
     
+    theme_names = None
+    if theme_list is not None:
+        theme_names = [name.strip().lower() for name in theme_list.split(',') if name.strip()]
+        try:
+            validate_themes(theme_names)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+    
+    if cache_dir:
+        configure_cache(Path(cache_dir).resolve())
+    configure_streaming(stream_threshold * 1024 * 1024)
+    
+    report = _start_metrics(profile, profile_memory, metrics_out)
+    
     # Strict validation - no guessing
     if source_path.is_file():
         if not source_path.suffix in ['.md', '.markdown']:
@@ -59,14 +188,35 @@ def convert(source, output, theme, embed_images, toc, recursive):
             click.echo(f"Error: Output must be an HTML file when source is a file", err=True)
             sys.exit(1)
         
-        # Convert single file
+        # Convert single file - once, however many themes it is written in
+        if theme_names is None:
+            targets = {theme: output_path}
+        else:
+            targets = {name: output_path.parent / name / output_path.name for name in theme_names}
         try:
             click.echo(f"Converting: {source_path}")
-            convert_markdown(source_path, output_path, theme, embed_images, toc)
-            click.echo(f"Success: {output_path}")
+            outputs = [
+                ThemeOutput(
+                    name, html_file,
+                    AssetStore(html_file.parent) if assets == 'hashed' else None,
+                    StylesheetStore(html_file.parent) if css == 'external' else None,
+                )
+                for name, html_file in targets.items()
+            ]
+            results = convert_markdown_themes(
+                source_path, outputs, embed_images, toc, precompress
+            )
+            metrics.record(results[0].profile)
+            for target in outputs:
+                if target.assets is not None:
+                    target.assets.flush()
+            prune_caches()
+            for result in results:
+                click.echo(f"Success: {result.output}" + ("" if result.written else " (unchanged)"))
         except Exception as e:
             click.echo(f"Error: {e}", err=True)
             sys.exit(1)
+        _finish_metrics(report, profile, metrics_out)
     
     elif source_path.is_dir():
         if output_path.exists() and output_path.is_file():
@@ -76,17 +226,179 @@ def convert(source, output, theme, embed_images, toc, recursive):
         # Convert directory
         try:
             click.echo(f"Converting directory: {source_path}")
-            count = convert_directory(source_path, output_path, theme, embed_images, toc, recursive)
-            click.echo(f"Success: Converted {count} files to {output_path}")
+            build_options = dict(
+                jobs=jobs, keep_going=keep_going, force=force, prune=prune,
+                hashed_assets=assets == 'hashed', external_css=css == 'external',
+                precompress=precompress, excludes=excludes, gitignore=gitignore
+            )
+            if theme_names is None:
+                summaries = {theme: convert_directory(
+                    source_path, output_path, theme, embed_images, toc, recursive,
+                    **build_options
+                )}
+                trees = {theme: output_path}
+            else:
+                summaries = convert_directory_themes(
+                    source_path, output_path, theme_names, embed_images, toc, recursive,
+                    **build_options
+                )
+                trees = {name: output_path / name for name in theme_names}
+            walk = next(iter(summaries.values())).walk
+            click.echo(
+                f"Found {walk.files} markdown files in {walk.directories} directories "
+                f"({walk.seconds * 1000:.1f} ms walking; {walk.pruned} directories and "
+                f"{walk.excluded} files excluded)"
+            )
+            for name, summary in summaries.items():
+                click.echo(
+                    f"Success: Converted {summary.converted} files to {trees[name]} "
+                    f"({summary.written} written, {summary.unchanged} unchanged, "
+                    f"{summary.skipped} skipped as up to date)"
+                )
         except Exception as e:
+            # Timings of the files that did convert are still reported
+            _finish_metrics(report, profile, metrics_out)
             click.echo(f"Error: {e}", err=True)
             sys.exit(1)
+        _finish_metrics(report, profile, metrics_out)
     
     else:
         click.echo(f"Error: Invalid source: {source_path}", err=True)
         sys.exit(1)
 
 
+def _convert_stdin(output, theme, embed_images, assets, css, precompress, toc, jobs,
+                   batch_ndjson, base_dir, cache_dir):
+    """Render Markdown from stdin: one document, or NDJSON records with --batch-ndjson."""
+    if assets != 'inline' or css != 'inline':
+        click.echo("Error: --assets hashed and --css external need files; not with stdin", err=True)
+        sys.exit(1)
+    
+    try:
+        from .converter import configure_cache, render
+        from .output import write_if_changed
+    except ImportError as e:
+        _missing_dependency(e)
+    
+    base_path = Path(base_dir).resolve() if base_dir else None
+    cache_path = Path(cache_dir).resolve() if cache_dir else None
+    if cache_path:
+        configure_cache(cache_path)
+    
+    if batch_ndjson:
+        if output not in (None, '-') or precompress:
+            click.echo("Error: --batch-ndjson writes records to stdout; no --output or --gzip", err=True)
+            sys.exit(1)
+        from .batch import render_stream
+        records = failed = 0
+        out = sys.stdout
+        # Each record is flushed as soon as it is rendered, for consumers waiting on it
+        for line, error in render_stream(sys.stdin.buffer, theme, toc, embed_images, base_path,
+                                         jobs or 1, cache_path):
+            out.write(line + '\n')
+            out.flush()
+            records += 1
+            if error is not None:
+                failed += 1
+        if failed:
+            click.echo(f"Error: {failed} of {records} records failed", err=True)
+            sys.exit(1)
+        return
+    
+    if precompress and output in (None, '-'):
+        click.echo("Error: --gzip needs an --output file", err=True)
+        sys.exit(1)
+    
+    try:
+        text = sys.stdin.buffer.read().decode('utf-8')
+    except UnicodeDecodeError:
+        click.echo("Error: stdin is not valid UTF-8", err=True)
+        sys.exit(1)
+    
+    try:
+        final_html = render(text, theme, toc, base_path, embed_images)
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    
+    data = final_html.encode('utf-8')
+    if output is None or output == '-':
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        return
+    
+    output_path = Path(output).resolve()
+    if output_path.is_dir() or output_path.suffix not in ['.html', '.htm']:
+        click.echo(f"Error: Output must be an HTML file when source is -", err=True)
+        sys.exit(1)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    written = write_if_changed(output_path, data)
+    if precompress:
+        from .converter import write_gzip
+        write_gzip(output_path, data, written)
+    click.echo(f"Success: {output_path}" + ("" if written else " (unchanged)"), err=True)
+
+
+@cli.command()
+@click.argument('source', type=click.Path(exists=True, readable=True))
+@click.option('--theme', '-t',
+              type=click.Choice(THEME_CHOICES),
+              default='auto',
+              help='Theme convert would be given (default: auto)')
+@click.option('--recursive/--no-recursive', default=False,
+              help='Process subdirectories (default: no)')
+@click.option('--exclude', 'excludes', multiple=True, metavar='PATTERN',
+              help='Skip sources matching PATTERN, as convert does; repeatable')
+@click.option('--gitignore/--no-gitignore', default=True,
+              help='Skip sources ignored by .gitignore files (default: yes)')
+@click.option('--json', 'as_json', is_flag=True, default=False,
+              help='One JSON object per file instead of a table')
+def inspect(source, theme, recursive, excludes, gitignore, as_json):
+    """
+    List the theme each markdown file would be rendered with.
+    
+    Reads only the head of each file; nothing is rendered or written.
+    Exits with status 1 if any file has invalid theme metadata.
+    """
+    import json
+    from .metadata import read_metadata, resolve_theme
+    from .sources import SourceWalker
+    
+    source_path = Path(source).resolve()
+    if source_path.is_dir():
+        # The same files convert would convert, listed as they are found
+        md_files = SourceWalker(source_path, recursive, excludes, gitignore)
+        base_dir = source_path
+    else:
+        md_files = [source_path]
+        base_dir = source_path.parent
+    
+    failed = 0
+    count = 0
+    for md_file in md_files:
+        count += 1
+        name = md_file.relative_to(base_dir).as_posix()
+        try:
+            meta = read_metadata(md_file)
+            resolved = resolve_theme(theme, meta, md_file)
+            origin = meta.source or ('default' if theme == 'auto' else 'option')
+            error = None
+        except (OSError, ValueError) as e:
+            resolved, origin, error = None, None, str(e)
+            failed += 1
+        
+        if as_json:
+            click.echo(json.dumps({'path': name, 'theme': resolved, 'source': origin, 'error': error}))
+        elif error is not None:
+            click.echo(f"{name}\terror\t{error}")
+        else:
+            click.echo(f"{name}\t{resolved}\t{origin}")
+    
+    if failed:
+        click.echo(f"Error: Invalid theme metadata in {failed} of {count} files", err=True)
+        sys.exit(1)
+
+
 @cli.command()
 @click.argument('directory', type=click.Path(exists=True, file_okay=False, readable=True))
 @click.option('--output', '-o', required=True, type=click.Path(),
@@ -95,18 +407,39 @@ def convert(source, output, theme, embed_images, toc, recursive):
               type=click.Choice(THEME_CHOICES),
               required=True,
               help='Theme to use (required)')
-@click.option('--interval', type=float, default=1.0,
-              help='Check interval in seconds (default: 1.0)')
+@click.option('--interval', type=click.FloatRange(min=0), default=1.0,
+              help='Quiet period in seconds before queued changes are rebuilt (default: 1.0)')
 @click.option('--recursive/--no-recursive', default=False,
               help='Watch subdirectories (default: no)')
-def watch(directory, output, theme, interval, recursive):
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None,
+              help='Worker processes for large rebuild batches (default: CPU count)')
+@click.option('--backend', type=click.Choice(['native', 'poll']), default='native',
+              help='native: OS change events; poll: check every --interval seconds, '
+                   'for NFS/SMB and container mounts (default: native)')
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=None,
+              help='Persist image and code-highlight caches in this directory (default: memory only)')
+@click.option('--profile', is_flag=True, default=False,
+              help='Time each conversion stage and print a summary')
+@click.option('--profile-memory', is_flag=True, default=False,
+              help='Also record tracemalloc peak memory per stage (slower)')
+@click.option('--metrics-out', type=click.Path(dir_okay=False), default=None,
+              help='Write per-stage timings to FILE after each rebuild '
+                   '(.ndjson: one line per batch plus a final summary, else JSON)')
+def watch(directory, output, theme, interval, recursive, jobs, backend, cache_dir,
+          profile, profile_memory, metrics_out):
     """
     Watch directory for changes and auto-convert.
     
     Output directory must be specified explicitly.
     """
+    try:
+        from .watcher import watch_directory
+    except ImportError as e:
+        _missing_dependency(e)
+    
     dir_path = Path(directory).resolve()
     out_path = Path(output).resolve()
+    cache_path = Path(cache_dir).resolve() if cache_dir else None
     
     if not dir_path.exists():
         click.echo(f"Error: Directory not found: {dir_path}", err=True)
@@ -117,45 +450,126 @@ def watch(directory, output, theme, interval, recursive):
     click.echo(f"Theme: {theme}")
     click.echo(f"Press Ctrl+C to stop")
     
+    # The report covers the whole session in bounded memory: each batch
+    # appends a line to an NDJSON report, or rewrites the JSON summary
+    report = _start_metrics(profile, profile_memory, metrics_out, keep_profiles=False)
+    after_batch = None
+    if report is not None and metrics_out:
+        after_batch = lambda: report.write_batch(Path(metrics_out).resolve())
+    
     try:
-        watch_directory(dir_path, out_path, theme, interval, recursive)
+        watch_directory(dir_path, out_path, theme, interval, recursive,
+                        jobs=jobs, cache_dir=cache_path, backend=backend,
+                        after_batch=after_batch)
     except KeyboardInterrupt:
         click.echo("\nStopped watching.")
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         sys.exit(1)
+    finally:
+        _finish_metrics(report, profile, metrics_out)
 
 
 @cli.command()
-@click.argument('directory', type=click.Path(exists=True, file_okay=False, readable=True))
+@click.argument('directory', required=False,
+                type=click.Path(exists=True, file_okay=False, readable=True))
+@click.option('--source', default=None,
+              type=click.Path(exists=True, file_okay=False, readable=True),
+              help='Markdown directory to render on request instead of serving built HTML')
+@click.option('--theme', '-t', type=click.Choice(THEME_CHOICES), default=None,
+              help='Theme for rendered pages (required with --source)')
+@click.option('--toc/--no-toc', default=False,
+              help='Generate table of contents for rendered pages (default: no)')
 @click.option('--port', '-p', type=int, default=8000,
               help='Port to serve on (default: 8000)')
 @click.option('--host', '-h', default='127.0.0.1',
               help='Host to bind to (default: 127.0.0.1)')
-def serve(directory, port, host):
+def serve(directory, source, theme, toc, port, host):
     """
     Serve HTML files from directory.
     
-    Directory must contain HTML files. No conversion performed.
+    Directory must contain HTML files. With --source DIR instead, each
+    /path.html is rendered from DIR/path.md when requested and cached.
     """
-    dir_path = Path(directory).resolve()
+    if (directory is None) == (source is None):
+        click.echo("Error: Give either DIRECTORY or --source DIR", err=True)
+        sys.exit(1)
+    
+    if source is not None and theme is None:
+        click.echo("Error: --theme is required with --source", err=True)
+        sys.exit(1)
+    
+    try:
+        from .server import serve_directory
+    except ImportError as e:
+        _missing_dependency(e)
+    
+    dir_path = Path(directory or source).resolve()
     
     if not dir_path.exists():
         click.echo(f"Error: Directory not found: {dir_path}", err=True)
         sys.exit(1)
     
-    # Check for HTML files
-    html_files = list(dir_path.glob('**/*.html'))
-    if not html_files:
-        click.echo(f"Error: No HTML files found in {dir_path}", err=True)
+    if source is None:
+        # Check for HTML files
+        html_files = list(dir_path.glob('**/*.html'))
+        if not html_files:
+            click.echo(f"Error: No HTML files found in {dir_path}", err=True)
+            sys.exit(1)
+    
+    click.echo(f"Serving: {dir_path}")
+    if source is not None:
+        click.echo(f"Rendering markdown on request [theme={theme}]")
+    click.echo(f"URL: http://{host}:{port}")
+    click.echo(f"Press Ctrl+C to stop")
+    
+    try:
+        serve_directory(dir_path, host, port, theme=theme, toc=toc)
+    except KeyboardInterrupt:
+        click.echo("\nServer stopped.")
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
         sys.exit(1)
+
+
+@cli.command()
+@click.argument('source', type=click.Path(exists=True, file_okay=False, readable=True))
+@click.option('--theme', '-t',
+              type=click.Choice(THEME_CHOICES),
+              required=True,
+              help='Theme to use (required)')
+@click.option('--toc/--no-toc', default=False,
+              help='Generate table of contents (default: no)')
+@click.option('--port', '-p', type=int, default=8000,
+              help='Port to serve on (default: 8000)')
+@click.option('--host', '-h', default='127.0.0.1',
+              help='Host to bind to (default: 127.0.0.1)')
+@click.option('--backend', type=click.Choice(['native', 'poll']), default='native',
+              help='native: OS change events; poll: check every --interval seconds, '
+                   'for NFS/SMB and container mounts (default: native)')
+@click.option('--interval', type=click.FloatRange(min=0), default=0.5,
+              help='Poll period in seconds for --backend poll (default: 0.5)')
+def dev(source, theme, toc, port, host, backend, interval):
+    """
+    Render, serve and live-reload a markdown tree.
+    
+    Pages are rendered on request and kept in memory; nothing is
+    written to disk. Open pages reload when their source, images or theme change.
+    """
+    try:
+        from .dev import dev_server
+    except ImportError as e:
+        _missing_dependency(e)
+    
+    dir_path = Path(source).resolve()
     
     click.echo(f"Serving: {dir_path}")
     click.echo(f"URL: http://{host}:{port}")
+    click.echo(f"Theme: {theme}")
     click.echo(f"Press Ctrl+C to stop")
     
     try:
-        serve_directory(dir_path, host, port)
+        dev_server(dir_path, theme, toc, host, port, backend=backend, interval=interval)
     except KeyboardInterrupt:
         click.echo("\nServer stopped.")
     except Exception as e:
@@ -163,5 +577,104 @@ def serve(directory, port, host):
         sys.exit(1)
 
 
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), default=None,
+              help='Unix socket to listen on (default: per-user runtime directory)')
+@click.option('--port', '-p', type=click.IntRange(min=0, max=65535), default=None,
+              help='Listen on 127.0.0.1:PORT instead of a Unix socket (0: any free port)')
+@click.option('--theme', '-t', type=click.Choice(THEME_CHOICES), default=None,
+              help='Theme to preload (default: manaforge)')
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=None,
+              help='Persist image and code-highlight caches in this directory (default: memory only)')
+def daemon(socket_path, port, theme, cache_dir):
+    """
+    Keep a warm converter running for wrappers and editors.
+    
+    Serves JSON convert requests on a local socket until stopped with
+    Ctrl+C or `md2html-client stop`. Clients find the daemon through a
+    per-user state file holding its address and access token.
+    """
+    try:
+        from .daemon import run_daemon
+    except ImportError as e:
+        _missing_dependency(e)
+    
+    click.echo(f"Press Ctrl+C to stop")
+    
+    try:
+        run_daemon(
+            Path(socket_path).resolve() if socket_path else None,
+            port,
+            Path(cache_dir).resolve() if cache_dir else None,
+            theme
+        )
+    except KeyboardInterrupt:
+        click.echo("\nDaemon stopped.")
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--scale', type=click.IntRange(min=1), default=1,
+              help='Corpus size multiplier; 1 is about 270 files (default: 1)')
+@click.option('--seed', type=int, default=0,
+              help='Seed of the generated corpus (default: 0)')
+@click.option('--runs', type=click.IntRange(min=1), default=5,
+              help='Timed runs per case; the median is reported (default: 5)')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1,
+              help='Worker processes for the convert_directory case (default: 1)')
+@click.option('--only', multiple=True,
+              help='Run only this case or group, e.g. convert_markdown or serve (repeatable)')
+@click.option('--corpus', type=click.Path(file_okay=False), default=None,
+              help='Generate the corpus into this directory and keep it (default: temporary)')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None,
+              help='Write results as JSON to FILE')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Compare against results saved with --output')
+@click.option('--tolerance', type=click.FloatRange(min=0), default=0.2,
+              help='Allowed slowdown of a median against the baseline, 0.2 = 20% (default: 0.2)')
+def bench(scale, seed, runs, jobs, only, corpus, output, baseline, tolerance):
+    """
+    Benchmark conversion and serving on a generated corpus.
+    
+    The corpus is synthetic and seeded, so results are comparable
+    across runs. Exits with status 1 when a case regressed against
+    --baseline by more than --tolerance.
+    """
+    try:
+        from .bench import compare, format_results, load_results, run_benchmarks, write_results
+    except ImportError as e:
+        _missing_dependency(e)
+    
+    try:
+        previous = load_results(Path(baseline).resolve()) if baseline else None
+        results = run_benchmarks(
+            scale, seed, runs, jobs,
+            corpus_dir=Path(corpus).resolve() if corpus else None,
+            only=set(only) or None
+        )
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    
+    click.echo(format_results(results, previous))
+    if output:
+        write_results(results, Path(output).resolve())
+        click.echo(f"Results: {Path(output).resolve()}")
+    
+    if previous is not None:
+        regressions = compare(results, previous, tolerance)
+        for item in regressions:
+            click.echo(
+                f"REGRESSION: {item['case']} {item['median_ms']:.2f} ms "
+                f"vs {item['baseline_ms']:.2f} ms baseline ({item['ratio'] - 1:+.1%})",
+                err=True
+            )
+        if regressions:
+            sys.exit(1)
+        click.echo(f"No regressions beyond {tolerance:.0%}")
+
+
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,243 @@
+"""
+Thin client for `md2html daemon`.
+Standard library only, so a call costs an interpreter start and a
+socket round trip, not the Markdown stack.
+
+Usage: python -m md2html.client [--if-running] convert SOURCE -o OUTPUT -t THEME [options]
+       python -m md2html.client ping | stop
+Exits with status 3 when no daemon is running, so callers can fall
+back to `md2html convert`.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import Optional
+
+PROTOCOL_VERSION = 1
+
+STATE_FILE_NAME = 'daemon.json'
+SOCKET_NAME = 'daemon.sock'
+STATE_PATH_ENV = 'MD2HTML_DAEMON_STATE'
+
+EXIT_NO_DAEMON = 3
+
+
+class DaemonError(Exception):
+    """The daemon answered a request with an error."""
+
+
+class DaemonUnavailable(DaemonError):
+    """No daemon is listening at the recorded address."""
+
+
+def runtime_dir() -> Path:
+    """Per-user directory for the daemon's socket and state file."""
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base:
+        return Path(base) / 'md2html'
+    return Path.home() / '.cache' / 'md2html'
+
+
+def daemon_state_path() -> Path:
+    """Where a running daemon records its address and token."""
+    override = os.environ.get(STATE_PATH_ENV)
+    return Path(override) if override else runtime_dir() / STATE_FILE_NAME
+
+
+def default_socket_path() -> Path:
+    return runtime_dir() / SOCKET_NAME
+
+
+class DaemonClient:
+    """
+    Connection to a daemon. Requests are sent one at a time over one
+    connection, opened on first use and reopened if the daemon closed it.
+    """
+
+    def __init__(self, address: str, token: str, timeout: Optional[float] = None):
+        self.address = address
+        self.token = token
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._next_id = 0
+
+    @classmethod
+    def from_state(cls, state_path: Optional[Path] = None) -> Optional['DaemonClient']:
+        """Client for the daemon in the state file, or None if there is none."""
+        state_path = state_path or daemon_state_path()
+        try:
+            state = json.loads(state_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if state.get('protocol') != PROTOCOL_VERSION:
+            return None
+        return cls(state['address'], state['token'])
+
+    def _connect(self) -> None:
+        kind, _, location = self.address.partition(':')
+        try:
+            if kind == 'unix':
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.settimeout(self.timeout)
+                    sock.connect(location)
+                except OSError:
+                    sock.close()
+                    raise
+            elif kind == 'tcp':
+                host, _, port = location.rpartition(':')
+                sock = socket.create_connection((host, int(port)), timeout=self.timeout)
+            else:
+                raise DaemonUnavailable(f"Unknown daemon address: {self.address}")
+        except OSError as e:
+            # Refused, missing, not permitted, reset or timed out: all mean no usable daemon
+            raise DaemonUnavailable(f"No daemon at {self.address}: {e}")
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+
+    def request(self, op: str, **params) -> dict:
+        """Send one request and return its result. Raises DaemonError."""
+        self._next_id += 1
+        line = json.dumps({
+            'id': self._next_id,
+            'token': self.token,
+            'op': op,
+            'params': params,
+        }).encode('utf-8') + b'\n'
+
+        # A kept-open connection may have been closed by a restarted daemon
+        for attempt in (0, 1):
+            if self._sock is None:
+                self._connect()
+            try:
+                self._file.write(line)
+                self._file.flush()
+                reply = self._file.readline()
+            except OSError as e:
+                self.close()
+                if attempt:
+                    raise DaemonUnavailable(f"Lost connection to {self.address}: {e}")
+                continue
+            if reply:
+                break
+            self.close()
+            if attempt:
+                raise DaemonUnavailable(f"Daemon at {self.address} closed the connection")
+
+        response = json.loads(reply)
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', 'Unknown error'))
+        return response['result']
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = None
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='md2html-client', description='Send requests to a running md2html daemon.'
+    )
+    parser.add_argument('--if-running', action='store_true',
+                        help='Exit with status 3 without a message when no daemon is running')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('ping', help='Report whether a daemon is running')
+    commands.add_parser('stop', help='Stop the running daemon')
+
+    convert = commands.add_parser('convert', help='Convert a file or directory, as md2html convert')
+    convert.add_argument('source')
+    convert.add_argument('--output', '-o', required=True)
+    convert.add_argument('--theme', '-t', required=True)
+    convert.add_argument('--link-images', dest='embed_images', action='store_false')
+    convert.add_argument('--assets', choices=['inline', 'hashed'], default='inline')
+    convert.add_argument('--css', choices=['inline', 'external'], default='inline')
+    convert.add_argument('--gzip', action='store_true')
+    convert.add_argument('--toc', action='store_true')
+    convert.add_argument('--recursive', action='store_true')
+    convert.add_argument('--exclude', action='append', default=[], metavar='PATTERN')
+    convert.add_argument('--no-gitignore', dest='gitignore', action='store_false')
+    convert.add_argument('--jobs', '-j', type=int, default=1)
+    convert.add_argument('--keep-going', action='store_true')
+    convert.add_argument('--force', action='store_true')
+    convert.add_argument('--prune', action='store_true')
+    return parser
+
+
+def _convert(client: DaemonClient, args) -> None:
+    source = Path(args.source).resolve()
+    output = Path(args.output).resolve()
+    options = dict(
+        source=str(source), output=str(output), theme=args.theme,
+        embed_images=args.embed_images, toc=args.toc,
+        assets=args.assets, css=args.css, gzip=args.gzip,
+    )
+    if source.is_dir():
+        print(f"Converting directory: {source}")
+        summary = client.request(
+            'convert_directory', recursive=args.recursive, jobs=args.jobs,
+            keep_going=args.keep_going, force=args.force, prune=args.prune,
+            exclude=args.exclude, gitignore=args.gitignore, **options
+        )
+        walk = summary['walk']
+        print(
+            f"Found {walk['files']} markdown files in {walk['directories']} directories "
+            f"({walk['seconds'] * 1000:.1f} ms walking; {walk['pruned']} directories and "
+            f"{walk['excluded']} files excluded)"
+        )
+        print(
+            f"Success: Converted {summary['converted']} files to {output} "
+            f"({summary['written']} written, {summary['unchanged']} unchanged, "
+            f"{summary['skipped']} skipped as up to date)"
+        )
+    else:
+        print(f"Converting: {source}")
+        result = client.request('convert', **options)
+        print(f"Success: {output}" + ("" if result['written'] else " (unchanged)"))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+
+    client = DaemonClient.from_state()
+    if client is None:
+        if not args.if_running:
+            print("No md2html daemon is running", file=sys.stderr)
+        return EXIT_NO_DAEMON
+
+    try:
+        with client:
+            if args.command == 'ping':
+                info = client.request('ping')
+                print(f"md2html daemon {info['version']} (pid {info['pid']}) on {client.address}, "
+                      f"up {info['uptime']:.0f}s, {info['requests']} requests")
+            elif args.command == 'stop':
+                client.request('shutdown')
+                print("Daemon stopped.")
+            else:
+                _convert(client, args)
+    except DaemonUnavailable as e:
+        if not args.if_running:
+            print(f"No md2html daemon is running ({e})", file=sys.stderr)
+        return EXIT_NO_DAEMON
+    except DaemonError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,263 +3,226 @@ Core markdown to HTML conversion.
 Explicit configuration first, with a guarded default fallback.
 """
 
-import base64
+import gzip
+import io
+import itertools
 import logging
-import mimetypes
 import os
-import re
+import zlib
+from collections import deque
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from html import escape
 from pathlib import Path
-from typing import Optional
-
-import markdown
-from bs4 import BeautifulSoup
+from typing import Iterable, Optional
+
+from . import __version__, metrics
+from .blocks import has_definitions, split_blocks
+from .engine import engines
+from .highlight import highlight_cache
+from .images import (
+    MAX_IMAGE_SIZE_BYTES,
+    MAX_IMAGE_SIZE_MB,
+    AssetStore,
+    ImageRewriter,
+    encode_image,
+    image_cache,
+    process_images,
+)
+from .manifest import BuildManifest, hash_file
+from .metadata import (
+    DEFAULT_THEME,
+    HEAD_BYTES,
+    THEME_HINT_COMMENT_RE,
+    decode_body,
+    read_metadata,
+    resolve_theme,
+    scan_head,
+    scan_text,
+)
+from .metrics import FileProfile, profile_file, stage
+from .output import COMPARE_CHUNK_BYTES, StreamedFile, write_if_changed
+from .registry import themes
+from .serialize import HTMLSerializer
+from .sources import MARKDOWN_SUFFIXES, SourceWalker, WalkStats
+from .styles import StylesheetStore
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Configuration constants
-MAX_IMAGE_SIZE_MB = 10  # Maximum image size in megabytes
-MAX_IMAGE_SIZE_BYTES = MAX_IMAGE_SIZE_MB * 1024 * 1024
-
-AVAILABLE_THEMES = {
-    'antorus',
-    'dark',
-    'emerald-nightmare',
-    'github',
-    'manaforge',
-    'minimal',
-    'nighthold',
-    'tomb-of-sargeras',
-    'trial-of-valor',
-}
+# Snapshot of the registry at import time; the registry itself is the
+# source of truth once extra theme directories are added
+AVAILABLE_THEMES = set(themes.names())
 AVAILABLE_THEMES_LIST = sorted(AVAILABLE_THEMES)
-DEFAULT_THEME = 'manaforge'
-THEME_HINT_COMMENT_RE = re.compile(
-    r'<!--\s*md2html-theme\s*:\s*([a-z0-9\-]+)\s*-->',
-    re.IGNORECASE,
-)
-
 
-def load_theme(theme_name: str) -> str:
+# Page title for text rendered without a file name
+DEFAULT_TITLE = 'document'
+
+# Files submitted to each worker ahead of the oldest unfinished one
+IN_FLIGHT_PER_WORKER = 4
+
+# Files larger than this are rendered and written a piece at a time
+STREAM_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# Directory for caches persisted between runs, set by configure_cache
+_cache_dir: Optional[Path] = None
+
+# Size above which files stream, set by configure_streaming; None: never
+_stream_threshold: Optional[int] = STREAM_THRESHOLD_BYTES
+
+
+@dataclass
+class ConversionResult:
+    """What a single conversion produced and which inputs it used."""
+    source: Path
+    output: Path
+    theme: str
+    images: list[Path] = field(default_factory=list)
+    # Hashed asset copies the output links to, destination -> source
+    assets: dict[Path, Path] = field(default_factory=dict)
+    # Stage timings, when profiling is enabled
+    profile: Optional[FileProfile] = None
+    # False when the output already held identical bytes and was left alone
+    written: bool = True
+
+
+@dataclass
+class ThemeOutput:
+    """One page a document is rendered to, with its output tree's stores."""
+    theme: str
+    html_file: Path
+    assets: Optional[AssetStore] = None
+    stylesheets: Optional[StylesheetStore] = None
+
+
+@dataclass
+class BuildSummary:
+    """What a directory build did with each source file."""
+    # Rendered this run, whether or not the output changed
+    converted: int = 0
+    # Rendered to new bytes and written
+    written: int = 0
+    # Rendered to the bytes already on disk; not rewritten
+    unchanged: int = 0
+    # Up to date per the manifest; not rendered
+    skipped: int = 0
+    # How long finding the sources took, and what the walk skipped
+    walk: Optional[WalkStats] = None
+
+
+def configure_cache(cache_dir: Optional[Path]) -> None:
     """
-    Load theme CSS. No fallbacks, no searching.
-    Theme must exist in themes/ directory.
+    Persist conversion caches (encoded images, highlighted code blocks)
+    under cache_dir between runs. None keeps them in memory only.
     """
-    theme_path = Path(__file__).parent / 'themes' / f'{theme_name}.css'
-    
-    if not theme_path.exists():
-        logger.error(f"Theme not found: {theme_name} at {theme_path}")
-        raise FileNotFoundError(f"Theme not found: {theme_name}")
-    
-    logger.debug(f"Loading theme: {theme_name} from {theme_path}")
-    return theme_path.read_text(encoding='utf-8')
-
-
-def _normalize_theme(theme: str, md_file: Path) -> str:
-    candidate = theme.strip().strip('"').strip("'").lower()
-    if not candidate:
-        raise ValueError(f"Theme metadata in {md_file} is empty")
-    if candidate not in AVAILABLE_THEMES:
-        raise ValueError(
-            f"Unknown theme '{candidate}' in {md_file}. "
-            f"Available themes: {', '.join(AVAILABLE_THEMES_LIST)}"
-        )
-    return candidate
-
+    global _cache_dir
+    _cache_dir = cache_dir
+    image_cache.persist_to(cache_dir)
+    highlight_cache.persist_to(cache_dir)
+    if cache_dir:
+        logger.info(f"Using cache directory: {cache_dir}")
 
-def _extract_theme_from_content(content: str, md_file: Path) -> Optional[str]:
-    snippet = content[:2000]
-    comment_match = THEME_HINT_COMMENT_RE.search(snippet)
-    if comment_match:
-        return _normalize_theme(comment_match.group(1), md_file)
 
-    stripped = content.lstrip()
-    if not stripped.startswith('---'):
-        return None
-
-    lines = stripped.splitlines()
-    if not lines:
-        return None
-
-    front_matter: list[str] = []
-    for line in lines[1:]:
-        if line.strip() == '---':
-            break
-        front_matter.append(line.rstrip('\n'))
-
-    idx = 0
-    while idx < len(front_matter):
-        raw_line = front_matter[idx]
-        line = raw_line.strip()
-        if not line or line.startswith('#'):
-            idx += 1
-            continue
-        if ':' not in line:
-            idx += 1
-            continue
-
-        key, value = line.split(':', 1)
-        key = key.strip().lower()
-        value = value.strip()
-
-        if key in ('theme', 'md2html-theme'):
-            return _normalize_theme(value, md_file)
-
-        if key == 'md2html':
-            idx += 1
-            while idx < len(front_matter):
-                sub_raw = front_matter[idx]
-                if not sub_raw.startswith((' ', '\t')):
-                    break
-                sub_line = sub_raw.strip()
-                if sub_line.startswith('theme:'):
-                    _, sub_value = sub_line.split(':', 1)
-                    return _normalize_theme(sub_value, md_file)
-                idx += 1
-            continue
-
-        idx += 1
-
-    return None
-
-
-def _resolve_theme_choice(requested_theme: str, content: str, md_file: Path) -> str:
-    discovered = _extract_theme_from_content(content, md_file)
-
-    if requested_theme == 'auto':
-        if discovered:
-            logger.info("Detected theme '%s' for %s", discovered, md_file.name)
-            return discovered
-        logger.info(
-            "No theme metadata found in %s; falling back to default '%s'",
-            md_file.name,
-            DEFAULT_THEME,
-        )
-        return DEFAULT_THEME
-
-    if discovered and discovered != requested_theme:
-        logger.info(
-            "Applying per-file theme '%s' for %s (overriding CLI choice '%s')",
-            discovered,
-            md_file.name,
-            requested_theme,
-        )
-        return discovered
+def configure_streaming(threshold_bytes: Optional[int]) -> None:
+    """
+    Render files larger than threshold_bytes in pieces, writing each
+    page as it is rendered, so memory stays bounded whatever the file
+    size. 0 streams every file that can be; None never streams.
+    """
+    global _stream_threshold
+    _stream_threshold = threshold_bytes
 
-    if requested_theme not in AVAILABLE_THEMES:
-        raise ValueError(
-            f"Unknown theme '{requested_theme}'. "
-            f"Available themes: {', '.join(AVAILABLE_THEMES_LIST)}"
-        )
 
-    return requested_theme
+def prune_caches() -> None:
+    """Trim persisted caches to their size budgets."""
+    image_cache.prune()
+    highlight_cache.prune()
 
 
-def encode_image(image_path: Path) -> str:
+def load_theme(theme_name: str) -> str:
     """
-    Encode image to base64 data URI.
-    No fallback MIME types, must be detectable.
-    Includes size validation to prevent memory exhaustion.
+    Load theme CSS from the theme registry. No fallbacks.
+    Theme must exist on the registry search path.
     """
-    if not image_path.exists():
-        logger.error(f"Image not found: {image_path}")
-        raise FileNotFoundError(f"Image not found: {image_path}")
-    
-    # Check file size before processing
-    file_size = image_path.stat().st_size
-    if file_size > MAX_IMAGE_SIZE_BYTES:
-        size_mb = file_size / (1024 * 1024)
-        logger.warning(f"Image too large: {image_path.name} ({size_mb:.1f}MB)")
-        raise ValueError(
-            f"Image too large: {image_path.name} is {size_mb:.1f}MB "
-            f"(max: {MAX_IMAGE_SIZE_MB}MB)"
-        )
-    
-    mime_type, _ = mimetypes.guess_type(str(image_path))
-    if not mime_type or not mime_type.startswith('image/'):
-        raise ValueError(f"Not a valid image file: {image_path}")
-    
-    # Validate common image formats
-    valid_formats = {
-        'image/jpeg', 'image/jpg', 'image/png', 'image/gif', 
-        'image/svg+xml', 'image/webp', 'image/bmp'
-    }
-    if mime_type not in valid_formats:
-        raise ValueError(
-            f"Unsupported image format: {mime_type} for {image_path.name}"
-        )
-    
-    with open(image_path, 'rb') as f:
-        encoded = base64.b64encode(f.read()).decode('utf-8')
+    if theme_name not in themes:
+        logger.error(f"Theme not found: {theme_name}")
+        raise FileNotFoundError(f"Theme not found: {theme_name}")
     
-    logger.debug(f"Encoded image: {image_path.name} ({file_size / 1024:.1f}KB)")
-    return f"data:{mime_type};base64,{encoded}"
+    return themes.css(theme_name)
 
 
-def process_images(html: str, base_dir: Path, embed: bool) -> str:
+def build_html(content: str, css: str, title: str, css_href: Optional[str] = None) -> str:
     """
-    Process images in HTML. No path searching.
-    Images must be relative to markdown file location.
+    Build complete HTML document.
+    No templates, single format only. The theme CSS is inlined, or
+    linked instead when css_href points at a shared stylesheet.
     """
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    for img in soup.find_all('img'):
-        src = img.get('src')
-        
-        if not src:
-            raise ValueError("Image tag without src attribute found")
-        
-        # Skip external images
-        if src.startswith(('http://', 'https://', 'data:')):
-            continue
-        
-        # Image must be relative to markdown file
-        image_path = base_dir / src
-        
-        if not image_path.exists():
-            logger.error(f"Image not found during processing: {image_path}")
-            raise FileNotFoundError(f"Image not found: {image_path}")
-        
-        if embed:
-            img['src'] = encode_image(image_path)
-    
-    return str(soup)
+    head, tail = page_parts(css, title, css_href)
+    return f'{head}{content}{tail}'
 
 
-def build_html(content: str, css: str, title: str) -> str:
-    """
-    Build complete HTML document.
-    No templates, no options, single format only.
-    """
-    return f'''<!DOCTYPE html>
+def page_parts(css: str, title: str, css_href: Optional[str] = None) -> tuple[str, str]:
+    """The document build_html puts around the content: what comes before and after."""
+    if css_href is not None:
+        styles = f'    <link rel="stylesheet" href="{escape(css_href)}">'
+    else:
+        styles = f'''    <style>
+{css}
+    </style>'''
+
+    head = f'''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title}</title>
-    <style>
-{css}
-    </style>
+{styles}
 </head>
 <body>
     <div class="markdown-container">
-{content}
+'''
+    tail = '''
     </div>
 </body>
 </html>'''
+    return head, tail
 
 
-def convert_markdown(
+def render_markdown(
     md_file: Path,
     html_file: Path,
     theme: str,
     embed_images: bool,
+    toc: bool,
+    assets: Optional[AssetStore] = None,
+    stylesheets: Optional[StylesheetStore] = None
+) -> tuple[str, ConversionResult]:
+    """
+    Render a markdown file to a complete HTML page without writing it.
+    html_file is where the page will be served from; relative image and
+    stylesheet links are computed against its directory.
+    Returns the page and what it was built from.
+    """
+    outputs = [ThemeOutput(theme, html_file, assets, stylesheets)]
+    return render_markdown_themes(md_file, outputs, embed_images, toc)[0]
+
+
+def render_markdown_themes(
+    md_file: Path,
+    outputs: list[ThemeOutput],
+    embed_images: bool,
     toc: bool
-) -> None:
+) -> list[tuple[str, ConversionResult]]:
     """
-    Convert single markdown file to HTML.
-    No fallbacks, strict validation, explicit configuration.
+    Render a markdown file once and wrap the body in each output's theme.
+    Reading, Markdown, code highlighting and images are paid for once;
+    only the page wrapper is built per output. Hashed-asset links are
+    computed for the first output, so every output must sit at the same
+    place relative to its asset store. Returns (page, result) per output.
     """
+    _check_outputs(outputs)
+    first = outputs[0]
+
     # Validate input
     if not md_file.exists():
         logger.error(f"Markdown file not found: {md_file}")
@@ -269,37 +232,383 @@ def convert_markdown(
         raise ValueError(f"Not a markdown file: {md_file}")
 
     # Read markdown content - UTF-8 only
-    try:
-        content = md_file.read_text(encoding='utf-8')
-    except UnicodeDecodeError:
-        raise ValueError(f"File is not valid UTF-8: {md_file}")
+    with stage('read'):
+        data = md_file.read_bytes()
+
+    # Metadata comes from the head alone; the body is decoded past it
+    with stage('theme'):
+        meta = scan_head(data[:HEAD_BYTES], md_file, complete=len(data) <= HEAD_BYTES)
+        resolved_themes = [resolve_theme(output.theme, meta, md_file) for output in outputs]
+
+    with stage('read'):
+        content = decode_body(data, meta, md_file)
+        # Only the decoded text is needed while rendering
+        del data
+    for output, resolved_theme in zip(outputs, resolved_themes):
+        logger.info(f"Converting: {md_file} -> {output.html_file} [theme={resolved_theme}]")
+
+    # Images are resolved inside the Markdown tree - no fallbacks
+    rewriter = ImageRewriter(md_file.parent, embed_images, first.assets, first.html_file.parent)
+    html_content = _render_body(content, toc, rewriter)
+
+    pages = []
+    for output, resolved_theme in zip(outputs, resolved_themes):
+        final_html = _wrap_page(
+            html_content, resolved_theme, md_file.stem, output.stylesheets, output.html_file.parent
+        )
+        pages.append((final_html, _result(md_file, output, first, resolved_theme, rewriter)))
+    return pages
 
-    resolved_theme = _resolve_theme_choice(theme, content, md_file)
-    logger.info(f"Converting: {md_file} -> {html_file} [theme={resolved_theme}]")
 
-    # Convert markdown to HTML with explicit extensions
-    extensions = ['extra', 'codehilite']
-    if toc:
-        extensions.append('toc')
+def _check_outputs(outputs: list[ThemeOutput]) -> None:
+    """Outputs of one render must share an asset store layout, or all have none."""
+    if not outputs:
+        raise ValueError("No outputs given")
 
-    md = markdown.Markdown(extensions=extensions)
-    html_content = md.convert(content)
+    first = outputs[0]
+    if any((output.assets is None) != (first.assets is None) for output in outputs):
+        raise ValueError("Either every output has an asset store or none does")
+    if first.assets is not None:
+        layout = os.path.relpath(first.assets.directory, first.html_file.parent)
+        for output in outputs[1:]:
+            if os.path.relpath(output.assets.directory, output.html_file.parent) != layout:
+                raise ValueError(f"Asset store layout differs for {output.html_file}")
 
-    # Process images - no fallbacks
-    html_content = process_images(html_content, md_file.parent, embed_images)
 
-    # Load theme - must exist
-    css = load_theme(resolved_theme)
+def _result(
+    md_file: Path,
+    output: ThemeOutput,
+    first: ThemeOutput,
+    theme: str,
+    rewriter: ImageRewriter
+) -> ConversionResult:
+    """What rendering md_file for output used, images linked as for first."""
+    assets = rewriter.assets
+    if output is not first:
+        # Same file names, in this output's own asset directory
+        assets = {output.assets.directory / dest.name: source for dest, source in assets.items()}
+    return ConversionResult(md_file, output.html_file, theme, list(rewriter.referenced), dict(assets))
+
+
+def _render_body(content: str, toc: bool, rewriter: Optional[ImageRewriter]) -> str:
+    # Convert markdown to HTML with this thread's pooled engine
+    with stage('markdown'):
+        return engines.convert(content, toc, rewriter)
+
+
+def _wrap_page(
+    html_content: str,
+    theme: str,
+    title: str,
+    stylesheets: Optional[StylesheetStore] = None,
+    html_dir: Optional[Path] = None
+) -> str:
+    """A rendered body as a complete page in a resolved theme."""
+    css, css_href = _page_styles(theme, stylesheets, html_dir)
 
     # Build final HTML
-    final_html = build_html(html_content, css, md_file.stem)
+    with stage('build_html'):
+        return build_html(html_content, css, title, css_href)
+
+
+def _page_styles(
+    theme: str,
+    stylesheets: Optional[StylesheetStore],
+    html_dir: Optional[Path]
+) -> tuple[str, Optional[str]]:
+    """A resolved theme's CSS, and the shared stylesheet to link instead, if any."""
+    # Load theme - must exist
+    with stage('theme'):
+        css = load_theme(theme)
+        css_href = None
+        if stylesheets is not None:
+            css_href = stylesheets.href(theme, html_dir)
+    return css, css_href
+
+
+def render(
+    text: str,
+    theme: str = 'auto',
+    toc: bool = False,
+    base_dir: Optional[Path] = None,
+    embed_images: bool = True,
+    title: str = DEFAULT_TITLE
+) -> str:
+    """
+    Render Markdown text to a complete HTML page. Nothing is written.
+    Theme metadata in the text applies as it does in a file. Without
+    base_dir, images are left as written and no file is read; with it,
+    local images must exist relative to base_dir and are embedded, or
+    only checked with embed_images=False.
+    """
+    name = Path(title)
+    meta, body = scan_text(text, name)
+    resolved_theme = resolve_theme(theme, meta, name)
+    rewriter = ImageRewriter(base_dir, embed_images) if base_dir is not None else None
+    return _wrap_page(_render_body(body, toc, rewriter), resolved_theme, escape(title))
+
+
+def convert_markdown(
+    md_file: Path,
+    html_file: Path,
+    theme: str,
+    embed_images: bool,
+    toc: bool,
+    assets: Optional[AssetStore] = None,
+    stylesheets: Optional[StylesheetStore] = None,
+    precompress: bool = False
+) -> ConversionResult:
+    """
+    Convert single markdown file to HTML.
+    No fallbacks, strict validation, explicit configuration.
+    With an asset store, images link to hashed copies instead of being
+    embedded or linked in place; the caller flushes the store. With a
+    stylesheet store, the page links its theme's shared stylesheet
+    instead of inlining the CSS. With precompress, a gzip copy is
+    written next to the page for `md2html serve`.
+    Outputs are replaced atomically, and not at all when the file on
+    disk already holds the same bytes (``result.written`` is False).
+    Returns the resolved theme and the local images the document uses,
+    and the stage timings when profiling is enabled (see metrics).
+    """
+    outputs = [ThemeOutput(theme, html_file, assets, stylesheets)]
+    return convert_markdown_themes(md_file, outputs, embed_images, toc, precompress)[0]
 
-    # Create output directory if needed
-    html_file.parent.mkdir(parents=True, exist_ok=True)
 
-    # Write output file
-    html_file.write_text(final_html, encoding='utf-8')
-    logger.info(f"Successfully converted: {md_file.name} ({len(final_html) / 1024:.1f}KB)")
+def convert_markdown_themes(
+    md_file: Path,
+    outputs: list[ThemeOutput],
+    embed_images: bool,
+    toc: bool,
+    precompress: bool = False
+) -> list[ConversionResult]:
+    """
+    Convert a markdown file to one page per output, rendering it once.
+    Each page is written as by convert_markdown; the results share one
+    profile, in which the per-page stages add up over every output.
+    Files over the streaming threshold (see configure_streaming) are
+    rendered and written in pieces, to the same bytes.
+    """
+    with profile_file(md_file) as profile:
+        streamed = _stream_markdown_themes(md_file, outputs, embed_images, toc, precompress)
+        if streamed is not None:
+            results, sizes = streamed
+        else:
+            pages = render_markdown_themes(md_file, outputs, embed_images, toc)
+            results = [result for _, result in pages]
+            sizes = [len(final_html) for final_html, _ in pages]
+
+            for final_html, result in pages:
+                with stage('write'):
+                    # Create output directory if needed
+                    result.output.parent.mkdir(parents=True, exist_ok=True)
+
+                    # Write output file - unless identical, so its mtime stays put
+                    data = final_html.encode('utf-8')
+                    result.written = write_if_changed(result.output, data)
+                    if precompress:
+                        write_gzip(result.output, data, result.written)
+            del pages
+
+    if profile is not None:
+        profile.outputs = len(results)
+    for result, size, output in zip(results, sizes, outputs):
+        if result.written:
+            logger.info(f"Successfully converted: {md_file.name} ({size / 1024:.1f}KB)")
+        else:
+            logger.info(f"Unchanged: {md_file.name} ({size / 1024:.1f}KB)")
+        if output.assets is not None:
+            output.assets.add(result.assets)
+        result.profile = profile
+    return results
+
+
+def _stream_markdown_themes(
+    md_file: Path,
+    outputs: list[ThemeOutput],
+    embed_images: bool,
+    toc: bool,
+    precompress: bool
+) -> Optional[tuple[list[ConversionResult], list[int]]]:
+    """
+    convert_markdown_themes for a file over the streaming threshold.
+    The body is read and rendered a piece at a time, cut at top-level
+    block boundaries (see blocks.split_blocks), and each piece is
+    written to every page before the next is read: memory is bounded
+    by the largest piece, not the file. Returns the results and page
+    sizes, or None to render the file whole - when it is small, or
+    needs the whole document at once for a table of contents or for
+    link references, footnotes or abbreviations defined in it.
+    """
+    if _stream_threshold is None or md_file.suffix not in MARKDOWN_SUFFIXES:
+        return None
+    try:
+        size = md_file.stat().st_size
+    except FileNotFoundError:
+        return None
+    if size <= _stream_threshold:
+        return None
+    if toc:
+        logger.warning(f"Rendering {md_file.name} whole: a table of contents needs all of it")
+        return None
+
+    _check_outputs(outputs)
+    first = outputs[0]
+    with stage('theme'):
+        meta = read_metadata(md_file)
+        resolved_themes = [resolve_theme(output.theme, meta, md_file) for output in outputs]
+    with stage('read'):
+        definitions = has_definitions(md_file, meta.body_offset)
+    if definitions:
+        logger.warning(
+            f"Rendering {md_file.name} whole: it defines link references, footnotes or abbreviations"
+        )
+        return None
+
+    shells = []
+    for output, resolved_theme in zip(outputs, resolved_themes):
+        logger.info(
+            f"Converting in pieces: {md_file} -> {output.html_file} "
+            f"[theme={resolved_theme}, {size / (1024 * 1024):.1f}MB]"
+        )
+        css, css_href = _page_styles(resolved_theme, output.stylesheets, output.html_file.parent)
+        with stage('build_html'):
+            shells.append(page_parts(css, md_file.stem, css_href))
+        output.html_file.parent.mkdir(parents=True, exist_ok=True)
+
+    rewriter = ImageRewriter(md_file.parent, embed_images, first.assets, first.html_file.parent)
+    with ExitStack() as stack:
+        pages = [stack.enter_context(StreamedFile(output.html_file)) for output in outputs]
+        with stage('write'):
+            for page, (head, _) in zip(pages, shells):
+                page.write(head.encode('utf-8'))
+
+        source = stack.enter_context(open(md_file, 'rb'))
+        source.seek(meta.body_offset)
+        pieces = split_blocks(io.TextIOWrapper(source, encoding='utf-8', newline=''))
+        # The pieces join with newlines and the body is stripped, as one
+        # render would be; trailing whitespace waits for a piece after it.
+        # One serializer sees the whole body, as it would in convert().
+        serializer = HTMLSerializer(rewriter.rewrite)
+        started = False
+        held = ''
+        while True:
+            with stage('read'):
+                try:
+                    piece = next(pieces, None)
+                except UnicodeDecodeError:
+                    raise ValueError(f"File is not valid UTF-8: {md_file}")
+            if piece is None:
+                break
+            with stage('markdown'):
+                html = engines.convert_piece(piece, False)
+            if not html:
+                continue
+            if started:
+                html = '\n' + html
+            else:
+                html = html.lstrip()
+            body = html.rstrip()
+            if not body:
+                if started:
+                    held += html
+                continue
+            with stage('markdown'):
+                serializer.feed(held + body)
+                data = serializer.take().encode('utf-8')
+            with stage('write'):
+                for page in pages:
+                    page.write(data)
+            held = html[len(body):]
+            started = True
+
+        with stage('markdown'):
+            serializer.close()
+            data = serializer.take().encode('utf-8')
+        with stage('write'):
+            for page, (_, tail) in zip(pages, shells):
+                page.write(data + tail.encode('utf-8'))
+
+    results = []
+    for output, page, resolved_theme in zip(outputs, pages, resolved_themes):
+        result = _result(md_file, output, first, resolved_theme, rewriter)
+        result.written = page.written
+        if precompress:
+            with stage('write'):
+                write_gzip_file(result.output, result.written)
+        results.append(result)
+    return results, [page.size for page in pages]
+
+
+def write_gzip(path: Path, data: bytes, changed: bool = True) -> Path:
+    """
+    Write data gzip-compressed to path + '.gz', written after path so
+    the server sees it as current. Deterministic: no timestamp inside.
+    When path did not change and its copy is current, nothing is
+    compressed at all.
+    """
+    gz_path = path.with_name(path.name + '.gz')
+    if not changed and _gzip_current(path, gz_path):
+        return gz_path
+    write_if_changed(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+    return gz_path
+
+
+def write_gzip_file(path: Path, changed: bool = True) -> Path:
+    """
+    write_gzip for a page already on disk, compressed as it is read back
+    a chunk at a time. Writes the same bytes as write_gzip.
+    """
+    gz_path = path.with_name(path.name + '.gz')
+    if not changed and _gzip_current(path, gz_path):
+        return gz_path
+    # The gzip container zlib writes is gzip.compress's with mtime=0
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    with open(path, 'rb') as page, StreamedFile(gz_path) as out:
+        while chunk := page.read(COMPARE_CHUNK_BYTES):
+            out.write(compressor.compress(chunk))
+        out.write(compressor.flush())
+    return gz_path
+
+
+def _gzip_current(path: Path, gz_path: Path) -> bool:
+    try:
+        return gz_path.stat().st_mtime_ns >= path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def _init_worker(
+    theme: str,
+    toc: bool,
+    cache_dir: Optional[Path],
+    profiling: Optional[bool] = None,
+    stream_threshold: Optional[int] = STREAM_THRESHOLD_BYTES
+) -> None:
+    """
+    Warm up a convert_directory worker process.
+    Builds the Markdown engine and loads the theme CSS once per worker.
+    profiling is the parent's metrics.settings(); stream_threshold is
+    what the parent passed to configure_streaming.
+    """
+    # Per-file progress is logged by the parent in input order
+    logging.getLogger(__package__).setLevel(logging.WARNING)
+    configure_cache(cache_dir)
+    configure_streaming(stream_threshold)
+    if profiling is not None:
+        metrics.enable(memory=profiling)
+    engines.get(toc)
+    load_theme(DEFAULT_THEME if theme == 'auto' else theme)
+
+
+def _convert_task(task: tuple) -> tuple[Optional[list[ConversionResult]], Optional[str]]:
+    """Convert one file in a worker. Returns the results or the error message."""
+    md_file, outputs, embed_images, toc, precompress = task
+    try:
+        return convert_markdown_themes(md_file, outputs, embed_images, toc, precompress), None
+    except Exception as e:
+        return None, str(e)
+
 
 def convert_directory(
     source_dir: Path,
@@ -307,12 +616,122 @@ def convert_directory(
     theme: str,
     embed_images: bool,
     toc: bool,
-    recursive: bool
-) -> int:
+    recursive: bool,
+    jobs: Optional[int] = None,
+    keep_going: bool = False,
+    force: bool = False,
+    prune: bool = False,
+    hashed_assets: bool = False,
+    external_css: bool = False,
+    precompress: bool = False,
+    excludes: Iterable[str] = (),
+    gitignore: bool = True
+) -> BuildSummary:
     """
     Convert all markdown files in directory.
     No smart detection, explicit paths only.
+
+    Sources are ``.md`` and ``.markdown`` files found by a SourceWalker:
+    directories matching ``excludes`` (.gitignore syntax), the default
+    excludes (.git, node_modules, ...) or, with ``gitignore``, a
+    .gitignore rule are not entered. Conversion starts while the walk
+    is still running. Files are converted by up to ``jobs`` worker
+    processes (default: one per CPU) and reported in walk order: depth
+    first, each directory's entries sorted by name.
+    By default the first failure aborts the run; with ``keep_going``
+    every file is attempted and all failures are reported together.
+
+    Builds are incremental: a manifest in the output directory records
+    the inputs of every output, and files whose source, theme CSS and
+    local images are unchanged are skipped unless ``force`` is set.
+    Outputs whose source disappeared are reported, or deleted with
+    ``prune``.
+
+    With ``hashed_assets``, local images are copied once into
+    ``output_dir/_assets`` under their content hash and linked from
+    there. With ``external_css``, each theme used is written once to
+    ``output_dir/_assets`` as a minified, content-hashed stylesheet that
+    pages link to. With ``precompress``, every page gets a gzip copy
+    (``page.html.gz``) for the preview server. When metrics are enabled,
+    each converted file's profile is passed to the metrics hooks.
+    Pages that render to the bytes already on disk are not rewritten.
+    Returns a BuildSummary: files converted, written, unchanged and
+    skipped as up to date, and the walk's statistics.
+    """
+    return _build_trees(
+        source_dir, {theme: output_dir}, embed_images, toc, recursive, jobs, keep_going,
+        force, prune, hashed_assets, external_css, precompress, excludes, gitignore
+    )[theme]
+
+
+def validate_themes(theme_names: list[str]) -> None:
+    """
+    Check a list of themes to build side by side. Names must be known,
+    distinct and explicit: 'auto' picks a theme per document, not per tree.
+    """
+    if not theme_names:
+        raise ValueError("No themes given")
+    if len(set(theme_names)) != len(theme_names):
+        raise ValueError(f"Themes listed more than once: {', '.join(theme_names)}")
+    for name in theme_names:
+        if name == 'auto':
+            raise ValueError("'auto' cannot be one of several themes; list the themes to build")
+        if name not in themes:
+            raise ValueError(
+                f"Unknown theme '{name}'. Available themes: {', '.join(themes.names())}"
+            )
+
+
+def convert_directory_themes(
+    source_dir: Path,
+    output_dir: Path,
+    theme_names: list[str],
+    embed_images: bool,
+    toc: bool,
+    recursive: bool,
+    jobs: Optional[int] = None,
+    keep_going: bool = False,
+    force: bool = False,
+    prune: bool = False,
+    hashed_assets: bool = False,
+    external_css: bool = False,
+    precompress: bool = False,
+    excludes: Iterable[str] = (),
+    gitignore: bool = True
+) -> dict[str, BuildSummary]:
+    """
+    Convert a directory into one output tree per theme, output_dir/<theme>.
+    Each document is read and rendered once, then wrapped in every theme
+    that needs it; each tree is otherwise built as by convert_directory,
+    with its own manifest, assets and stylesheets. Themes are checked
+    by validate_themes. A document that declares its own theme keeps it
+    in every tree. Returns a BuildSummary per theme, in the order given.
     """
+    validate_themes(theme_names)
+    return _build_trees(
+        source_dir, {name: output_dir / name for name in theme_names}, embed_images, toc,
+        recursive, jobs, keep_going, force, prune, hashed_assets, external_css, precompress,
+        excludes, gitignore
+    )
+
+
+def _build_trees(
+    source_dir: Path,
+    trees: dict[str, Path],
+    embed_images: bool,
+    toc: bool,
+    recursive: bool,
+    jobs: Optional[int],
+    keep_going: bool,
+    force: bool,
+    prune: bool,
+    hashed_assets: bool,
+    external_css: bool,
+    precompress: bool,
+    excludes: Iterable[str],
+    gitignore: bool
+) -> dict[str, BuildSummary]:
+    """Build one output tree per theme -> output_dir, rendering each document once."""
     if not source_dir.exists():
         logger.error(f"Source directory not found: {source_dir}")
         raise FileNotFoundError(f"Source directory not found: {source_dir}")
@@ -320,31 +739,229 @@ def convert_directory(
     if not source_dir.is_dir():
         raise ValueError(f"Not a directory: {source_dir}")
     
-    # Find markdown files
-    pattern = '**/*.md' if recursive else '*.md'
-    md_files = list(source_dir.glob(pattern))
+    if jobs is not None and jobs < 1:
+        raise ValueError(f"Jobs must be at least 1, got {jobs}")
     
-    if not md_files:
+    # Find markdown files as a stream, in a fixed walk order so output and
+    # logs are deterministic. Output trees inside the source are never walked.
+    walker = SourceWalker(
+        source_dir, recursive, excludes, gitignore,
+        prune=[output_dir for output_dir in trees.values() if output_dir.is_relative_to(source_dir)]
+    )
+    md_files = iter(walker)
+    first_file = next(md_files, None)
+    
+    if first_file is None:
         logger.warning(f"No markdown files found in {source_dir}")
         raise ValueError(f"No markdown files found in {source_dir}")
     
-    logger.info(f"Found {len(md_files)} markdown files to convert")
+    manifests: dict[str, BuildManifest] = {}
+    stores: dict[str, Optional[AssetStore]] = {}
+    stylesheets: dict[str, Optional[StylesheetStore]] = {}
+    for theme, output_dir in trees.items():
+        options = {
+            'version': __version__,
+            'theme': theme,
+            'embed_images': embed_images,
+            'toc': toc,
+            'assets': 'hashed' if hashed_assets else 'inline',
+            'css': 'external' if external_css else 'inline',
+            'gzip': precompress,
+            # Pages built before front matter was skipped are rebuilt
+            'front_matter': 'skip',
+        }
+        manifests[theme] = BuildManifest.load(output_dir, options)
+        stores[theme] = AssetStore(output_dir) if hashed_assets else None
+        stylesheets[theme] = StylesheetStore(output_dir) if external_css else None
+    
+    theme_hashes: dict[str, Optional[str]] = {}
+    image_hashes: dict[str, Optional[str]] = {}
     
-    # Convert each file
-    count = 0
-    for md_file in md_files:
-        # Calculate output path - preserve structure
-        rel_path = md_file.relative_to(source_dir)
-        html_path = output_dir / rel_path.with_suffix('.html')
+    def theme_hash(name: str) -> Optional[str]:
+        if name not in theme_hashes:
+            theme_hashes[name] = themes.css_hash(name) if name in themes else None
+        return theme_hashes[name]
+    
+    def image_hash(rel: str) -> Optional[str]:
+        if rel not in image_hashes:
+            image_path = source_dir / rel
+            image_hashes[rel] = hash_file(image_path) if image_path.is_file() else None
+        return image_hashes[rel]
+    
+    summaries = {theme: BuildSummary(walk=walker.stats) for theme in trees}
+    workers = jobs or os.cpu_count() or 1
+    executor = None
+    held: Optional[tuple] = None
+    # Submitted conversions, oldest first; results are collected in this order
+    pending: deque = deque()
+    failures: list[str] = []
+    keys: set[str] = set()
+    # Output page -> source, to catch page.md and page.markdown colliding
+    sources_by_page: dict[Path, Path] = {}
+    converting = 0
+    
+    def collect(task: tuple, file_results: Optional[list[ConversionResult]], error: Optional[str]) -> None:
+        md_file, outputs, *_ = task
+        key = md_file.relative_to(source_dir).as_posix()
         
-        try:
-            convert_markdown(md_file, html_path, theme, embed_images, toc)
-            count += 1
-        except Exception as e:
+        if error is None:
+            for output, result in zip(outputs, file_results):
+                logger.info(f"Converted: {md_file} -> {result.output}")
+                manifests[output.theme].record(
+                    key,
+                    source_hashes[md_file],
+                    result.output.relative_to(trees[output.theme]).as_posix(),
+                    result.theme,
+                    theme_hash(result.theme),
+                    {
+                        rel: image_hash(rel)
+                        for rel in (
+                            Path(os.path.relpath(image, source_dir)).as_posix()
+                            for image in result.images
+                        )
+                    },
+                )
+                if output.assets is not None:
+                    stores[output.theme].add(result.assets)
+                summary = summaries[output.theme]
+                summary.converted += 1
+                if result.written:
+                    summary.written += 1
+                else:
+                    summary.unchanged += 1
+            # One render, one profile, however many themes it was wrapped in
+            metrics.record(file_results[0].profile)
+            return
+        
+        for output in outputs:
+            manifests[output.theme].forget(key)
+        logger.error(f"Failed to convert {md_file}: {error}")
+        if not keep_going:
             # Fail on first error - no recovery
-            logger.error(f"Failed to convert {md_file}: {e}")
-            raise RuntimeError(f"Failed to convert {md_file}: {e}")
+            raise RuntimeError(f"Failed to convert {md_file}: {error}")
+        failures.append(f"{md_file}: {error}")
+    
+    # Convert each file as the walk finds it, collecting results in input order
+    source_hashes: dict[Path, str] = {}
+    try:
+        for md_file in itertools.chain([first_file], md_files):
+            key = md_file.relative_to(source_dir).as_posix()
+            rel_html = md_file.relative_to(source_dir).with_suffix('.html')
+            keys.add(key)
+            
+            if rel_html in sources_by_page:
+                error = f"Same output as {sources_by_page[rel_html]}: {rel_html.as_posix()}"
+                logger.error(f"Failed to convert {md_file}: {error}")
+                if not keep_going:
+                    raise RuntimeError(f"Failed to convert {md_file}: {error}")
+                failures.append(f"{md_file}: {error}")
+                continue
+            sources_by_page[rel_html] = md_file
+            source_hashes[md_file] = hash_file(md_file)
+            
+            # Render once for every tree whose page is stale
+            outputs = []
+            for theme, output_dir in trees.items():
+                html_path = output_dir / rel_html
+                if not force and manifests[theme].is_fresh(
+                    key, source_hashes[md_file], html_path, theme_hash, image_hash
+                ):
+                    logger.debug(f"Up to date: {md_file} [{theme}]")
+                    summaries[theme].skipped += 1
+                    continue
+                outputs.append(ThemeOutput(theme, html_path, stores[theme], stylesheets[theme]))
+            
+            if not outputs:
+                continue
+            task = (md_file, outputs, embed_images, toc, precompress)
+            converting += 1
+            
+            if workers == 1:
+                collect(task, *_convert_task(task))
+                continue
+            
+            if executor is None and held is None:
+                # A lone stale file is converted in-process, without a pool
+                held = task
+                continue
+            
+            if executor is None:
+                # Imported here: multiprocessing is a noticeable share of CLI startup
+                from concurrent.futures import ProcessPoolExecutor
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(next(iter(trees)), toc, _cache_dir, metrics.settings(), _stream_threshold),
+                )
+                logger.info(f"Converting with {workers} workers while the walk continues")
+                pending.append((held, executor.submit(_convert_task, held)))
+                held = None
+            pending.append((task, executor.submit(_convert_task, task)))
+            
+            # Collect finished files without waiting; wait once enough are queued
+            while pending and (pending[0][1].done() or len(pending) >= workers * IN_FLIGHT_PER_WORKER):
+                done_task, future = pending.popleft()
+                collect(done_task, *future.result())
+        
+        if held is not None:
+            collect(held, *_convert_task(held))
+        
+        for manifest in manifests.values():
+            _handle_orphans(manifest, keys, prune)
+        
+        while pending:
+            done_task, future = pending.popleft()
+            collect(done_task, *future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        # Keep what was built, even when the run failed part way
+        try:
+            for store in stores.values():
+                if store is not None:
+                    store.flush(jobs)
+        finally:
+            for manifest in manifests.values():
+                manifest.save()
+        prune_caches()
+    
+    skipped = len(keys) - converting - len(failures)
+    if skipped > 0:
+        logger.info(f"Skipped {skipped} up-to-date files")
+    
+    if failures:
+        raise RuntimeError(
+            f"Failed to convert {len(failures)} of {len(keys)} files:\n"
+            + "\n".join(failures)
+        )
+    
+    if not converting:
+        logger.info("All files up to date")
+        return summaries
     
-    logger.info(f"Successfully converted {count} files")
-    return count
+    for theme, summary in summaries.items():
+        logger.info(
+            f"Successfully converted {summary.converted} files "
+            f"({summary.written} written, {summary.unchanged} unchanged)"
+            + ("" if len(trees) == 1 else f" [{theme}]")
+        )
+    return summaries
+
 
+def _handle_orphans(manifest: BuildManifest, keys: set[str], prune: bool) -> None:
+    """Report, or delete with prune, outputs whose source is gone."""
+    orphans = manifest.orphans(keys)
+    if not orphans:
+        return
+    
+    if not prune:
+        for orphan in orphans:
+            logger.warning(f"Orphaned output (source removed): {orphan}")
+        return
+    
+    for orphan in orphans:
+        if orphan.exists():
+            orphan.unlink()
+        orphan.with_name(orphan.name + '.gz').unlink(missing_ok=True)
+        logger.info(f"Removed orphaned output: {orphan}")
+    manifest.prune(keys)
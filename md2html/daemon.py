@@ -0,0 +1,379 @@
+"""
+Conversion daemon: one warm process serving convert requests over a
+local socket. Requests are explicit JSON; nothing is converted unasked.
+"""
+
+import hmac
+import json
+import logging
+import os
+import secrets
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from . import __version__
+from .client import (
+    PROTOCOL_VERSION,
+    DaemonClient,
+    DaemonError,
+    daemon_state_path,
+    default_socket_path,
+)
+from .converter import (
+    DEFAULT_THEME,
+    configure_cache,
+    convert_directory,
+    convert_markdown,
+    load_theme,
+    prune_caches,
+)
+from .engine import engines
+from .images import AssetStore
+from .registry import themes
+from .styles import StylesheetStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# A request line larger than this is refused rather than buffered
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Conversions run on these long-lived threads, each keeping its engines
+# warm; connection threads come and go with their clients
+CONVERT_THREADS = 4
+
+
+def _log(message: str) -> None:
+    timestamp = datetime.now().strftime('%H:%M:%S')
+    print(f"[{timestamp}] {message}", flush=True)
+
+
+def _path(params: dict, name: str) -> Path:
+    """An absolute path parameter. Clients resolve relative paths themselves."""
+    value = params.get(name)
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"Missing parameter: {name}")
+    path = Path(value)
+    if not path.is_absolute():
+        raise ValueError(f"Path must be absolute: {name}={value}")
+    return path
+
+
+def _option(params: dict, name: str, kind: type, default):
+    value = params.get(name, default)
+    if value is not None and not isinstance(value, kind):
+        raise ValueError(f"Parameter {name} must be {kind.__name__}, got {value!r}")
+    return value
+
+
+def _patterns(params: dict, name: str) -> list[str]:
+    value = _option(params, name, list, [])
+    if not all(isinstance(item, str) for item in value):
+        raise ValueError(f"Parameter {name} must be a list of strings")
+    return value
+
+
+class Converter:
+    """
+    The warm state behind a daemon: engines, theme CSS and image and
+    highlight caches live in this process for as long as it runs.
+    Requests run on a fixed pool of threads, since engines are kept per
+    thread. Directory builds of one output tree are serialized.
+    """
+
+    def __init__(self, threads: int = CONVERT_THREADS):
+        self.started = time.time()
+        self.requests = 0
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='md2html-convert')
+        self._lock = threading.Lock()
+        self._tree_locks: dict[Path, threading.Lock] = {}
+
+    def warm_up(self, theme: Optional[str]) -> None:
+        """
+        Build every worker's engines and load the theme before the first
+        request. Each warm task waits at a barrier until all have started,
+        so every task runs on a thread of its own.
+        """
+        barrier = threading.Barrier(self.threads)
+
+        def warm() -> None:
+            barrier.wait()
+            engines.get(False)
+            engines.get(True)
+            load_theme(DEFAULT_THEME if theme in (None, 'auto') else theme)
+
+        for future in [self.executor.submit(warm) for _ in range(self.threads)]:
+            future.result()
+
+    def submit(self, op: str, params: dict) -> dict:
+        """Run a request on a conversion thread and wait for it."""
+        return self.executor.submit(self.handle, op, params).result()
+
+    def _tree_lock(self, output_dir: Path) -> threading.Lock:
+        with self._lock:
+            return self._tree_locks.setdefault(output_dir, threading.Lock())
+
+    def handle(self, op: str, params: dict) -> dict:
+        """Run one request. Raises ValueError or the converter's errors."""
+        with self._lock:
+            self.requests += 1
+        handler = getattr(self, f'op_{op}', None)
+        if handler is None:
+            raise ValueError(f"Unknown operation: {op}")
+        # Pick up edited theme files without a restart
+        themes.refresh()
+        return handler(params)
+
+    def op_ping(self, params: dict) -> dict:
+        return {
+            'version': __version__,
+            'protocol': PROTOCOL_VERSION,
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started,
+            'requests': self.requests,
+        }
+
+    def op_convert(self, params: dict) -> dict:
+        """Mirror of convert_markdown for one file."""
+        source = _path(params, 'source')
+        output = _path(params, 'output')
+        # The same checks as the CLI's single-file convert
+        if source.suffix not in ('.md', '.markdown'):
+            raise ValueError(f"Not a markdown file: {source}")
+        if output.is_dir() or output.suffix not in ('.html', '.htm'):
+            raise ValueError(f"Output must be an HTML file: {output}")
+        theme = _option(params, 'theme', str, None)
+        if theme is None:
+            raise ValueError("Missing parameter: theme")
+        hashed = _option(params, 'assets', str, 'inline') == 'hashed'
+        external = _option(params, 'css', str, 'inline') == 'external'
+
+        store = AssetStore(output.parent) if hashed else None
+        stylesheets = StylesheetStore(output.parent) if external else None
+        result = convert_markdown(
+            source, output, theme,
+            _option(params, 'embed_images', bool, True),
+            _option(params, 'toc', bool, False),
+            store, stylesheets,
+            _option(params, 'gzip', bool, False),
+        )
+        if store is not None:
+            store.flush()
+        prune_caches()
+        return {
+            'output': str(result.output),
+            'theme': result.theme,
+            'written': result.written,
+            'images': [str(image) for image in result.images],
+        }
+
+    def op_convert_directory(self, params: dict) -> dict:
+        """Mirror of convert_directory. jobs defaults to 1: this process is the warm one."""
+        source = _path(params, 'source')
+        output = _path(params, 'output')
+        theme = _option(params, 'theme', str, None)
+        if theme is None:
+            raise ValueError("Missing parameter: theme")
+
+        with self._tree_lock(output):
+            summary = convert_directory(
+                source, output, theme,
+                _option(params, 'embed_images', bool, True),
+                _option(params, 'toc', bool, False),
+                _option(params, 'recursive', bool, False),
+                jobs=_option(params, 'jobs', int, 1),
+                keep_going=_option(params, 'keep_going', bool, False),
+                force=_option(params, 'force', bool, False),
+                prune=_option(params, 'prune', bool, False),
+                hashed_assets=_option(params, 'assets', str, 'inline') == 'hashed',
+                external_css=_option(params, 'css', str, 'inline') == 'external',
+                precompress=_option(params, 'gzip', bool, False),
+                excludes=_patterns(params, 'exclude'),
+                gitignore=_option(params, 'gitignore', bool, True),
+            )
+        return asdict(summary)
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """One connection: any number of newline-delimited JSON requests."""
+
+    def handle(self):
+        server = self.server
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            if not line:
+                return
+            if len(line) > MAX_REQUEST_BYTES:
+                self._reply(None, error="Request too large")
+                return
+            self._serve(line)
+            if server.stopping:
+                return
+
+    def _reply(self, request_id, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        response = {'id': request_id, 'ok': error is None}
+        if error is None:
+            response['result'] = result
+        else:
+            response['error'] = error
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+    def _serve(self, line: bytes) -> None:
+        server = self.server
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+        except ValueError as e:
+            self._reply(None, error=f"Invalid request: {e}")
+            return
+
+        request_id = request.get('id')
+        token = request.get('token')
+        if not isinstance(token, str) or not hmac.compare_digest(token, server.token):
+            logger.warning("Rejected request with a wrong token")
+            self._reply(request_id, error="Invalid token")
+            return
+
+        op = request.get('op')
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            self._reply(request_id, error="Invalid request: params must be a JSON object")
+            return
+
+        if op == 'shutdown':
+            self._reply(request_id, {'stopping': True})
+            server.stopping = True
+            # shutdown() waits for serve_forever, so it cannot run on this thread's caller
+            threading.Thread(target=server.shutdown, daemon=True).start()
+            return
+
+        start = time.perf_counter()
+        try:
+            converter = server.converter
+            # Pings answer at once, even while every conversion thread is busy
+            result = converter.handle(op, params) if op == 'ping' else converter.submit(op, params)
+        except Exception as e:
+            logger.debug(f"Request failed: {op}", exc_info=True)
+            _log(f"Error: {op} {params.get('source', '')}: {e}")
+            self._reply(request_id, error=str(e))
+            return
+
+        elapsed = (time.perf_counter() - start) * 1000
+        if op != 'ping':
+            _log(f"{op} {params.get('source', '')} ({elapsed:.0f} ms)")
+        self._reply(request_id, result)
+
+
+class _DaemonServerMixin:
+    daemon_threads = True
+    # Conversions can take a while; never let a dead client hold a thread
+    block_on_close = False
+
+    def setup_daemon(self, converter: Converter, token: str) -> None:
+        self.converter = converter
+        self.token = token
+        self.stopping = False
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class UnixDaemonServer(_DaemonServerMixin, socketserver.ThreadingUnixStreamServer):
+        pass
+else:
+    UnixDaemonServer = None
+
+
+class TCPDaemonServer(_DaemonServerMixin, socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+
+
+def _write_state(state_path: Path, state: dict) -> None:
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    os.chmod(state_path.parent, 0o700)
+    # The token is a secret: create the file owner-only from the start
+    fd = os.open(state_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+
+def run_daemon(
+    socket_path: Optional[Path] = None,
+    port: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    theme: Optional[str] = None,
+    state_path: Optional[Path] = None
+) -> None:
+    """
+    Serve conversion requests until a shutdown request or Ctrl+C.
+    Listens on a Unix socket (default where supported), or on
+    127.0.0.1:port. The address and a per-run token are written to
+    the state file clients read; every request must carry the token.
+    """
+    if socket_path is not None and port is not None:
+        raise ValueError("Give either a socket path or a port, not both")
+    if port is None and UnixDaemonServer is None:
+        raise ValueError("Unix sockets are not supported here; use a port")
+
+    state_path = state_path or daemon_state_path()
+    running = DaemonClient.from_state(state_path)
+    if running is not None:
+        try:
+            info = running.request('ping')
+            raise ValueError(f"A daemon is already running (pid {info['pid']}, {running.address})")
+        except DaemonError:
+            pass
+
+    configure_cache(cache_dir)
+    converter = Converter()
+    converter.warm_up(theme)
+
+    token = secrets.token_hex(16)
+    if port is not None:
+        server = TCPDaemonServer(('127.0.0.1', port), DaemonHandler)
+        address = f"tcp:127.0.0.1:{server.server_address[1]}"
+    else:
+        socket_path = socket_path or default_socket_path()
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if socket_path.is_socket():
+            # Left behind by a daemon that did not shut down cleanly
+            socket_path.unlink()
+        old_umask = os.umask(0o177)
+        try:
+            server = UnixDaemonServer(str(socket_path), DaemonHandler)
+        finally:
+            os.umask(old_umask)
+        address = f"unix:{socket_path}"
+    server.setup_daemon(converter, token)
+
+    _write_state(state_path, {
+        'version': __version__,
+        'protocol': PROTOCOL_VERSION,
+        'pid': os.getpid(),
+        'address': address,
+        'token': token,
+    })
+    logger.info(f"Daemon listening on {address}")
+    _log(f"Listening on {address}")
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        converter.executor.shutdown(cancel_futures=True)
+        if address.startswith('unix:'):
+            Path(address[5:]).unlink(missing_ok=True)
+        # Only remove the state file if it is still ours
+        try:
+            if json.loads(state_path.read_text(encoding='utf-8')).get('token') == token:
+                state_path.unlink()
+        except (OSError, ValueError):
+            pass
+        _log(f"Stopped after {converter.requests} requests")
@@ -0,0 +1,311 @@
+"""
+Development server: render on request, serve from memory, live reload.
+One process, nothing written to disk, explicit theme only.
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+from html import escape
+from pathlib import Path
+from typing import Optional
+
+from aiohttp import web
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from .cache import LRUCache
+from .converter import render_markdown
+from .poller import SnapshotPoller
+from .registry import themes
+from .server import FileCache, handle_file, markdown_source, resolve_request_path
+from .sources import MARKDOWN_SUFFIXES
+from .watcher import WATCH_BACKENDS, DependencyGraph
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEV_CACHE_BYTES = 64 * 1024 * 1024
+
+# Editors save in bursts (write, rename, chmod); one reload per burst
+RELOAD_DELAY = 0.03
+
+# Comment lines keep idle event streams from being closed by proxies
+KEEPALIVE_SECONDS = 15
+
+EVENTS_PATH = '/__md2html/events'
+
+RELOAD_SCRIPT = f'''<script>
+(function () {{
+    var page = decodeURIComponent(location.pathname);
+    if (page.endsWith('/')) page += 'index.html';
+    new EventSource('{EVENTS_PATH}').onmessage = function (event) {{
+        if (event.data === '*' || event.data === page) location.reload();
+    }};
+}})();
+</script>
+'''
+
+
+def inject_reload_script(html: str) -> str:
+    """Add the live-reload client just before </body>."""
+    index = html.rfind('</body>')
+    if index == -1:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+class DevSite:
+    """
+    Pages of a source tree rendered on first request and kept in memory.
+    File events drop the affected pages - the page itself for Markdown,
+    every page that uses it for an image or theme file - and tell
+    connected browsers which URLs to reload.
+    """
+
+    def __init__(self, source_dir: Path, theme: str, toc: bool, max_bytes: int = DEV_CACHE_BYTES):
+        self.source_dir = source_dir
+        self.theme = theme
+        self.toc = toc
+        self.pages = LRUCache(max_bytes)
+        self.graph = DependencyGraph()
+        # The graph is updated by render threads and read by the observer
+        self._lock = threading.Lock()
+        self._generation = itertools.count()
+        self._current = next(self._generation)
+        self._clients: set[asyncio.Queue] = set()
+        self._pending: set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def url_for(self, md_file: Path) -> str:
+        """URL path a markdown file is served at."""
+        return '/' + md_file.relative_to(self.source_dir).with_suffix('.html').as_posix()
+
+    def source_for(self, request_path: str) -> Optional[Path]:
+        """Markdown file behind a request path, or None for a static file."""
+        path = resolve_request_path(self.source_dir, request_path)
+        if path.is_dir():
+            path = path / 'index.html'
+        return markdown_source(path)
+
+    def render(self, md_file: Path) -> bytes:
+        """The page for md_file, from memory when unchanged. Runs in a worker thread."""
+        page = self.pages.get(md_file)
+        if page is not None:
+            return page
+
+        # An edit during rendering must not leave the stale page cached
+        generation = self._current
+        themes.refresh()
+        html, result = render_markdown(
+            md_file,
+            md_file.with_suffix('.html'),
+            self.theme,
+            embed_images=False,  # Images are served from the source tree
+            toc=self.toc
+        )
+        page = inject_reload_script(html).encode('utf-8')
+        assets = result.images + [themes.path(result.theme)]
+        with self._lock:
+            self.graph.update(md_file, assets)
+            if generation == self._current:
+                self.pages.put(md_file, page, len(page))
+        return page
+
+    def changed(self, path: Path) -> None:
+        """Invalidate pages affected by a changed path. Called from the observer thread."""
+        path = path.resolve()
+        with self._lock:
+            self._current = next(self._generation)
+            if path.suffix in MARKDOWN_SUFFIXES:
+                documents = [path]
+                if not path.exists():
+                    self.graph.remove(path)
+            else:
+                documents = self.graph.dependents(path)
+
+        urls = set()
+        for document in documents:
+            self.pages.pop(document)
+            try:
+                urls.add(self.url_for(document))
+            except ValueError:
+                continue
+
+        if urls and self.loop is not None:
+            logger.info(f"Changed: {path} (reloading {len(urls)} pages)")
+            self.loop.call_soon_threadsafe(self._notify, urls)
+
+    def _notify(self, urls: set[str]) -> None:
+        self._pending |= urls
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_later(RELOAD_DELAY, self._flush)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        for url in sorted(self._pending):
+            for client in self._clients:
+                client.put_nowait(url)
+        self._pending.clear()
+
+    def connect(self) -> asyncio.Queue:
+        client: asyncio.Queue = asyncio.Queue()
+        self._clients.add(client)
+        return client
+
+    def disconnect(self, client: asyncio.Queue) -> None:
+        self._clients.discard(client)
+
+    def close(self) -> None:
+        """End every event stream so the server can shut down."""
+        for client in self._clients:
+            client.put_nowait(None)
+
+
+class DevHandler(FileSystemEventHandler):
+    """Forward every file event under the source tree to the site."""
+
+    def __init__(self, site: DevSite):
+        self.site = site
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type in ('opened', 'closed', 'closed_no_write'):
+            return
+        self.site.changed(Path(event.src_path))
+        dest_path = getattr(event, 'dest_path', '')
+        if dest_path:
+            self.site.changed(Path(dest_path))
+
+
+async def handle_events(request):
+    """Server-Sent Events stream of URL paths to reload."""
+    site = request.app['site']
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+    })
+    await response.prepare(request)
+
+    client = site.connect()
+    try:
+        while True:
+            try:
+                url = await asyncio.wait_for(client.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await response.write(b': keepalive\n\n')
+                continue
+            if url is None:
+                break
+            await response.write(f'data: {url}\n\n'.encode('utf-8'))
+    except ConnectionResetError:
+        pass
+    finally:
+        site.disconnect(client)
+    return response
+
+
+async def handle_page(request):
+    """
+    Serve a rendered page for .html paths backed by a markdown file.
+    Everything else is served from the source tree as by `md2html serve`.
+    """
+    site = request.app['site']
+    md_file = site.source_for(request.match_info.get('path', ''))
+    if md_file is None:
+        return await handle_file(request)
+
+    loop = asyncio.get_running_loop()
+    try:
+        page = await loop.run_in_executor(None, site.render, md_file)
+    except (FileNotFoundError, ValueError) as e:
+        # Shown in the browser, which reloads once the file is fixed
+        logger.error(f"Failed to render {md_file}: {e}")
+        body = inject_reload_script(f'<pre>{escape(str(e))}</pre>\n</body>')
+        return web.Response(status=500, text=body, content_type='text/html')
+
+    return web.Response(body=page, content_type='text/html', charset='utf-8')
+
+
+def create_dev_app(site: DevSite) -> web.Application:
+    """aiohttp application serving a DevSite and its static files."""
+    app = web.Application()
+    app['base_dir'] = site.source_dir
+    # No stat caching: an edited image must not be answered with a stale 304
+    app['files'] = FileCache(ttl=0)
+    app['site'] = site
+
+    async def on_startup(app):
+        site.loop = asyncio.get_running_loop()
+
+    async def on_shutdown(app):
+        site.close()
+
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+
+    app.router.add_get(EVENTS_PATH, handle_events)
+    app.router.add_get('/', handle_page)
+    app.router.add_get('/{path:.*}', handle_page)
+    return app
+
+
+def dev_server(
+    source_dir: Path,
+    theme: str,
+    toc: bool,
+    host: str,
+    port: int,
+    backend: str = 'native',
+    interval: float = 0.5
+) -> None:
+    """
+    Serve a source tree with in-memory rendering and live reload.
+    The whole tree is watched; interval only applies to the poll backend.
+    """
+    if not source_dir.exists():
+        raise FileNotFoundError(f"Source directory not found: {source_dir}")
+
+    if not source_dir.is_dir():
+        raise ValueError(f"Not a directory: {source_dir}")
+
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"Unknown watch backend: {backend}. Available: {', '.join(WATCH_BACKENDS)}")
+
+    site = DevSite(source_dir, theme, toc)
+    handler = DevHandler(site)
+
+    # Theme files usually live outside the tree; watch their directories too
+    watched = [(source_dir, True)]
+    for directory in themes.search_path:
+        directory = directory.resolve()
+        if directory.is_dir() and not directory.is_relative_to(source_dir):
+            watched.append((directory, False))
+
+    if backend == 'poll':
+        def interesting(path: str) -> bool:
+            return path.endswith(MARKDOWN_SUFFIXES) or path in site.graph
+
+        observers = []
+        for directory, recursive in watched:
+            # A poller watches a single root
+            poller = SnapshotPoller(interval, interesting)
+            poller.schedule(handler, str(directory), recursive=recursive)
+            observers.append(poller)
+    else:
+        observer = Observer()
+        for directory, recursive in watched:
+            observer.schedule(handler, str(directory), recursive=recursive)
+        observers = [observer]
+    for observer in observers:
+        observer.start()
+
+    logger.info(f"Starting dev server on {host}:{port} for {source_dir}")
+    try:
+        web.run_app(create_dev_app(site), host=host, port=port, print=None)
+    finally:
+        for observer in observers:
+            observer.stop()
+        for observer in observers:
+            observer.join()
@@ -0,0 +1,115 @@
+"""
+Reusable Markdown engines.
+Extension setup runs once per thread, not once per document.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+import markdown
+from markdown.postprocessors import Postprocessor
+
+from .highlight import HighlightCacheExtension, highlight_cache
+from .images import ImageRewriter
+from .serialize import serialize_html
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def markdown_extensions(toc: bool) -> list[str]:
+    """Markdown extensions used for every conversion."""
+    extensions = ['extra', 'codehilite']
+    if toc:
+        extensions.append('toc')
+    return extensions
+
+
+class UnstrippedPostprocessor(Postprocessor):
+    """Runs last and, when capturing, keeps the body convert() is about to strip."""
+
+    def __init__(self, md: markdown.Markdown):
+        super().__init__(md)
+        self.capture = False
+        self.output: Optional[str] = None
+
+    def run(self, text: str) -> str:
+        if self.capture:
+            self.output = text
+        return text
+
+
+def build_engine(toc: bool) -> markdown.Markdown:
+    """
+    Markdown engine that highlights through the highlight cache and can
+    hand back its unstripped output.
+    """
+    md = markdown.Markdown(extensions=markdown_extensions(toc) + [HighlightCacheExtension()])
+    md.postprocessors.register(UnstrippedPostprocessor(md), 'md2html_unstripped', -100)
+    return md
+
+
+class EnginePool:
+    """
+    Markdown engines reused across documents.
+    Keeps one engine per extension set and thread, and resets it
+    before each document. Use one pool to convert many strings:
+
+        pool = EnginePool()
+        bodies = [pool.convert(text) for text in texts]
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, toc: bool) -> markdown.Markdown:
+        """This thread's engine for the extension set, reset for a new document."""
+        engines = self._local.__dict__.setdefault('engines', {})
+        engine = engines.get(toc)
+        if engine is None:
+            logger.debug(f"Building Markdown engine (toc={toc}) for {threading.current_thread().name}")
+            engine = engines[toc] = build_engine(toc)
+        else:
+            engine.reset()
+        return engine
+
+    def convert(
+        self,
+        text: str,
+        toc: bool = False,
+        images: Optional[ImageRewriter] = None
+    ) -> str:
+        """
+        Render markdown text to an HTML body, serialized as
+        serialize.HTMLSerializer writes it. Images are left as written
+        unless a rewriter is given; code blocks are served from the
+        highlight cache when unchanged.
+        """
+        md = self.get(toc)
+        with highlight_cache.active():
+            body = md.convert(text)
+        return serialize_html(body, images.rewrite if images is not None else None)
+
+    def convert_piece(self, text: str, toc: bool = False) -> str:
+        """
+        Render one piece of a longer document, as cut by blocks.split_blocks,
+        to Markdown's own output. Unlike convert, nothing is serialized
+        and whitespace that raw HTML leaves at the ends is kept: a
+        document's non-empty pieces joined with newlines and stripped
+        are what convert() serializes, so feed them to one HTMLSerializer.
+        """
+        md = self.get(toc)
+        unstripped = md.postprocessors['md2html_unstripped']
+        unstripped.capture = True
+        try:
+            with highlight_cache.active():
+                md.convert(text)
+            return unstripped.output or ''
+        finally:
+            unstripped.capture = False
+            unstripped.output = None
+
+
+# Process-wide pool used by the converter, watcher and worker processes
+engines = EnginePool()
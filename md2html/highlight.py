@@ -0,0 +1,159 @@
+"""
+Cache for codehilite/Pygments highlighted code blocks.
+Unchanged code blocks are looked up instead of re-lexed.
+"""
+
+import hashlib
+import logging
+import types
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+import markdown
+from markdown.extensions import Extension, codehilite, fenced_code
+
+from .cache import DiskCache, LRUCache
+from .metrics import stage
+
+try:
+    import pygments
+    PYGMENTS_VERSION = pygments.__version__
+except ImportError:
+    PYGMENTS_VERSION = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+HIGHLIGHT_CACHE_MEMORY_BYTES = 32 * 1024 * 1024
+HIGHLIGHT_CACHE_DISK_BYTES = 256 * 1024 * 1024
+
+# Cache used by CachedCodeHilite in the current context, if any
+_active: ContextVar[Optional['HighlightCache']] = ContextVar('md2html_highlight_cache', default=None)
+
+
+class HighlightCache:
+    """
+    Highlighted HTML keyed by language, code hash, Pygments and Markdown
+    versions and every codehilite option. In memory, optionally on disk.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.memory = LRUCache(max_bytes)
+        self.disk: Optional[DiskCache] = None
+
+    def persist_to(self, directory: Optional[Path], max_bytes: int = HIGHLIGHT_CACHE_DISK_BYTES) -> None:
+        """Keep highlighted blocks under directory between runs, or stop with None."""
+        self.disk = DiskCache(directory / 'highlight', max_bytes) if directory else None
+
+    def get(self, key: str) -> Optional[str]:
+        html = self.memory.get(key)
+        if html is not None:
+            return html
+
+        data = self.disk.get(key) if self.disk else None
+        if data is None:
+            return None
+        html = data.decode('utf-8')
+        self.memory.put(key, html, len(html))
+        return html
+
+    def put(self, key: str, html: str) -> None:
+        self.memory.put(key, html, len(html))
+        if self.disk:
+            self.disk.put(key, html.encode('utf-8'))
+
+    @contextmanager
+    def active(self):
+        """Serve codehilite from this cache for the enclosed conversions."""
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    def prune(self) -> None:
+        """Trim the on-disk store to its size budget."""
+        if self.disk:
+            self.disk.prune()
+
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """
+    CodeHilite that consults the active HighlightCache.
+    Behaves exactly like CodeHilite outside HighlightCache.active().
+    """
+
+    def hilite(self, shebang: bool = True) -> str:
+        with stage('highlight'):
+            return self._hilite(shebang)
+
+    def _hilite(self, shebang: bool) -> str:
+        cache = _active.get()
+        if cache is None:
+            return super().hilite(shebang)
+
+        # hilite() mutates src and lang, so the key is taken first
+        settings = sorted(
+            (name, repr(value)) for name, value in vars(self).items() if name != 'src'
+        )
+        code_hash = hashlib.sha256(self.src.encode('utf-8')).hexdigest()
+        key = hashlib.sha256(repr((
+            self.lang, code_hash, shebang, settings,
+            PYGMENTS_VERSION, markdown.__version__,
+        )).encode('utf-8')).hexdigest()
+
+        html = cache.get(key)
+        if html is None:
+            html = super().hilite(shebang)
+            cache.put(key, html)
+        return html
+
+
+def _using_cached_codehilite(function: types.FunctionType) -> types.FunctionType:
+    """
+    A copy of a codehilite or fenced_code function that builds
+    CachedCodeHilite where it names CodeHilite. The modules themselves
+    are left alone, so Markdown instances elsewhere are unaffected.
+    """
+    namespace = dict(function.__globals__, CodeHilite=CachedCodeHilite)
+    return types.FunctionType(
+        function.__code__, namespace, function.__name__,
+        function.__defaults__, function.__closure__,
+    )
+
+
+class CachedHiliteTreeprocessor(codehilite.HiliteTreeprocessor):
+    """codehilite's indented-code highlighter, through CachedCodeHilite."""
+
+    run = _using_cached_codehilite(codehilite.HiliteTreeprocessor.run)
+
+
+class CachedFencedBlockPreprocessor(fenced_code.FencedBlockPreprocessor):
+    """fenced_code's block highlighter, through CachedCodeHilite."""
+
+    run = _using_cached_codehilite(fenced_code.FencedBlockPreprocessor.run)
+
+
+class HighlightCacheExtension(Extension):
+    """
+    Route an engine's indented and fenced code through CachedCodeHilite.
+    List it after 'extra' and 'codehilite', whose processors it replaces
+    under their own names and priorities.
+    """
+
+    def extendMarkdown(self, md) -> None:
+        if 'hilite' in md.treeprocessors:
+            hiliter = CachedHiliteTreeprocessor(md)
+            hiliter.config = md.treeprocessors['hilite'].config
+            md.treeprocessors.register(hiliter, 'hilite', 30)
+        if 'fenced_code_block' in md.preprocessors:
+            config = md.preprocessors['fenced_code_block'].config
+            md.preprocessors.register(
+                CachedFencedBlockPreprocessor(md, config), 'fenced_code_block', 25
+            )
+
+
+# Process-wide cache used by the engine pool
+highlight_cache = HighlightCache(HIGHLIGHT_CACHE_MEMORY_BYTES)
@@ -0,0 +1,295 @@
+"""
+Image resolution and embedding.
+Image sources are rewritten while the rendered body is serialized.
+"""
+
+import base64
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from .cache import DiskCache, LRUCache
+from .metrics import stage
+from .output import NEW_FILE_MODE
+from .serialize import serialize_html
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Configuration constants
+MAX_IMAGE_SIZE_MB = 10  # Maximum image size in megabytes
+MAX_IMAGE_SIZE_BYTES = MAX_IMAGE_SIZE_MB * 1024 * 1024
+
+VALID_IMAGE_FORMATS = {
+    'image/jpeg', 'image/jpg', 'image/png', 'image/gif',
+    'image/svg+xml', 'image/webp', 'image/bmp'
+}
+
+# Encoded data URIs kept in memory and, optionally, on disk between runs
+IMAGE_CACHE_MEMORY_BYTES = 64 * 1024 * 1024
+IMAGE_CACHE_DISK_BYTES = 512 * 1024 * 1024
+
+# Output subdirectory for --assets hashed
+ASSETS_DIR = '_assets'
+ASSET_HASH_LENGTH = 16
+
+
+class ImageNotFoundError(FileNotFoundError):
+    """A document references a local image that does not exist."""
+
+    def __init__(self, image_path: Path):
+        super().__init__(f"Image not found: {image_path}")
+        self.image_path = image_path
+
+
+def image_mime_type(image_path: Path) -> str:
+    """
+    MIME type of a supported image format.
+    No fallback MIME types, must be detectable.
+    """
+    mime_type, _ = mimetypes.guess_type(str(image_path))
+    if not mime_type or not mime_type.startswith('image/'):
+        raise ValueError(f"Not a valid image file: {image_path}")
+
+    # Validate common image formats
+    if mime_type not in VALID_IMAGE_FORMATS:
+        raise ValueError(
+            f"Unsupported image format: {mime_type} for {image_path.name}"
+        )
+    return mime_type
+
+
+def encode_image(image_path: Path) -> str:
+    """
+    Encode image to base64 data URI.
+    No fallback MIME types, must be detectable.
+    Includes size validation to prevent memory exhaustion.
+    """
+    if not image_path.exists():
+        logger.error(f"Image not found: {image_path}")
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    # Check file size before processing
+    file_size = image_path.stat().st_size
+    if file_size > MAX_IMAGE_SIZE_BYTES:
+        size_mb = file_size / (1024 * 1024)
+        logger.warning(f"Image too large: {image_path.name} ({size_mb:.1f}MB)")
+        raise ValueError(
+            f"Image too large: {image_path.name} is {size_mb:.1f}MB "
+            f"(max: {MAX_IMAGE_SIZE_MB}MB)"
+        )
+
+    mime_type = image_mime_type(image_path)
+
+    with open(image_path, 'rb') as f:
+        encoded = base64.b64encode(f.read()).decode('utf-8')
+
+    logger.debug(f"Encoded image: {image_path.name} ({file_size / 1024:.1f}KB)")
+    return f"data:{mime_type};base64,{encoded}"
+
+
+class ImageCache:
+    """
+    Encoded data URIs keyed by resolved path, size and mtime.
+    Misses go through encode_image, so size and format checks still apply.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.memory = LRUCache(max_bytes)
+        self.disk: Optional[DiskCache] = None
+        # (path, size, mtime_ns) -> sha256 of the file content
+        self.hashes = LRUCache(1024 * 1024)
+
+    def persist_to(self, directory: Optional[Path], max_bytes: int = IMAGE_CACHE_DISK_BYTES) -> None:
+        """Keep encoded images under directory between runs, or stop with None."""
+        self.disk = DiskCache(directory / 'images', max_bytes) if directory else None
+
+    def data_uri(self, image_path: Path) -> str:
+        """Data URI for an image, encoding it only on a cache miss."""
+        resolved = image_path.resolve()
+        try:
+            stat = resolved.stat()
+        except OSError:
+            # Let encode_image report the missing file
+            return encode_image(image_path)
+
+        key = (str(resolved), stat.st_size, stat.st_mtime_ns)
+        uri = self.memory.get(key)
+        if uri is not None:
+            return uri
+
+        disk_key = '|'.join(map(str, key))
+        data = self.disk.get(disk_key) if self.disk else None
+        if data is not None:
+            uri = data.decode('ascii')
+            logger.debug(f"Image cache hit on disk: {image_path.name}")
+        else:
+            uri = encode_image(image_path)
+            if self.disk:
+                self.disk.put(disk_key, uri.encode('ascii'))
+
+        self.memory.put(key, uri, len(uri))
+        return uri
+
+    def content_hash(self, image_path: Path) -> str:
+        """sha256 of an image file, computed once per path, size and mtime."""
+        resolved = image_path.resolve()
+        stat = resolved.stat()
+        key = (str(resolved), stat.st_size, stat.st_mtime_ns)
+        digest = self.hashes.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(resolved, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            self.hashes.put(key, digest, len(digest))
+        return digest
+
+    def prune(self) -> None:
+        """Trim the on-disk store to its size budget."""
+        if self.disk:
+            self.disk.prune()
+
+
+# Process-wide cache shared by batch, watch and serve runs
+image_cache = ImageCache(IMAGE_CACHE_MEMORY_BYTES)
+
+
+class AssetStore:
+    """
+    Content-hashed image copies under <output root>/_assets.
+    Documents link to the hashed file; each unique image is copied once
+    per build by flush(), and files already present are left alone.
+    """
+
+    def __init__(self, output_root: Path):
+        self.directory = output_root / ASSETS_DIR
+        # destination -> source, waiting for flush()
+        self.pending: dict[Path, Path] = {}
+
+    def target(self, image_path: Path) -> Path:
+        """Hashed destination for an image. Image format must be supported."""
+        image_mime_type(image_path)
+        digest = image_cache.content_hash(image_path)[:ASSET_HASH_LENGTH]
+        return self.directory / f"{digest}{image_path.suffix.lower()}"
+
+    def add(self, assets: dict[Path, Path]) -> None:
+        """Schedule copies of destination -> source pairs."""
+        self.pending.update(assets)
+
+    def flush(self, jobs: Optional[int] = None) -> int:
+        """Copy pending images in parallel. Returns the number copied."""
+        missing = sorted(
+            (dest, source) for dest, source in self.pending.items()
+            if not dest.exists()
+        )
+        self.pending.clear()
+        if not missing:
+            return 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=jobs or min(32, len(missing))) as executor:
+            list(executor.map(lambda pair: _copy_asset(*pair), missing))
+
+        logger.info(f"Copied {len(missing)} assets to {self.directory}")
+        return len(missing)
+
+
+def _copy_asset(dest: Path, source: Path) -> None:
+    """Copy via a temporary file so readers never see a partial asset."""
+    fd, tmp_name = tempfile.mkstemp(dir=dest.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_name)
+        # mkstemp files are owner-only; assets must be readable like the pages
+        os.chmod(tmp_name, NEW_FILE_MODE)
+        os.replace(tmp_name, dest)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+class ImageRewriter:
+    """
+    Resolve image sources for one document.
+    Images must be relative to the markdown file location.
+    Local image paths are collected in ``referenced``. With an asset
+    store, images are linked to their hashed copies relative to
+    ``html_dir`` and the copies are recorded in ``assets``.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        embed: bool,
+        assets: Optional[AssetStore] = None,
+        html_dir: Optional[Path] = None
+    ):
+        self.base_dir = base_dir
+        self.embed = embed
+        self.store = assets
+        self.html_dir = html_dir
+        self.referenced: list[Path] = []
+        self.assets: dict[Path, Path] = {}
+
+    def rewrite(self, src: Optional[str]) -> Optional[str]:
+        """New src for an image, or None to leave it unchanged."""
+        with stage('images'):
+            return self._rewrite(src)
+
+    def _rewrite(self, src: Optional[str]) -> Optional[str]:
+        if not src:
+            raise ValueError("Image tag without src attribute found")
+
+        # Skip external images
+        if src.startswith(('http://', 'https://', 'data:')):
+            return None
+
+        # Image must be relative to markdown file
+        image_path = self.base_dir / src
+
+        if not image_path.exists():
+            logger.error(f"Image not found during processing: {image_path}")
+            raise ImageNotFoundError(image_path)
+
+        self.referenced.append(image_path)
+
+        if self.store is not None:
+            dest = self.store.target(image_path)
+            self.assets[dest] = image_path
+            return Path(os.path.relpath(dest, self.html_dir)).as_posix()
+
+        if self.embed:
+            return image_cache.data_uri(image_path)
+        return None
+
+
+def process_images(
+    html: str,
+    base_dir: Path,
+    embed: bool,
+    referenced: Optional[list[Path]] = None,
+    assets: Optional[AssetStore] = None,
+    html_dir: Optional[Path] = None
+) -> str:
+    """
+    Process images in an HTML string. No path searching.
+    Images must be relative to markdown file location.
+    Local images are embedded, linked as-is, or, with an asset store,
+    linked to hashed copies relative to html_dir and scheduled for copy.
+    Local image paths are appended to ``referenced`` when given.
+    """
+    rewriter = ImageRewriter(base_dir, embed, assets, html_dir)
+    result = serialize_html(html, rewriter.rewrite)
+    if referenced is not None:
+        referenced.extend(rewriter.referenced)
+    if assets is not None:
+        assets.add(rewriter.assets)
+    return result
@@ -0,0 +1,152 @@
+"""
+Build manifest for incremental directory conversion.
+Records exactly what each output was built from, nothing more.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+
+from .output import write_if_changed
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.md2html-manifest.json'
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data: bytes) -> str:
+    """Content hash used for every manifest entry."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    """Hash a file's content, read in fixed-size chunks."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class BuildManifest:
+    """
+    Content-hash manifest stored in the output directory.
+    An output is fresh only when its source, theme CSS and local images
+    all hash the same as when it was built, under the same options.
+    """
+
+    def __init__(self, output_dir: Path, options: dict, files: Optional[dict] = None):
+        self.path = output_dir / MANIFEST_NAME
+        self.output_dir = output_dir
+        self.options = options
+        self.files: dict[str, dict] = files or {}
+
+    @classmethod
+    def load(cls, output_dir: Path, options: Optional[dict]) -> 'BuildManifest':
+        """
+        Load the manifest for output_dir.
+        A missing, unreadable or outdated manifest yields an empty one.
+        With options None the manifest is read whatever options built it.
+        """
+        path = output_dir / MANIFEST_NAME
+        if not path.exists():
+            return cls(output_dir, options)
+
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+            return cls(output_dir, options)
+
+        if data.get('version') != MANIFEST_VERSION:
+            logger.info(f"Manifest version changed; rebuilding {output_dir}")
+            return cls(output_dir, options)
+
+        if options is None:
+            options = data.get('options')
+        elif data.get('options') != options:
+            logger.info(f"Conversion options changed; rebuilding {output_dir}")
+            return cls(output_dir, options)
+
+        return cls(output_dir, options, data.get('files', {}))
+
+    def is_fresh(
+        self,
+        key: str,
+        source_hash: str,
+        html_file: Path,
+        theme_hash,
+        image_hash
+    ) -> bool:
+        """
+        Check whether the recorded output for key can be reused.
+        theme_hash and image_hash map a theme name / image path to the
+        current content hash, or None when it no longer exists.
+        """
+        entry = self.files.get(key)
+        if entry is None or entry['source'] != source_hash:
+            return False
+
+        if not html_file.exists():
+            return False
+
+        if theme_hash(entry['theme']) != entry['theme_css']:
+            return False
+
+        for image, recorded in entry['images'].items():
+            if image_hash(image) != recorded:
+                return False
+
+        return True
+
+    def record(
+        self,
+        key: str,
+        source_hash: str,
+        output: str,
+        theme: str,
+        theme_css_hash: str,
+        images: dict[str, str]
+    ) -> None:
+        """Record the inputs an output was built from."""
+        self.files[key] = {
+            'source': source_hash,
+            'output': output,
+            'theme': theme,
+            'theme_css': theme_css_hash,
+            'images': images,
+        }
+
+    def forget(self, key: str) -> None:
+        """Drop an entry so the file is rebuilt next run."""
+        self.files.pop(key, None)
+
+    def orphans(self, keys: set[str]) -> list[Path]:
+        """Outputs recorded for sources that are no longer present."""
+        return sorted(
+            self.output_dir / entry['output']
+            for key, entry in self.files.items()
+            if key not in keys
+        )
+
+    def prune(self, keys: set[str]) -> None:
+        """Forget every entry whose source is no longer present."""
+        for key in [key for key in self.files if key not in keys]:
+            del self.files[key]
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': MANIFEST_VERSION,
+            'options': self.options,
+            'files': dict(sorted(self.files.items())),
+        }
+        # Left alone when nothing changed, so syncing the output tree skips it
+        if write_if_changed(self.path, json.dumps(data, indent=2).encode('utf-8')):
+            logger.debug(f"Saved manifest: {self.path} ({len(self.files)} files)")
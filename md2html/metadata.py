@@ -0,0 +1,221 @@
+"""
+Document metadata from the head of a markdown file.
+Only a bounded prefix is scanned; nothing past it is guessed at.
+"""
+
+import codecs
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .registry import themes
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_THEME = 'manaforge'
+THEME_HINT_COMMENT_RE = re.compile(
+    r'<!--\s*md2html-theme\s*:\s*([a-z0-9\-]+)\s*-->',
+    re.IGNORECASE,
+)
+
+# Bytes read when looking for metadata; front matter must close within them
+HEAD_BYTES = 64 * 1024
+# A theme comment must appear within this many characters of the start
+HINT_SCAN_CHARS = 2000
+
+# Lines a front-matter block may consist of; anything else is a document
+# that merely starts with a horizontal rule, and is rendered as such
+FRONT_MATTER_LINE_RE = re.compile(r'^(?:\s|#|- |[A-Za-z0-9_\-]+\s*:|$)')
+
+
+@dataclass
+class DocumentMeta:
+    """
+    Metadata declared at the top of a document.
+    theme is the declared name, not yet validated; source says where it
+    was found ('comment' or 'front matter'). body_offset is the byte
+    offset the Markdown body starts at, past any front matter.
+    """
+    theme: Optional[str] = None
+    source: Optional[str] = None
+    body_offset: int = 0
+
+
+def _decode_head(head: bytes, md_file: Path) -> str:
+    # A prefix may end inside a multi-byte character; only complete ones decode
+    try:
+        return codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+    except UnicodeDecodeError:
+        raise ValueError(f"File is not valid UTF-8: {md_file}")
+
+
+def _front_matter(text: str, complete: bool) -> tuple[list[str], Optional[int]]:
+    """
+    Lines of a front-matter block at the start of text, and the character
+    offset just past its closing '---'. The offset is None when the block
+    does not close or is not plain '---' delimited metadata.
+    """
+    stripped = text.lstrip()
+    if not stripped.startswith('---'):
+        return [], None
+
+    start = len(text) - len(stripped)
+    pos = text.find('\n', start)
+    # '----' or '---x' still declares a theme, but is not skipped on render
+    exact = text[start:len(text) if pos == -1 else pos].strip() == '---'
+    lines: list[str] = []
+    while pos != -1:
+        line_start = pos + 1
+        pos = text.find('\n', line_start)
+        if pos == -1 and not complete:
+            # The last line of a prefix may be cut short
+            break
+        line = text[line_start:len(text) if pos == -1 else pos]
+        if line.strip() == '---':
+            if not exact or not all(FRONT_MATTER_LINE_RE.match(item) for item in lines):
+                return lines, None
+            return lines, len(text) if pos == -1 else pos + 1
+        lines.append(line)
+    return lines, None
+
+
+def _front_matter_theme(lines: list[str]) -> Optional[str]:
+    """Value of 'theme:', 'md2html-theme:' or an indented 'theme:' under 'md2html:'."""
+    idx = 0
+    while idx < len(lines):
+        line = lines[idx].strip()
+        if not line or line.startswith('#') or ':' not in line:
+            idx += 1
+            continue
+
+        key, value = line.split(':', 1)
+        key = key.strip().lower()
+        value = value.strip()
+
+        if key in ('theme', 'md2html-theme'):
+            return value
+
+        if key == 'md2html':
+            idx += 1
+            while idx < len(lines):
+                sub_raw = lines[idx]
+                if not sub_raw.startswith((' ', '\t')):
+                    break
+                sub_line = sub_raw.strip()
+                if sub_line.startswith('theme:'):
+                    return sub_line.split(':', 1)[1].strip()
+                idx += 1
+            continue
+
+        idx += 1
+
+    return None
+
+
+def scan_head(head: bytes, md_file: Path, complete: bool = False) -> DocumentMeta:
+    """
+    Parse metadata from the first bytes of a document. A theme comment
+    wins over front matter. complete says head is the whole file.
+    Front matter is only skipped when it closes within head and holds
+    nothing but keys, comments and indented or list lines.
+    """
+    text = _decode_head(head, md_file)
+    meta = DocumentMeta()
+
+    lines, end = _front_matter(text, complete)
+    if end is not None:
+        meta.body_offset = len(text[:end].encode('utf-8'))
+
+    comment_match = THEME_HINT_COMMENT_RE.search(text, 0, HINT_SCAN_CHARS)
+    if comment_match:
+        meta.theme = comment_match.group(1)
+        meta.source = 'comment'
+        return meta
+
+    theme = _front_matter_theme(lines)
+    if theme is not None:
+        meta.theme = theme
+        meta.source = 'front matter'
+    return meta
+
+
+def read_metadata(md_file: Path) -> DocumentMeta:
+    """Metadata of a markdown file, reading at most HEAD_BYTES of it."""
+    with open(md_file, 'rb') as f:
+        head = f.read(HEAD_BYTES + 1)
+    complete = len(head) <= HEAD_BYTES
+    return scan_head(head[:HEAD_BYTES], md_file, complete)
+
+
+def scan_text(text: str, md_file: Path) -> tuple[DocumentMeta, str]:
+    """Metadata of Markdown already in memory, and its body past any front matter."""
+    try:
+        head = text[:HEAD_BYTES].encode('utf-8')
+    except UnicodeEncodeError:
+        raise ValueError(f"Text is not valid UTF-8: {md_file}")
+    complete = len(text) <= HEAD_BYTES and len(head) <= HEAD_BYTES
+    meta = scan_head(head[:HEAD_BYTES], md_file, complete)
+    if not meta.body_offset:
+        return meta, text
+    return meta, text[len(head[:meta.body_offset].decode('utf-8')):]
+
+
+def decode_body(data: bytes, meta: DocumentMeta, md_file: Path) -> str:
+    """The Markdown body of a file's bytes, without its front matter."""
+    try:
+        # Decoding a view of the body avoids copying the bytes first
+        return codecs.utf_8_decode(memoryview(data)[meta.body_offset:], None, True)[0]
+    except UnicodeDecodeError:
+        raise ValueError(f"File is not valid UTF-8: {md_file}")
+
+
+def normalize_theme(theme: str, md_file: Path) -> str:
+    """A declared theme name, checked against the registry."""
+    candidate = theme.strip().strip('"').strip("'").lower()
+    if not candidate:
+        raise ValueError(f"Theme metadata in {md_file} is empty")
+    if candidate not in themes:
+        raise ValueError(
+            f"Unknown theme '{candidate}' in {md_file}. "
+            f"Available themes: {', '.join(themes.names())}"
+        )
+    return candidate
+
+
+def resolve_theme(requested_theme: str, meta: DocumentMeta, md_file: Path) -> str:
+    """
+    Theme to render with: the document's own, else the requested one.
+    With 'auto' and no metadata, the default theme.
+    """
+    discovered = normalize_theme(meta.theme, md_file) if meta.theme is not None else None
+
+    if requested_theme == 'auto':
+        if discovered:
+            logger.info("Detected theme '%s' for %s", discovered, md_file.name)
+            return discovered
+        logger.info(
+            "No theme metadata found in %s; falling back to default '%s'",
+            md_file.name,
+            DEFAULT_THEME,
+        )
+        return DEFAULT_THEME
+
+    if discovered and discovered != requested_theme:
+        logger.info(
+            "Applying per-file theme '%s' for %s (overriding CLI choice '%s')",
+            discovered,
+            md_file.name,
+            requested_theme,
+        )
+        return discovered
+
+    if requested_theme not in themes:
+        raise ValueError(
+            f"Unknown theme '{requested_theme}'. "
+            f"Available themes: {', '.join(themes.names())}"
+        )
+
+    return requested_theme
@@ -0,0 +1,342 @@
+"""
+Per-stage timings for conversions.
+Off unless enabled; stages are explicit, nothing is sampled.
+"""
+
+import heapq
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Stages of one conversion, in pipeline order
+STAGES = ('read', 'theme', 'markdown', 'highlight', 'images', 'build_html', 'write')
+
+REPORT_VERSION = 1
+SLOWEST_COUNT = 10
+
+
+@dataclass
+class FileProfile:
+    """
+    Wall time per stage for one file, in seconds. Nested stages are not
+    counted in their parent, so the stages add up to the total. With
+    memory profiling, peak_bytes holds the tracemalloc peak per stage
+    above what was allocated when the stage began. outputs counts the
+    pages written from the one render, one per theme.
+    """
+    path: str
+    total: float = 0.0
+    stages: dict[str, float] = field(default_factory=dict)
+    peak_bytes: Optional[dict[str, int]] = None
+    outputs: int = 1
+
+
+class _Frame:
+    __slots__ = ('name', 'start', 'child_time', 'base', 'peak')
+
+    def __init__(self, name: str, base: int):
+        self.name = name
+        self.start = time.perf_counter()
+        self.child_time = 0.0
+        self.base = base
+        self.peak = base
+
+
+class _Recorder:
+    def __init__(self, profile: FileProfile, memory: bool):
+        self.profile = profile
+        self.memory = memory
+        self.frames: list[_Frame] = []
+
+    def _fold_peak(self) -> None:
+        # tracemalloc has one peak; fold it into every open stage, then restart it
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self.frames:
+            frame.peak = max(frame.peak, peak)
+        tracemalloc.reset_peak()
+
+    def enter(self, name: str) -> None:
+        base = 0
+        if self.memory:
+            self._fold_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        self.frames.append(_Frame(name, base))
+
+    def exit(self) -> None:
+        if self.memory:
+            self._fold_peak()
+        frame = self.frames.pop()
+        elapsed = time.perf_counter() - frame.start
+        if self.frames:
+            self.frames[-1].child_time += elapsed
+
+        stages = self.profile.stages
+        stages[frame.name] = stages.get(frame.name, 0.0) + elapsed - frame.child_time
+        if self.memory:
+            peaks = self.profile.peak_bytes
+            peaks[frame.name] = max(peaks.get(frame.name, 0), frame.peak - frame.base)
+
+
+# Recorder for the conversion running in this context, if any
+_active: ContextVar[Optional[_Recorder]] = ContextVar('md2html_metrics', default=None)
+
+# None when profiling is off, else whether to trace memory
+_settings: Optional[bool] = None
+
+_hooks: list[Callable[[FileProfile], None]] = []
+
+
+def enable(memory: bool = False) -> None:
+    """Profile every conversion in this process; memory adds tracemalloc peaks."""
+    global _settings
+    _settings = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    global _settings
+    _settings = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def settings() -> Optional[bool]:
+    """Current profiling setting, to pass on to worker processes."""
+    return _settings
+
+
+def add_hook(hook: Callable[[FileProfile], None]) -> None:
+    """
+    Call hook with the FileProfile of every profiled conversion the
+    converter, watcher or CLI collects in this process - including
+    those converted by worker processes.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[FileProfile], None]) -> None:
+    _hooks.remove(hook)
+
+
+def record(profile: Optional[FileProfile]) -> None:
+    """Hand a finished profile to every hook. None is ignored."""
+    if profile is None:
+        return
+    for hook in list(_hooks):
+        hook(profile)
+
+
+@contextmanager
+def profile_file(path: Path):
+    """
+    Profile the enclosed conversion of path. Yields the FileProfile,
+    filled in on exit, or None when profiling is off or already active.
+    """
+    if _settings is None or _active.get() is not None:
+        yield None
+        return
+
+    memory = _settings and tracemalloc.is_tracing()
+    profile = FileProfile(str(path), peak_bytes={} if memory else None)
+    recorder = _Recorder(profile, memory)
+    token = _active.set(recorder)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+        profile.total = time.perf_counter() - start
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as a stage of the active profile. Free when off."""
+    recorder = _active.get()
+    if recorder is None:
+        yield
+        return
+
+    recorder.enter(name)
+    try:
+        yield
+    finally:
+        recorder.exit()
+
+
+class _Totals:
+    """Running per-stage totals and the slowest files and stages of some profiles."""
+
+    def __init__(self):
+        self.files = 0
+        self.pages = 0
+        self.convert_seconds = 0.0
+        # name -> [total, files, max, peak bytes or None]
+        self.stages: dict[str, list] = {}
+        # Min-heaps of the SLOWEST_COUNT largest; ties keep the earlier file
+        self.slowest_files: list[tuple] = []
+        self.slowest_stages: list[tuple] = []
+
+    def add(self, profile: FileProfile) -> None:
+        self.files += 1
+        self.pages += profile.outputs
+        self.convert_seconds += profile.total
+        for name, seconds in profile.stages.items():
+            entry = self.stages.setdefault(name, [0.0, 0, 0.0, None])
+            entry[0] += seconds
+            entry[1] += 1
+            entry[2] = max(entry[2], seconds)
+            if profile.peak_bytes and name in profile.peak_bytes:
+                entry[3] = max(entry[3] or 0, profile.peak_bytes[name])
+            _keep_largest(self.slowest_stages, (seconds, name, profile.path))
+        _keep_largest(self.slowest_files, (profile.total, -self.files, profile.path, dict(profile.stages)))
+
+    def summary(self) -> dict:
+        stages: dict[str, dict] = {}
+        for name in STAGES:
+            if name not in self.stages:
+                continue
+            total, files, longest, peak = self.stages[name]
+            entry = {'total': total, 'mean': total / files, 'max': longest, 'files': files}
+            if peak is not None:
+                entry['peak_bytes_max'] = peak
+            stages[name] = entry
+        return {
+            'files': self.files,
+            'pages': self.pages,
+            'convert_seconds': self.convert_seconds,
+            'stages': stages,
+            'slowest_files': [
+                {'path': path, 'total': total, 'stages': file_stages}
+                for total, _, path, file_stages in sorted(self.slowest_files, reverse=True)
+            ],
+            'slowest_stages': [
+                {'stage': name, 'path': path, 'seconds': seconds}
+                for seconds, name, path in sorted(self.slowest_stages, reverse=True)
+            ],
+        }
+
+
+def _keep_largest(heap: list[tuple], item: tuple) -> None:
+    if len(heap) < SLOWEST_COUNT:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+class RunReport:
+    """
+    Aggregate of the profiles of one run, written as JSON or NDJSON.
+    Register add() as a hook to collect everything the run converts.
+    Stage totals and the slowest files are kept as running aggregates;
+    each file's own profile only with keep_profiles. A long-running
+    session turns that off and calls write_batch() after every batch.
+    """
+
+    def __init__(self, keep_profiles: bool = True):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.keep_profiles = keep_profiles
+        self.profiles: list[FileProfile] = []
+        self.totals = _Totals()
+        # Profiles added since the last write_batch()
+        self.batch = _Totals()
+        self.batches = 0
+
+    def add(self, profile: FileProfile) -> None:
+        self.totals.add(profile)
+        self.batch.add(profile)
+        if self.keep_profiles:
+            self.profiles.append(profile)
+
+    def summary(self) -> dict:
+        """Totals per stage and the slowest files and stages."""
+        return {
+            'version': REPORT_VERSION,
+            'started': self.started,
+            'wall_seconds': time.perf_counter() - self._start,
+            **self.totals.summary(),
+        }
+
+    def write(self, path: Path) -> None:
+        """
+        Write the report atomically: NDJSON (one line per kept file
+        profile, then the summary) for a .ndjson path, otherwise one
+        JSON document. After write_batch() has started a .ndjson log,
+        the summary line is appended to it instead.
+        """
+        summary = self.summary()
+        if path.suffix == '.ndjson':
+            if self.batches:
+                _append_line(path, dict(type='summary', **summary))
+                return
+            lines = [json.dumps(dict(type='file', **asdict(p))) for p in self.profiles]
+            lines.append(json.dumps(dict(type='summary', **summary)))
+            text = '\n'.join(lines) + '\n'
+        else:
+            if self.keep_profiles:
+                summary['profiles'] = [asdict(p) for p in self.profiles]
+            text = json.dumps(summary, indent=2)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(text, encoding='utf-8')
+        os.replace(tmp_path, path)
+        logger.debug(f"Wrote metrics: {path} ({summary['files']} files)")
+
+    def write_batch(self, path: Path) -> None:
+        """
+        Report the files added since the last call. A .ndjson path gets
+        one appended 'batch' line - the first call starts the file
+        afresh; any other path is rewritten with the session summary.
+        """
+        if path.suffix != '.ndjson':
+            self.write(path)
+        elif self.batch.files:
+            if not self.batches:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text('', encoding='utf-8')
+            self.batches += 1
+            _append_line(path, dict(
+                type='batch', batch=self.batches, finished=time.time(), **self.batch.summary()
+            ))
+        self.batch = _Totals()
+
+    def format(self) -> str:
+        """Short human-readable summary for the terminal."""
+        summary = self.summary()
+        pages = ''
+        if summary['pages'] != summary['files']:
+            # Rendered once, wrapped per theme: per-page stages add up over pages
+            pages = f" ({summary['pages']} pages)"
+        lines = [
+            f"Profiled {summary['files']} files{pages}: "
+            f"{summary['convert_seconds'] * 1000:.1f} ms converting, "
+            f"{summary['wall_seconds'] * 1000:.1f} ms wall"
+        ]
+        for name, entry in summary['stages'].items():
+            line = (f"  {name:<11} {entry['total'] * 1000:9.1f} ms total"
+                    f"  {entry['mean'] * 1000:7.2f} ms mean  {entry['max'] * 1000:7.2f} ms max")
+            if 'peak_bytes_max' in entry:
+                line += f"  {entry['peak_bytes_max'] / 1024:9.1f} KB peak"
+            lines.append(line)
+        if summary['slowest_files']:
+            lines.append("  slowest files:")
+            for item in summary['slowest_files'][:5]:
+                lines.append(f"    {item['total'] * 1000:8.1f} ms  {item['path']}")
+        return '\n'.join(lines)
+
+
+def _append_line(path: Path, record: dict) -> None:
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
@@ -0,0 +1,134 @@
+"""
+Output file writes.
+Atomic, and skipped when the file already holds the same bytes.
+"""
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COMPARE_CHUNK_BYTES = 1024 * 1024
+
+# mkstemp creates owner-only files; outputs get the usual umask mode.
+# Read once at import, since reading the umask means setting it.
+_umask = os.umask(0o022)
+os.umask(_umask)
+NEW_FILE_MODE = 0o666 & ~_umask
+
+
+def same_content(path: Path, data: bytes) -> bool:
+    """Whether path holds exactly data. Cheap size check first, then the bytes."""
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        view = memoryview(data)
+        offset = 0
+        with open(path, 'rb') as f:
+            while chunk := f.read(COMPARE_CHUNK_BYTES):
+                if chunk != view[offset:offset + len(chunk)]:
+                    return False
+                offset += len(chunk)
+        return offset == len(data)
+    except FileNotFoundError:
+        return False
+
+
+def same_files(path: Path, other: Path) -> bool:
+    """Whether two files hold the same bytes, compared a chunk at a time."""
+    try:
+        if path.stat().st_size != other.stat().st_size:
+            return False
+        with open(path, 'rb') as f, open(other, 'rb') as g:
+            while chunk := f.read(COMPARE_CHUNK_BYTES):
+                if chunk != g.read(len(chunk)):
+                    return False
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _existing_mode(path: Path) -> int:
+    try:
+        return path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        return NEW_FILE_MODE
+
+
+def replace_file(path: Path, data: bytes) -> None:
+    """
+    Write data through a temporary file in the same directory and
+    os.replace it into place, so readers and interrupted runs never
+    see a partial file. An existing file keeps its permissions.
+    """
+    mode = _existing_mode(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """
+    Write data to path unless it already holds exactly these bytes, so
+    unchanged outputs keep their mtime. Returns whether it was written.
+    """
+    if same_content(path, data):
+        logger.debug(f"Unchanged: {path}")
+        return False
+    replace_file(path, data)
+    return True
+
+
+class StreamedFile:
+    """
+    A file written in pieces, with write_if_changed's guarantees: the
+    pieces go to a temporary file next to path, which replaces path on
+    leaving the with block - unless path already holds the same bytes,
+    and never after an exception. written and size are set on exit.
+
+        with StreamedFile(path) as out:
+            for piece in pieces:
+                out.write(piece)
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.written = False
+        self.size = 0
+        self._file = None
+        self._tmp_name: Optional[str] = None
+
+    def __enter__(self) -> 'StreamedFile':
+        fd, self._tmp_name = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp'
+        )
+        self._file = os.fdopen(fd, 'wb')
+        return self
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.size += len(data)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        tmp_path = Path(self._tmp_name)
+        try:
+            self._file.close()
+            if exc_type is None:
+                if same_files(tmp_path, self.path):
+                    logger.debug(f"Unchanged: {self.path}")
+                else:
+                    os.chmod(tmp_path, _existing_mode(self.path))
+                    os.replace(tmp_path, self.path)
+                    self.written = True
+        finally:
+            tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,151 @@
+"""
+Render-on-request page cache for serving markdown sources.
+Pages are validated against their source on every request; no
+background watching, no magic.
+"""
+
+import asyncio
+import gzip
+import logging
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .cache import LRUCache
+from .converter import render_markdown
+from .manifest import hash_bytes
+from .registry import themes
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_BYTES = 128 * 1024 * 1024
+
+# How long theme CSS is trusted before the theme directories are re-checked
+THEME_REFRESH_TTL = 1.0
+
+
+@dataclass
+class CachedPage:
+    """A rendered page and the inputs it was rendered from."""
+    mtime_ns: int
+    size: int
+    source_hash: str
+    theme: str
+    theme_hash: str
+    body: bytes
+    gzipped: bytes
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.source_hash[:16]}-{self.theme_hash[:16]}"'
+
+
+class PageCache:
+    """
+    Rendered pages keyed by source path, bounded by bytes.
+
+    A cached page is reused while the source's mtime and size are
+    unchanged and its theme CSS hashes the same; theme files are
+    re-checked at most once per theme_ttl seconds. Pages are kept plain
+    and gzipped, so the server can answer either without recompressing. When only the mtime
+    moved (a touch, a checkout of identical content), the content hash
+    decides. Concurrent requests for one page share a single render,
+    which runs in the executor so the event loop keeps serving.
+    """
+
+    def __init__(
+        self,
+        theme: str,
+        toc: bool,
+        max_bytes: int = PAGE_CACHE_BYTES,
+        executor: Optional[Executor] = None,
+        theme_ttl: float = THEME_REFRESH_TTL
+    ):
+        self.theme = theme
+        self.toc = toc
+        self.executor = executor
+        self.theme_ttl = theme_ttl
+        self._themes_expire = 0.0
+        self.pages = LRUCache(max_bytes)
+        self.renders = 0
+        self._inflight: dict[Path, asyncio.Future] = {}
+
+    def _refresh_themes(self) -> None:
+        """Pick up theme edits, at most once per theme_ttl."""
+        now = time.monotonic()
+        if now >= self._themes_expire:
+            themes.refresh()
+            self._themes_expire = now + self.theme_ttl
+
+    def _fresh(self, entry: Optional[CachedPage], mtime_ns: int, size: int) -> bool:
+        return (
+            entry is not None
+            and entry.mtime_ns == mtime_ns
+            and entry.size == size
+            and themes.css_hash(entry.theme) == entry.theme_hash
+        )
+
+    async def get(self, md_file: Path) -> CachedPage:
+        """The rendered page for md_file. Raises like convert_markdown."""
+        try:
+            stat = md_file.stat()
+        except FileNotFoundError:
+            self.pages.pop(md_file)
+            raise FileNotFoundError(f"Markdown file not found: {md_file}")
+
+        self._refresh_themes()
+        entry = self.pages.get(md_file)
+        if self._fresh(entry, stat.st_mtime_ns, stat.st_size):
+            return entry
+
+        future = self._inflight.get(md_file)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self._render, md_file, entry)
+            self._inflight[md_file] = future
+            future.add_done_callback(lambda done: self._finished(md_file, done))
+        # A cancelled request must not cancel the render others wait on
+        return await asyncio.shield(future)
+
+    def _finished(self, md_file: Path, future: asyncio.Future) -> None:
+        if self._inflight.get(md_file) is future:
+            del self._inflight[md_file]
+
+    def _render(self, md_file: Path, previous: Optional[CachedPage]) -> CachedPage:
+        # Stat before reading: a later edit then shows up as a new mtime
+        stat = md_file.stat()
+        source_hash = hash_bytes(md_file.read_bytes())
+
+        if (
+            previous is not None
+            and previous.source_hash == source_hash
+            and themes.css_hash(previous.theme) == previous.theme_hash
+        ):
+            logger.debug(f"Content unchanged, reusing page: {md_file}")
+            page = CachedPage(
+                stat.st_mtime_ns, stat.st_size, source_hash,
+                previous.theme, previous.theme_hash, previous.body, previous.gzipped
+            )
+            self.pages.put(md_file, page, len(page.body) + len(page.gzipped))
+            return page
+
+        html, result = render_markdown(
+            md_file,
+            md_file.with_suffix('.html'),
+            self.theme,
+            embed_images=False,  # Images are served from the source tree
+            toc=self.toc
+        )
+        body = html.encode('utf-8')
+        page = CachedPage(
+            stat.st_mtime_ns, stat.st_size, source_hash,
+            result.theme, themes.css_hash(result.theme), body,
+            gzip.compress(body, compresslevel=6)
+        )
+        self.pages.put(md_file, page, len(body) + len(page.gzipped))
+        self.renders += 1
+        logger.info(f"Rendered: {md_file} ({len(body) / 1024:.1f}KB)")
+        return page
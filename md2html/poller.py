@@ -0,0 +1,209 @@
+"""
+Polling watch backend for filesystems without change notifications.
+Directories are re-listed only when their mtime changes; explicit
+polling interval, no auto-detection of the filesystem type.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Shortest accepted poll interval, so --interval 0 does not spin
+MIN_POLL_INTERVAL = 0.1
+
+# A directory modified this close to its last listing is listed again:
+# coarse NFS/SMB timestamps can hide a second change in the same tick
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class _Directory:
+    """One directory in the snapshot: its own mtime and its entries."""
+
+    __slots__ = ('mtime', 'listed', 'files', 'subdirs')
+
+    def __init__(self, mtime: int, listed: int):
+        self.mtime = mtime
+        self.listed = listed
+        self.files: dict[str, tuple[int, int]] = {}
+        self.subdirs: set[str] = set()
+
+
+class SnapshotPoller(threading.Thread):
+    """
+    Observer-compatible poller built on os.scandir snapshots.
+
+    Every poll stats each directory once. A directory whose mtime changed
+    (an entry was added, removed or renamed) is listed again and diffed;
+    in every other directory only the files selected by ``interesting``
+    are stat'ed, to catch in-place edits. Events are delivered to the
+    scheduled handler on the poller thread, like watchdog's observers.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        interesting: Optional[Callable[[str], bool]] = None
+    ):
+        super().__init__(name='md2html-poller', daemon=True)
+        self.interval = max(interval, MIN_POLL_INTERVAL)
+        self.interesting = interesting or (lambda path: True)
+        self.handler = None
+        self.root: Optional[str] = None
+        self.recursive = False
+        self._dirs: dict[str, _Directory] = {}
+        self._stopped = threading.Event()
+
+    def schedule(self, handler, path: str, recursive: bool = False) -> None:
+        """Watch path for handler; call once, before start()."""
+        self.handler = handler
+        self.root = os.fspath(path)
+        self.recursive = recursive
+
+    def snapshot(self) -> None:
+        """Take the initial listing without reporting anything."""
+        self._dirs.clear()
+        self._add_tree(self.root, emit=False)
+
+    def run(self) -> None:
+        if not self._dirs:
+            self.snapshot()
+        logger.info(
+            f"Polling {len(self._dirs)} directories every {self.interval:g}s"
+        )
+
+        while not self._stopped.wait(self.interval):
+            start = time.process_time()
+            try:
+                changes = self.poll()
+            except OSError as e:
+                logger.warning(f"Poll failed: {e}")
+                continue
+            logger.debug(
+                f"Poll: {len(self._dirs)} directories, {changes} changes, "
+                f"{(time.process_time() - start) * 1000:.1f} ms CPU"
+            )
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def poll(self) -> int:
+        """Compare the tree with the snapshot once. Returns the number of events."""
+        changes = 0
+        for path in list(self._dirs):
+            directory = self._dirs.get(path)
+            if directory is None:
+                # Dropped with a removed parent earlier in this poll
+                continue
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                # Reported when the parent is listed again
+                continue
+
+            if mtime != directory.mtime or directory.listed - mtime < RACY_WINDOW_NS:
+                changes += self._relist(path, directory)
+            else:
+                changes += self._check_files(path, directory)
+        return changes
+
+    def _list(self, path: str) -> _Directory:
+        # Directory mtime first, so a change during listing shows up next poll
+        directory = _Directory(os.stat(path).st_mtime_ns, time.time_ns())
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive:
+                            directory.subdirs.add(entry.name)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        directory.files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    continue
+        return directory
+
+    def _add_tree(self, path: str, emit: bool) -> int:
+        changes = 0
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            try:
+                directory = self._list(current)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            self._dirs[current] = directory
+            if emit:
+                for name in directory.files:
+                    self._emit(FileCreatedEvent(os.path.join(current, name)))
+                    changes += 1
+            stack.extend(os.path.join(current, name) for name in directory.subdirs)
+        return changes
+
+    def _drop_tree(self, path: str) -> int:
+        changes = 0
+        prefix = path + os.sep
+        for current in [p for p in self._dirs if p == path or p.startswith(prefix)]:
+            directory = self._dirs.pop(current)
+            for name in directory.files:
+                self._emit(FileDeletedEvent(os.path.join(current, name)))
+                changes += 1
+        return changes
+
+    def _relist(self, path: str, old: _Directory) -> int:
+        try:
+            new = self._list(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return 0
+        self._dirs[path] = new
+
+        changes = 0
+        for name, signature in new.files.items():
+            previous = old.files.get(name)
+            if previous is None:
+                self._emit(FileCreatedEvent(os.path.join(path, name)))
+                changes += 1
+            elif previous != signature:
+                self._emit(FileModifiedEvent(os.path.join(path, name)))
+                changes += 1
+        for name in old.files.keys() - new.files.keys():
+            self._emit(FileDeletedEvent(os.path.join(path, name)))
+            changes += 1
+
+        for name in old.subdirs - new.subdirs:
+            changes += self._drop_tree(os.path.join(path, name))
+        for name in new.subdirs - old.subdirs:
+            changes += self._add_tree(os.path.join(path, name), emit=True)
+        return changes
+
+    def _check_files(self, path: str, directory: _Directory) -> int:
+        changes = 0
+        # Plain concatenation: os.path.join dominates an idle poll
+        prefix = path + os.sep
+        for name, signature in list(directory.files.items()):
+            file_path = prefix + name
+            if not self.interesting(file_path):
+                continue
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                del directory.files[name]
+                self._emit(FileDeletedEvent(file_path))
+                changes += 1
+                continue
+            current = (stat.st_mtime_ns, stat.st_size)
+            if current != signature:
+                directory.files[name] = current
+                self._emit(FileModifiedEvent(file_path))
+                changes += 1
+        return changes
+
+    def _emit(self, event) -> None:
+        if self.handler is not None:
+            self.handler.dispatch(event)
@@ -0,0 +1,137 @@
+"""
+Theme registry.
+Scans theme directories once and keeps CSS in memory.
+"""
+
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .manifest import hash_bytes
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BUILTIN_THEME_DIR = Path(__file__).parent / 'themes'
+# Extra theme directories, searched before the built-in one
+THEME_PATH_ENV = 'MD2HTML_THEME_PATH'
+THEME_NAME_RE = re.compile(r'^[a-z0-9][a-z0-9\-]*$')
+
+
+class ThemeRegistry:
+    """
+    Registry of theme CSS files found on a search path.
+    Earlier directories win when two define the same theme name.
+    CSS is read once per theme and only re-read after refresh()
+    notices a changed mtime.
+    """
+
+    def __init__(self, search_path: list[Path]):
+        self.search_path = list(search_path)
+        self._lock = threading.Lock()
+        self._paths: Optional[dict[str, Path]] = None
+        # name -> (mtime_ns, css, content hash)
+        self._css: dict[str, tuple[int, str, str]] = {}
+
+    def add_path(self, directory: Path) -> None:
+        """Search directory before every existing entry."""
+        if not directory.is_dir():
+            raise ValueError(f"Not a theme directory: {directory}")
+        with self._lock:
+            self.search_path.insert(0, directory)
+            self._paths = None
+            self._css.clear()
+
+    def _scan(self) -> dict[str, Path]:
+        paths: dict[str, Path] = {}
+        for directory in reversed(self.search_path):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logger.warning(f"Cannot scan theme directory {directory}: {e}")
+                continue
+            for entry in entries:
+                name, ext = os.path.splitext(entry.name)
+                if ext != '.css' or not entry.is_file():
+                    continue
+                if not THEME_NAME_RE.match(name):
+                    logger.debug(f"Ignoring theme file with invalid name: {entry.path}")
+                    continue
+                paths[name] = Path(entry.path)
+        logger.debug(f"Scanned {len(paths)} themes from {len(self.search_path)} directories")
+        return paths
+
+    def _themes(self) -> dict[str, Path]:
+        if self._paths is None:
+            with self._lock:
+                if self._paths is None:
+                    self._paths = self._scan()
+        return self._paths
+
+    def names(self) -> list[str]:
+        """Sorted names of all available themes."""
+        return sorted(self._themes())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._themes()
+
+    def path(self, name: str) -> Path:
+        """CSS file for a theme. Theme must exist."""
+        try:
+            return self._themes()[name]
+        except KeyError:
+            raise FileNotFoundError(f"Theme not found: {name}")
+
+    def _entry(self, name: str) -> tuple[int, str, str]:
+        cached = self._css.get(name)
+        if cached is not None:
+            return cached
+
+        theme_path = self.path(name)
+        with self._lock:
+            cached = self._css.get(name)
+            if cached is not None:
+                return cached
+            logger.debug(f"Loading theme: {name} from {theme_path}")
+            mtime = theme_path.stat().st_mtime_ns
+            css = theme_path.read_text(encoding='utf-8')
+            entry = (mtime, css, hash_bytes(css.encode('utf-8')))
+            self._css[name] = entry
+            return entry
+
+    def css(self, name: str) -> str:
+        """Theme CSS text."""
+        return self._entry(name)[1]
+
+    def css_hash(self, name: str) -> str:
+        """Content hash of the theme CSS."""
+        return self._entry(name)[2]
+
+    def refresh(self) -> None:
+        """
+        Pick up added, removed and edited themes.
+        Called by long-running modes before each rebuild.
+        """
+        with self._lock:
+            self._paths = self._scan()
+            for name, (mtime, _, _) in list(self._css.items()):
+                theme_path = self._paths.get(name)
+                try:
+                    current = theme_path.stat().st_mtime_ns if theme_path else None
+                except OSError:
+                    current = None
+                if current != mtime:
+                    logger.debug(f"Theme changed on disk: {name}")
+                    del self._css[name]
+
+
+def _default_search_path() -> list[Path]:
+    extra = os.environ.get(THEME_PATH_ENV, '')
+    return [Path(p) for p in extra.split(os.pathsep) if p] + [BUILTIN_THEME_DIR]
+
+
+# Process-wide registry used by the converter, watcher and CLI
+themes = ThemeRegistry(_default_search_path())
@@ -0,0 +1,366 @@
+"""
+HTML serialization of rendered bodies.
+Writes HTML exactly as BeautifulSoup's html.parser builder and
+str(soup) did, in one streaming pass and without building a tree.
+"""
+
+import logging
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Callable, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Closed as soon as they open, and written as <br/>
+VOID_ELEMENTS = frozenset({
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed',
+    'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link',
+    'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr',
+})
+
+# Whitespace-only text is kept as written inside these
+PRESERVE_WHITESPACE_ELEMENTS = frozenset({'pre', 'textarea'})
+
+# Text directly inside these is written unescaped
+RAW_TEXT_ELEMENTS = frozenset({'script', 'style'})
+
+# Attributes holding whitespace-separated lists, written single-spaced
+LIST_ATTRIBUTES = frozenset({'accesskey', 'dropzone', 'class'})
+ELEMENT_LIST_ATTRIBUTES = {
+    'a': frozenset({'rel', 'rev'}),
+    'link': frozenset({'rel', 'rev'}),
+    'td': frozenset({'headers'}),
+    'th': frozenset({'headers'}),
+    'form': frozenset({'accept-charset'}),
+    'object': frozenset({'archive'}),
+    'area': frozenset({'rel'}),
+    'icon': frozenset({'sizes'}),
+    'iframe': frozenset({'sandbox'}),
+    'output': frozenset({'for'}),
+}
+
+# Text made only of these collapses to one space or newline
+ASCII_SPACES = ' \n\t\x0c\r'
+
+# Named references are decoded when spelled with ';', but also without
+NAMED_REFERENCES = {name[:-1]: char for name, char in html5.items() if name.endswith(';')}
+
+# Numeric references in the C1 range mean their windows-1252 characters
+WINDOWS_1252 = {
+    n: bytes([n]).decode('cp1252')
+    for n in range(0x80, 0xA0) if n not in (0x81, 0x8D, 0x8F, 0x90, 0x9D)
+}
+
+DECIMAL_REFERENCE_RE = re.compile('^([0-9]+)(.*)')
+HEX_REFERENCE_RE = re.compile('^([0-9a-f]+)(.*)')
+
+# A declared encoding is written as the encoding of the output
+CHARSET_RE = re.compile(r'((^|;)\s*charset=)([^;]*)', re.M)
+OUTPUT_ENCODING = 'utf-8'
+
+# The HTML Markdown writes, in forms serialization keeps or only respells:
+# lower-case tags, single-spaced attribute values in double quotes with
+# nothing to escape, text without '>', and references
+_SIMPLE_ATTRIBUTE = r' [a-z][a-z0-9_.:-]*="(?:[^"<>&\s]+(?: [^"<>&\s]+)*)?"'
+_REFERENCE = r'&(#[0-9]+|#[xX][0-9a-fA-F]+|[a-zA-Z][a-zA-Z0-9]*);'
+_VOID = '(?:' + '|'.join(sorted(VOID_ELEMENTS)) + ')'
+SIMPLE_HTML_RE = re.compile(
+    r'(?:<[a-z][a-z0-9]*(?:' + _SIMPLE_ATTRIBUTE + r')*(?: /)?>|</[a-z][a-z0-9]*>|[^<>&]+(?![^<>&])|'
+    + _REFERENCE + ')*'
+)
+# Simple HTML serialization would still change: elements with raw text,
+# whitespace or rewritten attributes, </br>, and <div /> (an empty div)
+NOT_SIMPLE_RE = re.compile(
+    r'<(?:script|style|textarea|meta)[ />]|</' + _VOID + r'>|<(?!' + _VOID + r'[ />])[^<>]* />'
+)
+MULTIPLE_ATTRIBUTES_RE = re.compile(r'<[a-z][a-z0-9]*((?:' + _SIMPLE_ATTRIBUTE + r'){2,})')
+ATTRIBUTE_NAME_RE = re.compile(r' ([a-z][a-z0-9_.:-]*)="')
+# Names of the non-void tags in order, '/' marking end tags
+TAG_NAME_RE = re.compile(r'<(/?(?!' + _VOID + r'[ />])[a-z][a-z0-9]*)')
+# An element with nothing left inside, in a '<'-joined list of names
+EMPTY_ELEMENT_RE = re.compile(r'<([a-z][a-z0-9]*)</\1(?![a-z0-9])')
+PRE_RE = re.compile(r'<pre[ >].*?</pre>', re.S)
+# A whole whitespace-only text run between tags that would collapse
+COLLAPSING_SPACE_RE = re.compile(r'(?:(?<=>)|\A)(?:[ \t\n\r\f]{2,}|[\t\r\f])(?=<|\Z)')
+REFERENCE_RE = re.compile(_REFERENCE)
+DECODED_REFERENCE_RE = re.compile(r'&(?!(?:amp|lt|gt);)')
+VOID_TAG_RE = re.compile(r'<(' + _VOID + r'(?:' + _SIMPLE_ATTRIBUTE + r')*)(?: /)?>')
+
+
+def numeric_reference(name: str) -> str:
+    """Text of a numeric character reference, as html.parser reports it."""
+    base = 10
+    pattern = DECIMAL_REFERENCE_RE
+    if name.startswith(('x', 'X')):
+        name = name[1:]
+        base = 16
+        pattern = HEX_REFERENCE_RE
+
+    extra = ''
+    try:
+        number = int(name, base)
+    except ValueError:
+        # Digits run into other text: the digits are the reference
+        match = pattern.search(name)
+        if match is None:
+            return name
+        number = int(match.group(1), base)
+        extra = match.group(2)
+
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        char = '\ufffd'
+    else:
+        char = WINDOWS_1252.get(number) or chr(number)
+    return char + extra
+
+
+def escape_text(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def quote_attribute(value: str) -> str:
+    """Double quotes, or single ones when the value has only double quotes."""
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', '&quot;') + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+class HTMLSerializer(HTMLParser):
+    """
+    Re-serialize HTML as BeautifulSoup would: references decoded, text
+    and attributes minimally escaped, attributes sorted, void elements
+    self-closed, stray end tags dropped and open ones closed. Feed it
+    in any number of parts; take() returns what is complete so far.
+    With rewrite_src, every <img> src is passed through it and replaced
+    unless it returns None.
+    """
+
+    def __init__(self, rewrite_src: Optional[Callable[[Optional[str]], Optional[str]]] = None):
+        super().__init__(convert_charrefs=False)
+        self.rewrite_src = rewrite_src
+        self._output: list[str] = []
+        self._text: list[str] = []
+        self._open: list[str] = []
+        self._preserving = 0
+        # Void elements opened as <br>, whose </br> is expected and ignored
+        self._closed_void: list[str] = []
+
+    def take(self) -> str:
+        """Output serialized since the last call."""
+        output = ''.join(self._output)
+        self._output.clear()
+        return output
+
+    def close(self) -> None:
+        super().close()
+        self._flush_text()
+        while self._open:
+            self._pop()
+
+    def _flush(self) -> Optional[str]:
+        """End the text run, returned collapsed and unescaped; None if there was none."""
+        if not self._text:
+            return None
+        text = ''.join(self._text)
+        self._text.clear()
+        if not self._preserving and not text.strip(ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+        return text
+
+    def _flush_text(self) -> None:
+        text = self._flush()
+        if text is not None:
+            if self._open and self._open[-1] in RAW_TEXT_ELEMENTS:
+                self._output.append(text)
+            else:
+                self._output.append(escape_text(text))
+
+    def _special(self, prefix: str, data: str, suffix: str) -> None:
+        """Comments, declarations and the like: text of their own, unescaped."""
+        self._flush_text()
+        self._text.append(data)
+        self._output.append(prefix + self._flush() + suffix)
+
+    def _pop(self) -> None:
+        tag = self._open.pop()
+        if tag in PRESERVE_WHITESPACE_ELEMENTS:
+            self._preserving -= 1
+        self._output.append(f'</{tag}>')
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self._start(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._closed_void.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self._start(tag, attrs)
+        self._end(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._closed_void:
+            # Not even the text run ends here
+            self._closed_void.remove(tag)
+        else:
+            self._end(tag)
+
+    def _start(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        self._flush_text()
+        # A repeated attribute keeps its first place and its last value
+        values = {name: '' if value is None else value for name, value in attrs}
+        if tag == 'img' and self.rewrite_src is not None:
+            new_src = self.rewrite_src(values.get('src'))
+            if new_src is not None:
+                values['src'] = new_src
+        elif tag == 'meta':
+            _substitute_charset(values)
+
+        void = tag in VOID_ELEMENTS
+        if values:
+            element_lists = ELEMENT_LIST_ATTRIBUTES.get(tag)
+            parts = [f'<{tag}']
+            for name, value in sorted(values.items()):
+                if name in LIST_ATTRIBUTES or (element_lists and name in element_lists):
+                    value = ' '.join(value.split())
+                parts.append(f'{name}={quote_attribute(escape_text(value))}')
+            self._output.append(' '.join(parts) + ('/>' if void else '>'))
+        else:
+            self._output.append(f'<{tag}/>' if void else f'<{tag}>')
+
+        if not void:
+            self._open.append(tag)
+            if tag in PRESERVE_WHITESPACE_ELEMENTS:
+                self._preserving += 1
+
+    def _end(self, tag: str) -> None:
+        self._flush_text()
+        # Closes everything opened since; an end tag with nothing to close is dropped
+        if tag in self._open:
+            while self._open[-1] != tag:
+                self._pop()
+            self._pop()
+
+    def handle_data(self, data: str) -> None:
+        self._text.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        self._text.append(numeric_reference(name))
+
+    def handle_entityref(self, name: str) -> None:
+        # An unknown name is text, without the ';' html.parser consumed
+        self._text.append(NAMED_REFERENCES.get(name, '&' + name))
+
+    def handle_comment(self, data: str) -> None:
+        self._special('<!--', data, '-->')
+
+    def handle_decl(self, decl: str) -> None:
+        self._special('<!DOCTYPE ', decl[len('DOCTYPE '):], '>\n')
+
+    def unknown_decl(self, data: str) -> None:
+        if data.upper().startswith('CDATA['):
+            self._special('<![CDATA[', data[len('CDATA['):], ']]>')
+        else:
+            self._special('<?', data, '?>')
+
+    def handle_pi(self, data: str) -> None:
+        self._special('<?', data, '>')
+
+
+def _substitute_charset(values: dict[str, str]) -> None:
+    """Point a <meta> encoding declaration at the output encoding."""
+    if 'charset' in values:
+        values['charset'] = OUTPUT_ENCODING
+    elif 'content' in values and values.get('http-equiv', '').lower() == 'content-type':
+        values['content'] = CHARSET_RE.sub(
+            lambda match: match.group(1) + OUTPUT_ENCODING, values['content']
+        )
+
+
+def _balanced(html: str) -> bool:
+    """Whether every non-void element is closed, innermost first."""
+    names = '<' + '<'.join(TAG_NAME_RE.findall(html))
+    while True:
+        remaining = EMPTY_ELEMENT_RE.sub('', names)
+        if remaining == names:
+            return remaining == '<'
+        names = remaining
+
+
+def _collapse_spaces(html: str) -> Optional[str]:
+    """Collapse whitespace-only text runs outside <pre>, as HTMLSerializer does."""
+    runs = [match.span() for match in COLLAPSING_SPACE_RE.finditer(html)]
+    if not runs:
+        return html
+    pre = [match.span() for match in PRE_RE.finditer(html)]
+    if any('<pre' in html[start + 4:end] for start, end in pre):
+        return None
+
+    parts = []
+    copied = 0
+    for start, end in runs:
+        if any(pre_start < start < pre_end for pre_start, pre_end in pre):
+            continue
+        parts.append(html[copied:start])
+        parts.append('\n' if '\n' in html[start:end] else ' ')
+        copied = end
+    parts.append(html[copied:])
+    return ''.join(parts)
+
+
+def _decode_reference(match: re.Match) -> str:
+    name = match.group(1)
+    char = numeric_reference(name[1:]) if name[0] == '#' else NAMED_REFERENCES.get(name)
+    # A decoded space could make its text run collapse
+    if char is None or char in ASCII_SPACES:
+        raise ValueError(name)
+    return escape_text(char)
+
+
+def serialize_simple(html: str) -> Optional[str]:
+    """
+    Serialize the plain HTML Markdown writes without parsing it, through
+    regular expressions: void elements are respelled, references decoded
+    and whitespace between tags collapsed, the rest is already as
+    HTMLSerializer would write it. None for HTML it cannot be sure of:
+    anything outside SIMPLE_HTML_RE, unbalanced or with unsorted attributes.
+    """
+    if SIMPLE_HTML_RE.fullmatch(html) is None or NOT_SIMPLE_RE.search(html):
+        return None
+    for match in MULTIPLE_ATTRIBUTES_RE.finditer(html):
+        names = ATTRIBUTE_NAME_RE.findall(match.group(1))
+        if any(a >= b for a, b in zip(names, names[1:])):
+            return None
+    if not _balanced(html):
+        return None
+
+    html = _collapse_spaces(html)
+    if html is None:
+        return None
+    if DECODED_REFERENCE_RE.search(html):
+        try:
+            html = REFERENCE_RE.sub(_decode_reference, html)
+        except ValueError:
+            return None
+    return VOID_TAG_RE.sub(r'<\1/>', html)
+
+
+def serialize_html(
+    html: str,
+    rewrite_src: Optional[Callable[[Optional[str]], Optional[str]]] = None
+) -> str:
+    """
+    Serialize an HTML fragment in one go. See HTMLSerializer.
+    Bodies without images to rewrite take serialize_simple's scan
+    when they qualify, which gives the same output without a parse.
+    """
+    if rewrite_src is None or '<img' not in html:
+        simple = serialize_simple(html)
+        if simple is not None:
+            return simple
+    serializer = HTMLSerializer(rewrite_src)
+    serializer.feed(html)
+    serializer.close()
+    return serializer.take()
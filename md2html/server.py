@@ -1,27 +1,180 @@
 """
 Simple HTTP server for previewing HTML files.
-No conversion, no magic, just serving files.
+No magic: serves files, and with an explicit source directory renders
+markdown behind .html paths on request.
 """
 
 import asyncio
+import gzip
 import logging
+import mimetypes
+import stat
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
 from pathlib import Path
-from aiohttp import web
+from typing import Optional
+from aiohttp import hdrs, web
+
+from .cache import LRUCache
+from .images import ImageNotFoundError
+from .sources import MARKDOWN_SUFFIXES
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
-async def handle_file(request):
+# Only serve HTML, CSS, JS, and images
+ALLOWED_SUFFIXES = {'.html', '.htm', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg'}
+COMPRESSIBLE_SUFFIXES = {'.html', '.htm', '.css', '.js', '.svg'}
+MIN_GZIP_BYTES = 1024
+
+# How long a resolved path and its stat are trusted without a syscall
+STAT_CACHE_TTL = 1.0
+STAT_CACHE_ENTRIES = 10000
+
+# Files up to this size are served from memory; larger ones are streamed
+FILE_CACHE_BYTES = 64 * 1024 * 1024
+MAX_CACHED_FILE_BYTES = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """What a request path resolved to, as of `expires`."""
+    path: Path
+    source: Optional[Path]
+    mtime_ns: int
+    size: int
+    expires: float
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.mtime_ns:x}-{self.size:x}"'
+
+
+class FileCache:
     """
-    Serve HTML files from directory.
-    No directory listing, explicit file requests only.
+    Path resolution and stat results trusted for ttl seconds, plus the
+    bytes of small files - plain and gzip - keyed by their validators.
+    A ttl of 0 checks the filesystem on every request.
+    """
+
+    def __init__(self, ttl: float = STAT_CACHE_TTL, max_bytes: int = FILE_CACHE_BYTES):
+        self.ttl = ttl
+        self.bodies = LRUCache(max_bytes)
+        self._stats: dict[str, FileInfo] = {}
+
+    def lookup(self, base_dir: Path, path: str, render_sources: bool) -> FileInfo:
+        """Resolve a request path. Raises the HTTP error to send."""
+        info = self._stats.get(path)
+        now = time.monotonic()
+        if info is not None and info.expires > now:
+            return info
+
+        # Use the validated path
+        file_path = resolve_request_path(base_dir, path)
+        
+        # Default to index.html for directories
+        if file_path.is_dir():
+            file_path = file_path / 'index.html'
+        
+        # Render markdown sources on request when serving a source tree
+        source = markdown_source(file_path) if render_sources else None
+        if source is not None:
+            info = FileInfo(file_path, source, 0, 0, now + self.ttl)
+        else:
+            # File must exist
+            try:
+                st = file_path.stat()
+            except (FileNotFoundError, NotADirectoryError):
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
+                logger.debug(f"File not found: {file_path}")
+                raise web.HTTPNotFound(text=f"File not found: {path}")
+            
+            if file_path.suffix.lower() not in ALLOWED_SUFFIXES:
+                logger.warning(f"Blocked file type: {file_path.suffix} for {path}")
+                raise web.HTTPForbidden(text=f"File type not allowed: {file_path.suffix}")
+            
+            info = FileInfo(file_path, None, st.st_mtime_ns, st.st_size, now + self.ttl)
+
+        if self.ttl > 0:
+            if len(self._stats) >= STAT_CACHE_ENTRIES:
+                self._stats.clear()
+            self._stats[path] = info
+        return info
+
+    async def body(self, info: FileInfo, gzipped: bool) -> bytes:
+        key = (info.path, info.etag, gzipped)
+        body = self.bodies.get(key)
+        if body is None:
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(None, self._load, info, gzipped)
+            self.bodies.put(key, body, len(body))
+        return body
+
+    def _load(self, info: FileInfo, gzipped: bool) -> bytes:
+        if gzipped:
+            # Precompressed by `md2html convert --gzip`, if not older than the page
+            gz_path = info.path.with_name(info.path.name + '.gz')
+            try:
+                if gz_path.stat().st_mtime_ns >= info.mtime_ns:
+                    return gz_path.read_bytes()
+            except FileNotFoundError:
+                pass
+            return gzip.compress(info.path.read_bytes(), compresslevel=6)
+        return info.path.read_bytes()
+
+
+def accepts_gzip(request) -> bool:
+    return 'gzip' in request.headers.get(hdrs.ACCEPT_ENCODING, '').lower()
+
+
+def gzip_etag(etag: str) -> str:
+    """Strong validator of the gzip representation."""
+    return etag[:-1] + '-gzip"'
+
+
+def not_modified(request, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match, or failing that If-Modified-Since."""
+    if_none_match = request.headers.get(hdrs.IF_NONE_MATCH)
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+    since = request.if_modified_since
+    return since is not None and int(mtime) <= since.timestamp()
+
+
+def cached_response(
+    request,
+    etag: str,
+    mtime: float,
+    body: Optional[bytes],
+    content_type: str,
+    gzipped: bool,
+    compressible: bool
+) -> web.Response:
+    """Response with validators; 304 without a body when the client is current."""
+    headers = {
+        hdrs.ETAG: etag,
+        hdrs.LAST_MODIFIED: formatdate(mtime, usegmt=True),
+        # Always revalidate: a 304 is cheap and edits show up at once
+        hdrs.CACHE_CONTROL: 'no-cache',
+    }
+    if compressible:
+        headers[hdrs.VARY] = 'Accept-Encoding'
+    if body is None:
+        return web.Response(status=304, headers=headers)
+    if gzipped:
+        headers[hdrs.CONTENT_ENCODING] = 'gzip'
+    return web.Response(body=body, headers=headers, content_type=content_type)
+
+
+def resolve_request_path(base_dir: Path, path: str) -> Path:
+    """
+    Resolve a request path inside base_dir.
+    Raises HTTPForbidden for paths outside it, HTTPBadRequest for malformed ones.
     """
-    base_dir = request.app['base_dir']
-    
-    # Get requested path
-    path = request.match_info.get('path', 'index.html')
-    
     # Security: prevent directory traversal with proper path resolution
     try:
         # Resolve to absolute path and ensure it's within base_dir
@@ -37,33 +190,89 @@ async def handle_file(request):
         logger.error(f"Invalid path format: {path} - {e}")
         raise web.HTTPBadRequest(text="Invalid path format")
     
-    # Use the validated path
-    file_path = requested_path
+    return requested_path
+
+
+def markdown_source(file_path: Path) -> Optional[Path]:
+    """Markdown file a requested .html path is rendered from, if any."""
+    if file_path.suffix.lower() not in ('.html', '.htm'):
+        return None
+    for suffix in MARKDOWN_SUFFIXES:
+        md_file = file_path.with_suffix(suffix)
+        if md_file.is_file():
+            return md_file
+    return None
+
+
+async def render_page(request, pages, md_file: Path, path: str) -> web.Response:
+    """Render a markdown source through the page cache."""
+    try:
+        page = await pages.get(md_file)
+    except ImageNotFoundError as e:
+        # The page exists; one of its images does not
+        logger.error(f"Failed to render {md_file}: {e}")
+        raise web.HTTPInternalServerError(text=f"Failed to render {path}: {e}")
+    except FileNotFoundError:
+        raise web.HTTPNotFound(text=f"File not found: {path}")
+    except ValueError as e:
+        logger.error(f"Failed to render {md_file}: {e}")
+        raise web.HTTPInternalServerError(text=f"Failed to render {path}: {e}")
+    
+    gzipped = accepts_gzip(request)
+    etag = gzip_etag(page.etag) if gzipped else page.etag
+    mtime = page.mtime_ns / 1e9
+    body = None
+    if not not_modified(request, etag, mtime):
+        body = page.gzipped if gzipped else page.body
+    return cached_response(request, etag, mtime, body, 'text/html', gzipped, True)
+
+
+async def handle_file(request):
+    """
+    Serve HTML files from directory.
+    No directory listing, explicit file requests only. Responses carry
+    ETag and Last-Modified and are gzipped when the client accepts it.
+    """
+    base_dir = request.app['base_dir']
+    files = request.app['files']
+    pages = request.app.get('pages')
     
-    # Default to index.html for directories
-    if file_path.is_dir():
-        file_path = file_path / 'index.html'
+    # Get requested path
+    path = request.match_info.get('path', 'index.html')
+    info = files.lookup(base_dir, path, pages is not None)
     
-    # File must exist
-    if not file_path.exists():
-        logger.debug(f"File not found: {file_path}")
-        raise web.HTTPNotFound(text=f"File not found: {path}")
+    if info.source is not None:
+        return await render_page(request, pages, info.source, path)
     
-    # Only serve HTML, CSS, JS, and images
-    allowed_suffixes = {'.html', '.htm', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg'}
-    if file_path.suffix.lower() not in allowed_suffixes:
-        logger.warning(f"Blocked file type: {file_path.suffix} for {path}")
-        raise web.HTTPForbidden(text=f"File type not allowed: {file_path.suffix}")
+    # Large files are streamed; aiohttp handles their validators
+    if info.size > MAX_CACHED_FILE_BYTES:
+        logger.debug(f"Streaming file: {info.path}")
+        return web.FileResponse(info.path)
     
     # Serve the file
-    logger.debug(f"Serving file: {file_path}")
-    return web.FileResponse(file_path)
+    logger.debug(f"Serving file: {info.path}")
+    compressible = info.path.suffix.lower() in COMPRESSIBLE_SUFFIXES
+    gzipped = compressible and info.size >= MIN_GZIP_BYTES and accepts_gzip(request)
+    etag = gzip_etag(info.etag) if gzipped else info.etag
+    mtime = info.mtime_ns / 1e9
+    body = None
+    if not not_modified(request, etag, mtime):
+        body = await files.body(info, gzipped)
+    content_type = mimetypes.guess_type(info.path.name)[0] or 'application/octet-stream'
+    return cached_response(request, etag, mtime, body, content_type, gzipped, compressible)
 
 
-def serve_directory(directory: Path, host: str, port: int) -> None:
+def serve_directory(
+    directory: Path,
+    host: str,
+    port: int,
+    theme: Optional[str] = None,
+    toc: bool = False
+) -> None:
     """
     Start HTTP server to serve HTML files.
-    No auto-reload, no conversion, just serving.
+    No auto-reload. With a theme, directory is a markdown source tree
+    and /path.html is rendered from path.md on request.
     """
     if not directory.exists():
         raise FileNotFoundError(f"Directory not found: {directory}")
@@ -74,6 +283,12 @@ def serve_directory(directory: Path, host: str, port: int) -> None:
     # Create web application
     app = web.Application()
     app['base_dir'] = directory
+    app['files'] = FileCache()
+    
+    if theme is not None:
+        # Imported here: plain file serving needs no markdown stack
+        from .pages import PageCache
+        app['pages'] = PageCache(theme, toc)
     
     # Add routes
     app.router.add_get('/', handle_file)
@@ -0,0 +1,274 @@
+"""
+Markdown source discovery.
+One os.scandir walk, depth-first in name order, pruned by explicit
+exclude patterns and .gitignore files; files are yielded as they are found.
+"""
+
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+
+GITIGNORE_NAME = '.gitignore'
+
+# Never worth descending into; a later '!pattern' can re-include them
+DEFAULT_EXCLUDES = ('.git/', '.hg/', '.svn/', 'node_modules/')
+
+
+@dataclass
+class WalkStats:
+    """What a walk looked at. seconds excludes time spent by the consumer."""
+    directories: int = 0
+    pruned: int = 0
+    files: int = 0
+    excluded: int = 0
+    seconds: float = 0.0
+
+
+class IgnoreRule:
+    """
+    One gitignore-style pattern, relative to the directory it came from.
+    Supports comments, '!' negation, trailing '/' for directories only,
+    leading or inner '/' to anchor, and '*', '?', '[...]' and '**'.
+    """
+
+    __slots__ = ('pattern', 'base', 'negate', 'dir_only', 'regex')
+
+    def __init__(self, pattern: str, base: str, negate: bool, dir_only: bool, regex: re.Pattern):
+        self.pattern = pattern
+        self.base = base
+        self.negate = negate
+        self.dir_only = dir_only
+        self.regex = regex
+
+    @classmethod
+    def parse(cls, line: str, base: str) -> Optional['IgnoreRule']:
+        """Rule for one line of a .gitignore in base (absolute, '/'-separated), or None."""
+        pattern = line.rstrip('\n').rstrip('\r')
+        # Trailing spaces are dropped unless escaped
+        while pattern.endswith(' ') and not pattern.endswith('\\ '):
+            pattern = pattern[:-1]
+        if not pattern or pattern.startswith('#'):
+            return None
+
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        elif pattern.startswith(('\\!', '\\#')):
+            pattern = pattern[1:]
+
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        if not pattern:
+            return None
+
+        anchored = '/' in pattern
+        body = _translate(pattern.lstrip('/'))
+        regex = re.compile(body if anchored else f'(?:.*/)?{body}', re.DOTALL)
+        # The filesystem root is '/', every other base has no trailing '/'
+        return cls(line.strip(), base.rstrip('/'), negate, dir_only, regex)
+
+    def matches(self, path: str, is_dir: bool) -> bool:
+        """Whether the rule applies to path (absolute, '/'-separated)."""
+        if self.dir_only and not is_dir:
+            return False
+        if not path.startswith(self.base) or path[len(self.base):len(self.base) + 1] != '/':
+            return False
+        return self.regex.fullmatch(path, len(self.base) + 1) is not None
+
+
+def _translate(pattern: str) -> str:
+    """Regex for a gitignore glob, relative path match."""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == '*':
+            if pattern.startswith('**', i):
+                at_start = i == 0 or pattern[i - 1] == '/'
+                at_end = i + 2 == n or pattern[i + 2] == '/'
+                if at_start and at_end:
+                    if i + 2 == n:
+                        # 'dir/**': everything inside
+                        parts.append('.*')
+                    else:
+                        # '**/' : any number of leading directories
+                        parts.append('(?:.*/)?')
+                        i += 1
+                    i += 2
+                    continue
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 2 if pattern.startswith(('[!', '[^'), i) else i + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                chars = pattern[i + 1:end]
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                parts.append(f"[{chars.replace(chr(92), chr(92) * 2)}]")
+                i = end
+        elif char == '\\' and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ''.join(parts)
+
+
+def read_ignore_file(path: Path) -> list[IgnoreRule]:
+    """Rules of a .gitignore file; a missing or unreadable file has none."""
+    try:
+        text = path.read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return []
+    base = path.parent.as_posix()
+    rules = (IgnoreRule.parse(line, base) for line in text.splitlines())
+    return [rule for rule in rules if rule is not None]
+
+
+def _is_ignored(rules: Iterable[IgnoreRule], path: str, is_dir: bool) -> bool:
+    # The last matching rule wins, as in git
+    ignored = False
+    for rule in rules:
+        if rule.matches(path, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def _repository_rules(source_dir: Path) -> list[IgnoreRule]:
+    """
+    Rules from .gitignore files above source_dir, up to the enclosing
+    repository root. Outside a repository there are none.
+    """
+    ancestors = []
+    for directory in source_dir.parents:
+        ancestors.append(directory)
+        if (directory / '.git').exists():
+            break
+    else:
+        return []
+
+    rules: list[IgnoreRule] = []
+    for directory in reversed(ancestors):
+        rules.extend(read_ignore_file(directory / GITIGNORE_NAME))
+    return rules
+
+
+class SourceWalker:
+    """
+    Markdown files under a directory, depth-first: each directory's
+    entries in name order, a subdirectory's files where its name sorts
+    (a/x.md before a-b.md, unlike a sort of the full paths).
+    Directories matching an exclude pattern or a .gitignore rule are
+    not entered at all; excluded files are skipped. Patterns use
+    .gitignore syntax relative to the source directory, and are applied
+    after DEFAULT_EXCLUDES and .gitignore files, so they win over both.
+    Symlinked directories are not followed; prune holds directories
+    (e.g. an output tree inside the source tree) to skip outright.
+    Iterate to walk; stats describe the last walk.
+    """
+
+    def __init__(
+        self,
+        source_dir: Path,
+        recursive: bool = True,
+        excludes: Iterable[str] = (),
+        gitignore: bool = True,
+        prune: Iterable[Path] = ()
+    ):
+        self.source_dir = source_dir
+        self.recursive = recursive
+        self.gitignore = gitignore
+        root = source_dir.as_posix()
+        self._base_rules = [
+            rule for rule in (IgnoreRule.parse(pattern, root) for pattern in DEFAULT_EXCLUDES)
+            if rule is not None
+        ]
+        if gitignore:
+            self._base_rules.extend(_repository_rules(source_dir))
+        self._exclude_rules = [
+            rule for rule in (IgnoreRule.parse(pattern, root) for pattern in excludes)
+            if rule is not None
+        ]
+        self._prune = {os.fspath(path) for path in prune}
+        self.stats = WalkStats()
+
+    def __iter__(self) -> Iterator[Path]:
+        stats = self.stats = WalkStats()
+        clock = time.perf_counter()
+        root = os.fspath(self.source_dir)
+        # Depth-first with an explicit stack: each frame is a directory's
+        # remaining entries and the rules in force there
+        stack = [self._open(root, self._base_rules)]
+        while stack:
+            entries, rules, active = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+
+            name = entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not (
+                    name.endswith(MARKDOWN_SUFFIXES)
+                    and os.path.splitext(name)[1] in MARKDOWN_SUFFIXES
+                    and entry.is_file()
+                ):
+                    continue
+            except OSError:
+                continue
+
+            path = entry.path
+            posix = path if os.sep == '/' else path.replace(os.sep, '/')
+            if is_dir:
+                if not self.recursive:
+                    continue
+                if path in self._prune or _is_ignored(active, posix, True):
+                    stats.pruned += 1
+                    continue
+                stack.append(self._open(path, rules))
+                continue
+
+            if _is_ignored(active, posix, False):
+                stats.excluded += 1
+                continue
+            stats.files += 1
+            # The consumer's time between files is not walk time
+            stats.seconds += time.perf_counter() - clock
+            yield Path(path)
+            clock = time.perf_counter()
+
+        stats.seconds += time.perf_counter() - clock
+        logger.info(
+            f"Walked {stats.directories} directories in {stats.seconds * 1000:.1f} ms: "
+            f"{stats.files} markdown files, {stats.pruned} directories and "
+            f"{stats.excluded} files excluded"
+        )
+
+    def _open(self, directory: str, rules: list[IgnoreRule]) -> tuple:
+        """Stack frame for a directory: sorted entries, inherited and active rules."""
+        self.stats.directories += 1
+        if self.gitignore:
+            local = read_ignore_file(Path(directory, GITIGNORE_NAME))
+            if local:
+                rules = rules + local
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {e}")
+            entries = []
+        return iter(entries), rules, rules + self._exclude_rules
@@ -0,0 +1,101 @@
+"""
+Shared theme stylesheets for --css external.
+Each theme is written once per output tree, minified and content-hashed.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+
+from .images import ASSETS_DIR
+from .output import replace_file
+from .registry import themes
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+STYLESHEET_HASH_LENGTH = 16
+
+# Strings are copied verbatim; comments and whitespace runs are not
+CSS_TOKEN_RE = re.compile(
+    r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)''',
+    re.DOTALL,
+)
+CSS_TIGHT_RE = re.compile(r'\s*([{};,>])\s*|(:)\s+')
+
+# Theme CSS hash -> (file name, minified CSS), shared by every store
+_minified: dict[str, tuple[str, str]] = {}
+_minified_lock = threading.Lock()
+
+
+def minify_css(css: str) -> str:
+    """
+    Strip comments and redundant whitespace from CSS.
+    Conservative: string contents and selector combinators are kept.
+    """
+    parts: list[str] = []
+    plain: list[str] = []
+
+    def flush_plain() -> None:
+        text = ''.join(plain)
+        text = CSS_TIGHT_RE.sub(lambda m: m.group(1) or m.group(2), text)
+        parts.append(text.replace(';}', '}'))
+        plain.clear()
+
+    pos = 0
+    for match in CSS_TOKEN_RE.finditer(css):
+        plain.append(css[pos:match.start()])
+        pos = match.end()
+        string = match.group(1)
+        if string:
+            flush_plain()
+            parts.append(string)
+        else:
+            # Comment or whitespace run
+            plain.append(' ')
+    plain.append(css[pos:])
+    flush_plain()
+    return ''.join(parts).strip()
+
+
+def _stylesheet(theme_name: str) -> tuple[str, str]:
+    """File name and minified CSS for a theme, computed once per version."""
+    css_hash = themes.css_hash(theme_name)
+    cached = _minified.get(css_hash)
+    if cached is not None:
+        return cached
+
+    with _minified_lock:
+        minified = minify_css(themes.css(theme_name))
+        digest = hashlib.sha256(minified.encode('utf-8')).hexdigest()
+        entry = (f"{theme_name}.{digest[:STYLESHEET_HASH_LENGTH]}.css", minified)
+        _minified[css_hash] = entry
+        return entry
+
+
+class StylesheetStore:
+    """
+    Theme stylesheets under <output root>/_assets.
+    Pages link to the stylesheet instead of inlining their theme.
+    """
+
+    def __init__(self, output_root: Path):
+        self.directory = output_root / ASSETS_DIR
+
+    def href(self, theme_name: str, html_dir: Path) -> str:
+        """
+        Relative link from html_dir to the theme's stylesheet.
+        Writes the stylesheet if it is not in the output tree yet.
+        """
+        name, minified = _stylesheet(theme_name)
+        path = self.directory / name
+
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            replace_file(path, minified.encode('utf-8'))
+            logger.info(f"Wrote stylesheet: {path} ({len(minified) / 1024:.1f}KB)")
+
+        return Path(os.path.relpath(path, html_dir)).as_posix()
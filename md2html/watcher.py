@@ -4,36 +4,210 @@ No auto-detection, explicit configuration only.
 """
 
 import logging
+import os
+import threading
 import time
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Iterable, Optional
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileModifiedEvent
 
-from .converter import convert_markdown
+from . import metrics
+from .converter import ConversionResult, _init_worker, configure_cache, convert_markdown
+from .images import ImageNotFoundError
+from .manifest import BuildManifest
+from .poller import SnapshotPoller
+from .registry import themes
+from .sources import MARKDOWN_SUFFIXES
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+WATCH_BACKENDS = ('native', 'poll')
+
+# Distinct paths held before the observer thread has to wait for a rebuild
+MAX_PENDING_PATHS = 10000
+
+# Rebuild actions, in the order a batch applies them
+REMOVE, CONVERT, ASSET = 'remove', 'convert', 'asset'
+
+# Last batch whose theme edits this process has picked up
+_themes_batch = 0
+
+
+def _log(message: str) -> None:
+    timestamp = datetime.now().strftime('%H:%M:%S')
+    print(f"[{timestamp}] {message}")
+
+
+class DependencyGraph:
+    """
+    Local assets used by each converted document, and the reverse index
+    from asset to documents. Paths are stored resolved.
+    """
+    
+    def __init__(self):
+        self._assets: dict[Path, set[Path]] = {}
+        self._documents: dict[Path, set[Path]] = {}
+        # String form of the assets in _documents, for cheap lookups while polling
+        self._asset_paths: set[str] = set()
+    
+    def update(self, document: Path, assets: Iterable[Path]) -> None:
+        """Replace the recorded assets of a document."""
+        self.remove(document)
+        resolved = {asset.resolve() for asset in assets}
+        self._assets[document] = resolved
+        for asset in resolved:
+            self._documents.setdefault(asset, set()).add(document)
+            self._asset_paths.add(str(asset))
+    
+    def remove(self, document: Path) -> None:
+        """Forget a document and its edges."""
+        for asset in self._assets.pop(document, ()):
+            dependents = self._documents.get(asset)
+            if dependents is not None:
+                dependents.discard(document)
+                if not dependents:
+                    del self._documents[asset]
+                    self._asset_paths.discard(str(asset))
+    
+    def __contains__(self, asset) -> bool:
+        """Whether any document uses the asset, given as a resolved path or string."""
+        return str(asset) in self._asset_paths
+    
+    def dependents(self, asset: Path) -> list[Path]:
+        """Documents that use an asset, in path order."""
+        return sorted(self._documents.get(asset, ()))
+    
+    def seed_from_manifest(self, source_dir: Path, output_dir: Path) -> int:
+        """
+        Load edges recorded by a previous `md2html convert` build, so
+        asset edits re-render pages not converted since the watch began.
+        Returns the number of documents seeded.
+        """
+        manifest = BuildManifest.load(output_dir, None)
+        for key, entry in manifest.files.items():
+            self.update(
+                (source_dir / key).resolve(),
+                (source_dir / image for image in entry['images']),
+            )
+        return len(manifest.files)
+
+
+class RebuildQueue:
+    """
+    Pending rebuild actions, one per path; the latest event for a path wins.
+    A batch is handed out once no event has arrived for `window` seconds,
+    or straight away when the queue is full. put() blocks while the queue
+    is full, so a burst can never grow it past max_pending paths.
+    """
+    
+    def __init__(self, window: float, max_pending: int = MAX_PENDING_PATHS):
+        self.window = window
+        self.max_pending = max_pending
+        self._pending: dict[Path, str] = {}
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+    
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+    
+    def put(self, path: Path, action: str) -> None:
+        with self._cond:
+            while path not in self._pending and len(self._pending) >= self.max_pending:
+                self._cond.wait()
+            self._pending.pop(path, None)
+            self._pending[path] = action
+            self._last_event = time.monotonic()
+            self._cond.notify_all()
+    
+    def get_batch(self) -> dict[Path, str]:
+        """Wait for a quiet period, then take everything pending."""
+        with self._cond:
+            while True:
+                if self._pending:
+                    quiet = time.monotonic() - self._last_event
+                    if quiet >= self.window or len(self._pending) >= self.max_pending:
+                        batch, self._pending = self._pending, {}
+                        self._cond.notify_all()
+                        return batch
+                    self._cond.wait(self.window - quiet)
+                else:
+                    # Timed wait so Ctrl+C is handled promptly
+                    self._cond.wait(1.0)
+
+
+def _refresh_themes(batch: int) -> None:
+    """Pick up theme edits once per batch, without re-reading unchanged CSS."""
+    global _themes_batch
+    if batch != _themes_batch:
+        themes.refresh()
+        _themes_batch = batch
+
+
+def _init_rebuild_worker(
+    theme: str,
+    cache_dir: Optional[Path],
+    profiling: Optional[bool],
+    batch: int
+) -> None:
+    """Warm up a watcher worker process, with the themes of the batch that started it."""
+    _init_worker(theme, False, cache_dir, profiling)
+    _refresh_themes(batch)
+
+
+def _rebuild_task(task: tuple) -> tuple[Optional[ConversionResult], Optional[str], Optional[Path]]:
+    """
+    Convert one file of a batch for the watcher, in this or a worker
+    process. Returns the result, or the error and any missing image.
+    """
+    md_file, html_path, theme, batch = task
+    try:
+        # Workers outlive batches; each catches up once per batch
+        _refresh_themes(batch)
+        result = convert_markdown(
+            md_file,
+            html_path,
+            theme,
+            embed_images=True,  # Always embed in watch mode
+            toc=False  # No TOC in watch mode
+        )
+        return result, None, None
+    except ImageNotFoundError as e:
+        return None, str(e), e.image_path
+    except Exception as e:
+        logger.debug(f"Failed to convert {md_file}", exc_info=True)
+        return None, str(e), None
+
 
 class MarkdownHandler(FileSystemEventHandler):
     """
-    Handle file system events for markdown files.
+    Handle file system events for markdown files and their assets.
     No fallbacks, explicit paths only.
     """
     
-    def __init__(self, source_dir: Path, output_dir: Path, theme: str, recursive: bool):
+    def __init__(
+        self,
+        source_dir: Path,
+        output_dir: Path,
+        theme: str,
+        recursive: bool,
+        queue: RebuildQueue
+    ):
         self.source_dir = source_dir
         self.output_dir = output_dir
         self.theme = theme
         self.recursive = recursive
-        self.last_processed = {}
-        
-    def should_process(self, path: Path) -> bool:
-        """Check if file should be processed. No magic."""
+        self.queue = queue
+        self.graph = DependencyGraph()
+    
+    def is_markdown(self, path: Path) -> bool:
+        """Markdown file within the watched scope. No magic."""
         # Must be markdown file
-        if path.suffix not in ['.md', '.markdown']:
+        if path.suffix not in MARKDOWN_SUFFIXES:
             return False
         
         # Check if in scope
@@ -42,53 +216,167 @@ class MarkdownHandler(FileSystemEventHandler):
             if path.parent != self.source_dir:
                 return False
         
-        # Debounce - don't process same file within 1 second
-        now = time.time()
-        last = self.last_processed.get(str(path), 0)
-        if now - last < 1.0:
-            return False
-        
-        self.last_processed[str(path)] = now
         return True
     
+    def output_path(self, path: Path) -> Path:
+        """HTML output for a markdown file - preserves structure."""
+        rel_path = path.relative_to(self.source_dir)
+        return self.output_dir / rel_path.with_suffix('.html')
+    
+    def changed(self, path: Path) -> None:
+        """Queue a created or modified file."""
+        self.queue.put(path, CONVERT if self.is_markdown(path) else ASSET)
+    
+    def removed(self, path: Path) -> None:
+        """Queue a deleted file."""
+        self.queue.put(path, REMOVE if self.is_markdown(path) else ASSET)
+    
     def on_modified(self, event):
-        """Handle file modification. No recovery on errors."""
+        """Handle file modification. Queued, never converted on this thread."""
         if event.is_directory:
             return
         
-        path = Path(event.src_path)
+        self.changed(Path(event.src_path))
+    
+    def on_created(self, event):
+        """Handle new file creation."""
+        self.on_modified(event)
+    
+    def on_deleted(self, event):
+        """Remove outputs of deleted sources; re-render users of deleted assets."""
+        if event.is_directory:
+            return
         
-        if not self.should_process(path):
+        self.removed(Path(event.src_path))
+    
+    def on_moved(self, event):
+        """A move is a delete of the old path and a create of the new one."""
+        if event.is_directory:
             return
         
-        # Calculate output path
-        rel_path = path.relative_to(self.source_dir)
-        output_path = self.output_dir / rel_path.with_suffix('.html')
+        self.removed(Path(event.src_path))
+        self.changed(Path(event.dest_path))
+
+
+class Rebuilder:
+    """
+    Applies batches from the RebuildQueue.
+    A single document is converted in this process; larger batches go to
+    a pool of up to `jobs` worker processes, started on first use.
+    """
+    
+    def __init__(
+        self,
+        handler: MarkdownHandler,
+        jobs: Optional[int],
+        cache_dir: Optional[Path],
+        after_batch: Optional[Callable[[], None]] = None
+    ):
+        self.handler = handler
+        self.after_batch = after_batch
+        self.graph = handler.graph
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self._executor = None
+        self._batch = 0
+    
+    def documents(self, batch: dict[Path, str]) -> list[Path]:
+        """Apply removals and resolve the batch to the documents to convert."""
+        documents: dict[Path, None] = {}
+        for path, action in batch.items():
+            if action == REMOVE:
+                self.remove_output(path)
+            elif action == CONVERT:
+                documents[path] = None
+            else:
+                for document in self.graph.dependents(path.resolve()):
+                    if document.exists():
+                        documents[document] = None
         
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        print(f"[{timestamp}] Converting: {path.name}")
-        logger.info(f"File modified: {path}")
+        # An asset edit reports resolved paths; queued sources may be relative
+        unique: dict[Path, Path] = {}
+        for document in documents:
+            unique.setdefault(document.resolve(), document)
+        return [
+            document for document in unique.values()
+            if document.exists() and self.handler.is_markdown(document)
+        ]
+    
+    def remove_output(self, path: Path) -> None:
+        """Delete the HTML output of a markdown file that is gone."""
+        if path.exists():
+            # Replaced in the same burst, e.g. an editor's atomic save
+            return
+        self.graph.remove(path.resolve())
+        output_path = self.handler.output_path(path)
+        if output_path.exists():
+            output_path.unlink()
+            _log(f"Removed: {output_path.name}")
+            logger.info(f"Removed output for deleted source: {output_path}")
+    
+    def map(self, tasks: list[tuple]):
+        if len(tasks) == 1 or self.jobs == 1:
+            return map(_rebuild_task, tasks)
         
-        try:
-            convert_markdown(
-                path,
-                output_path,
-                self.theme,
-                embed_images=True,  # Always embed in watch mode
-                toc=False  # No TOC in watch mode
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.jobs,
+                initializer=_init_rebuild_worker,
+                initargs=(self.handler.theme, self.cache_dir, metrics.settings(), self._batch),
             )
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"[{timestamp}] Success: {output_path.name}")
-            logger.info(f"Successfully converted: {path} → {output_path}")
-        except Exception as e:
-            # Report error but continue watching
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"[{timestamp}] Error: {e}")
-            logger.error(f"Failed to convert {path}: {e}", exc_info=True)
+            logger.info(f"Started {self.jobs} rebuild workers")
+        return self._executor.map(_rebuild_task, tasks)
     
-    def on_created(self, event):
-        """Handle new file creation."""
-        self.on_modified(event)
+    def rebuild(self, batch: dict[Path, str]) -> None:
+        """Convert every document affected by one batch of events."""
+        start = time.perf_counter()
+        documents = self.documents(batch)
+        if not documents:
+            return
+        
+        logger.info(f"Rebuilding {len(documents)} files for {len(batch)} changed paths")
+        self._batch += 1
+        _refresh_themes(self._batch)
+        tasks = [
+            (document, self.handler.output_path(document), self.handler.theme, self._batch)
+            for document in documents
+        ]
+        
+        failed = 0
+        unchanged = 0
+        for document, (result, error, missing) in zip(documents, self.map(tasks)):
+            output_path = self.handler.output_path(document)
+            if error is None:
+                self.graph.update(document.resolve(), result.images)
+                metrics.record(result.profile)
+                if result.written:
+                    _log(f"Success: {output_path.name}")
+                else:
+                    # A save that changed nothing rendered leaves the output alone
+                    unchanged += 1
+                    _log(f"Unchanged: {output_path.name}")
+                logger.info(f"Successfully converted: {document} → {output_path}")
+                continue
+            
+            failed += 1
+            # Re-render once the missing image appears
+            self.graph.update(document.resolve(), [missing] if missing else [])
+            _log(f"Error: {document.name}: {error}")
+            logger.error(f"Failed to convert {document}: {error}")
+        
+        elapsed = time.perf_counter() - start
+        _log(
+            f"Batch: {len(documents) - failed} converted ({unchanged} unchanged), {failed} failed "
+            f"in {elapsed:.2f}s ({len(self.handler.queue)} queued)"
+        )
+        if self.after_batch is not None:
+            self.after_batch()
+    
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
 
 
 def watch_directory(
@@ -96,11 +384,28 @@ def watch_directory(
     output_dir: Path,
     theme: str,
     interval: float,
-    recursive: bool
+    recursive: bool,
+    jobs: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    backend: str = 'native',
+    after_batch: Optional[Callable[[], None]] = None
 ) -> None:
     """
     Watch directory for markdown file changes.
     No auto-detection, explicit configuration only.
+
+    Events are collected until none has arrived for ``interval``
+    seconds, then rebuilt as one batch by up to ``jobs`` worker
+    processes (default: one per CPU).
+
+    The ``native`` backend uses the platform's change notifications.
+    ``poll`` is for network and container mounts where those never
+    arrive: the tree is checked every ``interval`` seconds against an
+    os.scandir snapshot, stat'ing directories, Markdown files and the
+    images pages use.
+
+    after_batch, if given, is called after every rebuilt batch, e.g. to
+    write a metrics report.
     """
     if not source_dir.exists():
         raise FileNotFoundError(f"Source directory not found: {source_dir}")
@@ -111,21 +416,44 @@ def watch_directory(
     # Create output directory
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    if jobs is not None and jobs < 1:
+        raise ValueError(f"Jobs must be at least 1, got {jobs}")
+    
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"Unknown watch backend: {backend}. Available: {', '.join(WATCH_BACKENDS)}")
+    
+    if cache_dir is not None:
+        configure_cache(cache_dir)
+    
     # Set up file watcher
-    event_handler = MarkdownHandler(source_dir, output_dir, theme, recursive)
-    observer = Observer()
+    queue = RebuildQueue(interval)
+    event_handler = MarkdownHandler(source_dir, output_dir, theme, recursive, queue)
+    seeded = event_handler.graph.seed_from_manifest(source_dir, output_dir)
+    if seeded:
+        logger.info(f"Loaded asset dependencies for {seeded} pages from build manifest")
+    rebuilder = Rebuilder(event_handler, jobs, cache_dir, after_batch)
+    
+    if backend == 'poll':
+        def interesting(path: str) -> bool:
+            return path.endswith(MARKDOWN_SUFFIXES) or path in event_handler.graph
+        
+        observer = SnapshotPoller(interval, interesting)
+    else:
+        observer = Observer()
     observer.schedule(event_handler, str(source_dir), recursive=recursive)
     
     # Start watching
     observer.start()
-    logger.info(f"Started watching: {source_dir} (recursive={recursive})")
+    logger.info(f"Started watching: {source_dir} (recursive={recursive}, backend={backend})")
     
     try:
         while True:
-            time.sleep(interval)
+            rebuilder.rebuild(queue.get_batch())
     except KeyboardInterrupt:
         logger.info("Stopping file watcher...")
         observer.stop()
+    finally:
+        rebuilder.close()
     
     observer.join()
-    logger.info("File watcher stopped")
\ No newline at end of file
+    logger.info("File watcher stopped")
@@ -38,7 +38,6 @@ setup(
     python_requires=">=3.9",
     install_requires=[
         "markdown>=3.0",
-        "beautifulsoup4>=4.9",
         "click>=8.0",
         "watchdog>=2.0",
         "aiohttp>=3.8",
@@ -46,6 +45,7 @@ setup(
     entry_points={
         'console_scripts': [
             'md2html=md2html.cli:cli',
+            'md2html-client=md2html.client:main',
         ],
     },
     project_urls={
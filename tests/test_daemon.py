@@ -0,0 +1,81 @@
+"""
+Daemon requests and the socket client.
+"""
+
+import json
+import socket
+import threading
+
+import pytest
+
+from md2html import daemon
+from md2html.client import DaemonClient, DaemonUnavailable
+from md2html.daemon import Converter, DaemonHandler, TCPDaemonServer
+
+
+@pytest.fixture
+def converter():
+    converter = Converter(threads=1)
+    yield converter
+    converter.executor.shutdown()
+
+
+def test_convert_rejects_non_html_output(tmp_path, converter):
+    source = tmp_path / 'page.md'
+    source.write_text('# Page\n', encoding='utf-8')
+    target = tmp_path / 'page.py'
+    with pytest.raises(ValueError, match="must be an HTML file"):
+        converter.handle('convert', {'source': str(source), 'output': str(target), 'theme': 'github'})
+    assert not target.exists()
+
+
+def test_convert_writes_html_output(tmp_path, converter):
+    source = tmp_path / 'page.md'
+    source.write_text('# Page\n', encoding='utf-8')
+    target = tmp_path / 'page.html'
+    converter.handle('convert', {'source': str(source), 'output': str(target), 'theme': 'github'})
+    assert target.exists()
+
+
+@pytest.mark.parametrize('error', [PermissionError, ConnectionResetError, socket.timeout])
+def test_connect_errors_mean_no_daemon(monkeypatch, error):
+    def fail(*args, **kwargs):
+        raise error('simulated')
+
+    monkeypatch.setattr(socket, 'create_connection', fail)
+    client = DaemonClient('tcp:127.0.0.1:9', 'token')
+    with pytest.raises(DaemonUnavailable):
+        client.request('ping')
+
+
+def test_missing_socket_means_no_daemon(tmp_path):
+    client = DaemonClient(f"unix:{tmp_path / 'gone.sock'}", 'token')
+    with pytest.raises(DaemonUnavailable):
+        client.request('ping')
+
+
+def test_warm_up_builds_engines_on_every_thread(monkeypatch):
+    warmed = set()
+    monkeypatch.setattr(daemon.engines, 'get', lambda toc: warmed.add(threading.get_ident()))
+    converter = Converter(threads=3)
+    try:
+        converter.warm_up('github')
+    finally:
+        converter.executor.shutdown()
+    assert len(warmed) == 3
+
+
+def test_params_must_be_an_object(converter):
+    server = TCPDaemonServer(('127.0.0.1', 0), DaemonHandler)
+    server.setup_daemon(converter, 'token')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.create_connection(server.server_address, timeout=5) as sock:
+            request = {'id': 1, 'token': 'token', 'op': 'convert', 'params': [1]}
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            reply = json.loads(sock.makefile('rb').readline())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert reply == {'id': 1, 'ok': False, 'error': 'Invalid request: params must be a JSON object'}
@@ -0,0 +1,35 @@
+"""
+Dev server page invalidation.
+"""
+
+import os
+
+from md2html.dev import DevSite
+from md2html.registry import themes
+
+
+def test_theme_edit_drops_cached_pages(tmp_path):
+    directory = tmp_path / 'themes'
+    directory.mkdir()
+    css = directory / 'probe.css'
+    css.write_text('body { color: red; }', encoding='utf-8')
+    themes.add_path(directory)
+    try:
+        source = tmp_path / 'docs'
+        source.mkdir()
+        md_file = (source / 'page.md').resolve()
+        md_file.write_text('# Page\n', encoding='utf-8')
+        site = DevSite(source.resolve(), 'probe', False)
+
+        assert b'color: red' in site.render(md_file)
+        css.write_text('body { color: blue; }', encoding='utf-8')
+        stat = css.stat()
+        os.utime(css, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert b'color: red' in site.render(md_file)
+
+        site.changed(css)
+        assert site.pages.get(md_file) is None
+        assert b'color: blue' in site.render(md_file)
+    finally:
+        themes.search_path.remove(directory)
+        themes.refresh()
@@ -0,0 +1,30 @@
+"""
+Highlight cache wiring.
+"""
+
+import markdown
+from markdown.extensions import codehilite, fenced_code
+
+from md2html.engine import build_engine
+from md2html.highlight import CachedCodeHilite, HighlightCache
+
+TEXT = '```python\nx = 1\n```\n\n    indented = True\n'
+
+
+def test_codehilite_modules_untouched():
+    build_engine(False)
+    assert codehilite.CodeHilite is not CachedCodeHilite
+    assert fenced_code.CodeHilite is codehilite.CodeHilite
+
+
+def test_engine_highlights_through_cache():
+    cache = HighlightCache(1024 * 1024)
+    md = build_engine(False)
+    with cache.active():
+        first = md.convert(TEXT)
+    assert len(cache.memory) == 2
+
+    md.reset()
+    with cache.active():
+        assert md.convert(TEXT) == first
+    assert first == markdown.Markdown(extensions=['extra', 'codehilite']).convert(TEXT)
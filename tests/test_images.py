@@ -0,0 +1,93 @@
+"""
+Image rewriting and body serialization.
+"""
+
+import pytest
+
+from md2html.engine import EnginePool
+from md2html.images import ImageNotFoundError, ImageRewriter, process_images
+from md2html.serialize import HTMLSerializer, serialize_html
+
+# 1x1 transparent PNG
+PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d4944415478da63f8ffffff7f0009fb03fd2a86e3'
+    '8a0000000049454e44ae426082'
+)
+
+
+@pytest.fixture
+def images(tmp_path):
+    (tmp_path / 'logo.png').write_bytes(PNG)
+    return tmp_path
+
+
+def test_quoted_greater_than_in_attribute(images):
+    html = process_images('<img alt="a > b" src="logo.png">', images, True)
+    assert html.startswith('<img alt="a &gt; b" src="data:image/png;base64,')
+
+
+def test_data_src_is_not_src(images):
+    html = process_images('<img data-src="hi.png" src="logo.png">', images, True)
+    assert 'data-src="hi.png"' in html
+    assert 'src="data:image/png;base64,' in html
+
+
+def test_src_inside_attribute_value(images):
+    html = process_images('<img alt="src=x.png" src="logo.png">', images, True)
+    assert html.startswith('<img alt="src=x.png" src="data:image/png;base64,')
+
+
+def test_comments_left_alone(images):
+    html = '<!-- <img src="old.png"> -->\n<p>x</p>'
+    assert process_images(html, images, True) == html
+
+
+def test_missing_src(images):
+    with pytest.raises(ValueError, match="without src"):
+        process_images('<img alt="x">', images, True)
+
+
+def test_missing_image(images):
+    with pytest.raises(ImageNotFoundError):
+        process_images('<img src="gone.png">', images, True)
+
+
+@pytest.mark.parametrize('html, expected', [
+    ('<p>a</p>\n<hr>\n<p>&quot;x&quot; &copy; 2024</p>', '<p>a</p>\n<hr/>\n<p>"x" © 2024</p>'),
+    ('<a class="footnote-backref" href="#fnref:1">&#8617;</a>&#160;',
+     '<a class="footnote-backref" href="#fnref:1">↩</a>\xa0'),
+    ('<img src="a.png" alt="A">', '<img alt="A" src="a.png"/>'),
+    ('<pre><code>x\n</code></pre></div>\n\n<p>y</p>', '<pre><code>x\n</code></pre>\n<p>y</p>'),
+    ('<p>a &foo; &#150; <b>b</p>', '<p>a &amp;foo – <b>b</b></p>'),
+    ('<p title=\'say "hi"\' class=" x  y ">', '<p class="x y" title=\'say "hi"\'></p>'),
+    ('<script>if (a < b) {}</script>', '<script>if (a < b) {}</script>'),
+    ('<br></br> \n <!---->', '<br/>\n<!-- -->'),
+])
+def test_serialization(html, expected):
+    assert serialize_html(html) == expected
+
+
+def test_serialization_matches_beautifulsoup():
+    bs4 = pytest.importorskip('bs4')
+    text = (
+        '# Title\n\nSome *text* & "quotes" --- [link](https://example.com).[^1]\n\n'
+        '***\n\n```python\ndef f(x):\n    return x\n```\n\n'
+        '<div markdown="1">\n<img alt="a > b" src="x.png">\n</div>\n\n'
+        '| a | b |\n|---|---|\n| 1 | 2 |\n\n[^1]: Note &copy;.\n'
+    )
+    html = EnginePool().get(False).convert(text)
+    assert serialize_html(html) == str(bs4.BeautifulSoup(html, 'html.parser'))
+
+
+def test_fed_in_parts_matches_whole(images):
+    html = '<p>a &amp; b</p>\n\n<img src="logo.png"><pre>  </pre>&co'
+    whole = serialize_html(html, ImageRewriter(images, False).rewrite)
+    serializer = HTMLSerializer(ImageRewriter(images, False).rewrite)
+    parts = []
+    for i in range(0, len(html), 3):
+        serializer.feed(html[i:i + 3])
+        parts.append(serializer.take())
+    serializer.close()
+    parts.append(serializer.take())
+    assert ''.join(parts) == whole
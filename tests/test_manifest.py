@@ -0,0 +1,41 @@
+"""
+Build manifest hashing.
+"""
+
+import builtins
+from pathlib import Path
+
+from md2html import manifest
+from md2html.manifest import HASH_CHUNK_SIZE, hash_bytes, hash_file
+
+
+def test_hash_file_reads_in_chunks(tmp_path, monkeypatch):
+    data = bytes(range(256)) * (HASH_CHUNK_SIZE // 128 + 3)
+    path = tmp_path / 'big.md'
+    path.write_bytes(data)
+
+    def no_read_bytes(self):
+        raise AssertionError('whole file read')
+
+    reads = []
+    real_open = builtins.open
+
+    class Recorder:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def read(self, size=-1):
+            reads.append(size)
+            return self.f.read(size)
+
+    monkeypatch.setattr(Path, 'read_bytes', no_read_bytes)
+    monkeypatch.setattr(manifest, 'open', lambda *args: Recorder(real_open(*args)), raising=False)
+
+    assert hash_file(path) == hash_bytes(data)
+    assert reads and all(0 < size <= HASH_CHUNK_SIZE for size in reads)
@@ -0,0 +1,60 @@
+"""
+Run reports.
+"""
+
+import json
+
+from md2html.metrics import SLOWEST_COUNT, FileProfile, RunReport
+
+
+def profiles(count, start=0):
+    return [
+        FileProfile(f'doc{i}.md', total=i / 1000, stages={'read': i / 2000, 'markdown': i / 2000})
+        for i in range(start, start + count)
+    ]
+
+
+def test_aggregates_without_profiles(tmp_path):
+    report = RunReport(keep_profiles=False)
+    for profile in profiles(1000):
+        report.add(profile)
+
+    assert report.profiles == []
+    summary = report.summary()
+    assert summary['files'] == 1000
+    assert summary['stages']['read']['files'] == 1000
+    assert summary['stages']['markdown']['max'] == 999 / 2000
+    assert [item['path'] for item in summary['slowest_files']] == [
+        f'doc{i}.md' for i in range(999, 999 - SLOWEST_COUNT, -1)
+    ]
+
+    path = tmp_path / 'metrics.json'
+    report.write(path)
+    assert 'profiles' not in json.loads(path.read_text(encoding='utf-8'))
+
+
+def test_ndjson_batches_are_appended(tmp_path):
+    path = tmp_path / 'metrics.ndjson'
+    path.write_text('{"stale": true}\n', encoding='utf-8')
+    report = RunReport(keep_profiles=False)
+    for batch in range(3):
+        for profile in profiles(50, batch * 50):
+            report.add(profile)
+        report.write_batch(path)
+    report.write_batch(path)  # an empty batch writes nothing
+    report.write(path)
+
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line['type'] for line in lines] == ['batch', 'batch', 'batch', 'summary']
+    assert [line['files'] for line in lines] == [50, 50, 50, 150]
+    assert lines[2]['slowest_files'][0]['path'] == 'doc149.md'
+
+
+def test_full_report_keeps_profiles(tmp_path):
+    report = RunReport()
+    for profile in profiles(3):
+        report.add(profile)
+    path = tmp_path / 'metrics.ndjson'
+    report.write(path)
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line['type'] for line in lines] == ['file', 'file', 'file', 'summary']
@@ -0,0 +1,54 @@
+"""
+Serving markdown sources through the page cache.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+
+from md2html.images import ImageNotFoundError
+from md2html.pages import PageCache
+from md2html.registry import themes
+from md2html.server import render_page
+
+
+@pytest.fixture
+def theme_dir(tmp_path):
+    directory = tmp_path / 'themes'
+    directory.mkdir()
+    (directory / 'probe.css').write_text('body { color: red; }', encoding='utf-8')
+    themes.add_path(directory)
+    yield directory
+    themes.search_path.remove(directory)
+    themes.refresh()
+
+
+def test_theme_edit_invalidates_page(tmp_path, theme_dir):
+    md_file = tmp_path / 'page.md'
+    md_file.write_text('# Page\n', encoding='utf-8')
+    pages = PageCache('probe', False, theme_ttl=0)
+
+    first = asyncio.run(pages.get(md_file))
+    assert b'color: red' in first.body
+
+    css = theme_dir / 'probe.css'
+    css.write_text('body { color: blue; }', encoding='utf-8')
+    stat = css.stat()
+    os.utime(css, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    second = asyncio.run(pages.get(md_file))
+    assert b'color: blue' in second.body
+    assert pages.renders == 2
+
+
+def test_missing_image_is_a_render_error():
+    class Pages:
+        async def get(self, md_file):
+            raise ImageNotFoundError(Path('docs/gone.png'))
+
+    with pytest.raises(web.HTTPInternalServerError) as raised:
+        asyncio.run(render_page(None, Pages(), Path('docs/page.md'), 'page.html'))
+    assert 'gone.png' in raised.value.text
@@ -0,0 +1,26 @@
+"""
+Watch-mode rebuilds.
+"""
+
+from md2html import watcher
+from md2html.watcher import CONVERT, MarkdownHandler, Rebuilder, RebuildQueue
+
+
+def test_themes_refreshed_once_per_batch(tmp_path, monkeypatch):
+    source = tmp_path / 'docs'
+    source.mkdir()
+    for name in ('a', 'b', 'c'):
+        (source / f'{name}.md').write_text(f'# {name}\n', encoding='utf-8')
+
+    refreshes = []
+    monkeypatch.setattr(watcher.themes, 'refresh', lambda: refreshes.append(1))
+    handler = MarkdownHandler(source, tmp_path / 'site', 'github', False, RebuildQueue(0.1))
+    rebuilder = Rebuilder(handler, 1, None)
+
+    batch = {source / f'{name}.md': CONVERT for name in ('a', 'b', 'c')}
+    rebuilder.rebuild(batch)
+    assert len(refreshes) == 1
+    assert (tmp_path / 'site' / 'c.html').exists()
+
+    rebuilder.rebuild(batch)
+    assert len(refreshes) == 2